@@ -0,0 +1,96 @@
+"""
+后台自动存档：故事循环提交存档请求后立即返回，由专用写入线程完成快照与落库。
+同一时间只保留一条待写请求，连续的多次请求会被合并为最新的一次。
+"""
+import atexit
+import threading
+
+# 存档函数经由 connection 写库。connection 在导入时以 atexit 注册 close_all；
+# 本模块先导入它，保证 close_all 先注册、后执行（atexit 按注册的逆序执行），
+# 从而 AutosaveWriter.close 写完最后一份存档之后才关闭数据库连接
+import connection  # noqa: F401
+
+
+class AutosaveWriter:
+    """
+    写后存档队列（write-behind）。
+    save_fn 在写入线程中执行，参数取自最近一次 submit()。
+    """
+    def __init__(self, save_fn, name="wuxia-autosave"):
+        self._save_fn = save_fn
+        self._cond = threading.Condition()
+        self._pending = None      # 最新的待写请求 (args, kwargs)
+        self._busy = False
+        self._closed = False
+
+        self.last_result = None
+        self.last_error = None
+        self.submitted = 0
+        self.written = 0
+        self.merged = 0           # 被后续请求覆盖而未单独写入的次数
+
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+        # 进程退出前写完最后一份存档（先于 connection.close_all 执行，见模块开头）
+        atexit.register(self.close)
+
+    def submit(self, *args, **kwargs):
+        """提交一次存档请求，立即返回"""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("自动存档已关闭")
+            if self._pending is not None:
+                self.merged += 1
+            self._pending = (args, kwargs)
+            self.submitted += 1
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closed:
+                    self._cond.wait()
+                if self._pending is None:
+                    return
+                args, kwargs = self._pending
+                self._pending = None
+                self._busy = True
+
+            result, error = None, None
+            try:
+                result = self._save_fn(*args, **kwargs)
+            except Exception as e:
+                error = e
+                print(f"[自动存档] 写入失败：{e}")
+
+            with self._cond:
+                self._busy = False
+                if error is None:
+                    self.last_result = result
+                    self.written += 1
+                self.last_error = error
+                self._cond.notify_all()
+
+    def pending(self):
+        with self._cond:
+            return self._pending is not None or self._busy
+
+    def flush(self, timeout=None):
+        """阻塞直至所有已提交的请求落库，返回最近一次存档结果"""
+        with self._cond:
+            done = self._cond.wait_for(lambda: self._pending is None and not self._busy, timeout)
+            if not done:
+                raise TimeoutError("自动存档未能在限定时间内完成")
+            return self.last_result
+
+    def close(self, timeout=None):
+        """写完剩余请求并停止写入线程（可重复调用）"""
+        with self._cond:
+            if self._closed:
+                return
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        atexit.unregister(self.close)
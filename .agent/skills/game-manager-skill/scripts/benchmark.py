@@ -0,0 +1,296 @@
+"""
+基准测试：在临时目录生成可缩放的虚拟江湖（复制现有技能后扩充 NPC、长期记忆、存档与长章节），
+对存档、读档、全局同步、剧情事件、文案校验与只读命令的冷启动做可重复的耗时与内存测量，结果写入 JSON 基线，
+并可与上一次的基线逐项对比。
+
+示例：
+    python benchmark.py --npcs 2000 --memories 20000 --saves 200 --output bench.json
+    python benchmark.py --baseline bench.json --fail-over 20
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import unicodedata
+from datetime import datetime
+from pathlib import Path
+
+# 添加脚本路径到 sys.path
+SCRIPTS_DIR = Path(__file__).parent
+sys.path.append(str(SCRIPTS_DIR))
+
+from manager import SkillManager
+
+SOURCE_SKILLS = SCRIPTS_DIR.parent.parent
+
+# 默认规模
+DEFAULT_SCALE = {"npcs": 2000, "memories": 20000, "saves": 200, "chapter_chars": 50000}
+
+SURNAMES = "赵钱孙李周吴郑王冯陈褚卫蒋沈韩杨朱秦尤许何吕施张孔曹严华金魏陶姜"
+GIVEN = "风云雪月霜华清远明玄灵秋寒星剑心尘瑶青岚墨羽"
+TITLES = ["少年剑客", "隐世高人", "丐帮长老", "名门千金", "江湖游医", "镖局总镖头", "魔教护法", "书院夫子"]
+REALMS = ["初窥门径", "略有小成", "融会贯通", "炉火纯青", "登峰造极"]
+PLACES = ["大研镇", "漱玉矶", "丈人村", "拱石村", "武当山", "少林寺", "西湖畔", "极北雪域", "南疆", "白马居"]
+SENTENCES = [
+    "江未央按剑而立，山风卷起衣角，远处传来几声寒鸦啼叫。",
+    "酒肆里人声鼎沸，说书人一拍醒木，满堂皆静。",
+    "剑光如水，映得半边天色都冷了下来。",
+    "她低头拨弄琴弦，弦声似有若无，却字字敲在人心上。",
+    "夜色渐深，客栈的灯笼在风中摇晃，投下斑驳的影子。",
+]
+
+
+# ---- 虚拟江湖生成 ----
+
+def _ignore(directory, names):
+    ignored = {n for n in names
+               if n in ("__pycache__", ".pytest_cache") or n.endswith((".db", ".db-wal", ".db-shm", ".sock"))}
+    if Path(directory).name == "assets":
+        ignored |= {n for n in names if n == "registry_cache.json"}
+    return ignored
+
+
+def copy_skills(root):
+    """把现有技能复制到 root/.agent/skills（不含数据库、缓存与套接字），返回技能目录；测试也用它隔离仓库资产"""
+    skills_dir = Path(root) / ".agent" / "skills"
+    shutil.copytree(SOURCE_SKILLS, skills_dir, ignore=_ignore)
+    return skills_dir
+
+
+def _npc_block(rng, index):
+    name = rng.choice(SURNAMES) + rng.choice(GIVEN) + rng.choice(GIVEN)
+    return (
+        f"### 9.{index} {rng.choice(TITLES)}·{name}\n"
+        f"- **身份**：行走于{rng.choice(PLACES)}一带的江湖人士\n"
+        f"- **境界**：{rng.choice(REALMS)}\n"
+        f"- **好感度**：{rng.randint(-50, 80)}\n"
+        f"- **性格**：{rng.choice(['豪迈', '阴鸷', '温婉', '孤傲', '憨直'])}\n\n"
+    )
+
+
+def make_chapter(chars, seed=0):
+    """生成约 chars 个字符的章节正文（按段落分行）"""
+    rng = random.Random(seed)
+    parts, total = ["# 第一回 风起大研镇\n\n"], 0
+    while total < chars:
+        paragraph = "".join(rng.choice(SENTENCES) for _ in range(6)) + "\n\n"
+        parts.append(paragraph)
+        total += len(paragraph)
+    return "".join(parts)
+
+
+def generate_world(root, npcs, memories, saves, chapter_chars, seed=42):
+    """在 root 下生成虚拟江湖，返回 {"base_dir", "chapter"}"""
+    rng = random.Random(seed)
+    root = Path(root)
+    skills_dir = copy_skills(root)
+
+    # 扩充 NPC 档案
+    npc_file = skills_dir / "npc-skill" / "references" / "npc_list.md"
+    with open(npc_file, "a", encoding="utf-8") as f:
+        f.write("\n## 9. 虚拟江湖人物\n\n")
+        for i in range(npcs):
+            f.write(_npc_block(rng, i + 1))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        gm = SkillManager(base_dir=root)
+
+        # 长期记忆
+        with gm.memory.batch():
+            for i in range(memories):
+                place = rng.choice(PLACES)
+                gm.memory.add_long_term(rng.choice(["行踪", "战斗", "江湖秘闻", "世界变动"]),
+                                        f"第{i}件事：途经{place}", rng.choice(SENTENCES))
+
+        # 存档：每份存档前推进一点剧情，使文件内容有所变化
+        for i in range(saves):
+            gm.process_story_event("travel", f"来到{PLACES[i % len(PLACES)]}",
+                                   {"location": f"{PLACES[i % len(PLACES)]}·{i}"})
+            if i % 5 == 0:
+                npc_file.write_text(npc_file.read_text(encoding="utf-8") + _npc_block(rng, npcs + i + 1),
+                                    encoding="utf-8")
+            gm.execute_full_save(chapter=f"第{i // 10 + 1}回")
+        gm.shutdown()
+
+    chapter = make_chapter(chapter_chars, seed)
+    chapter_dir = root / "history" / "chapters"
+    chapter_dir.mkdir(parents=True, exist_ok=True)
+    (chapter_dir / "chapter_1.md").write_text(chapter, encoding="utf-8")
+    return {"base_dir": root, "chapter": chapter}
+
+
+# ---- 测量 ----
+
+def measure(fn, repeat, warmup=1):
+    """重复执行 fn，返回耗时统计（毫秒）与单独一次运行的内存峰值（KB）"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(warmup):
+            fn()
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - start) * 1000)
+        # 内存测量单独运行一次，避免 tracemalloc 拖慢计时
+        tracemalloc.start()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {
+        "runs": repeat,
+        "min_ms": round(min(timings), 3),
+        "median_ms": round(statistics.median(timings), 3),
+        "mean_ms": round(statistics.fmean(timings), 3),
+        "max_ms": round(max(timings), 3),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def run_benchmarks(world, repeat):
+    with contextlib.redirect_stdout(io.StringIO()):
+        gm = SkillManager(base_dir=world["base_dir"])
+    slots, _ = gm.list_save_slots(limit=1)
+    latest = slots[0]["save_id"]
+    older = max(1, latest // 2)
+    targets = [older, latest]
+    locations = [f"{place}·基准" for place in PLACES]
+    counter = {"load": 0, "event": 0}
+
+    def load():
+        # 在新旧两份存档间交替读取，保证每次读档都有差异需要写回
+        counter["load"] += 1
+        gm.execute_full_load(targets[counter["load"] % 2])
+
+    def story_event():
+        counter["event"] += 1
+        location = locations[counter["event"] % len(locations)]
+        gm.process_story_event("travel", f"来到{location}", {"location": location})
+
+    # 冷启动：每次启动一个新的 manager.py 进程执行只读命令（含解释器启动）
+    manager_script = Path(world["base_dir"]) / ".agent" / "skills" / "game-manager-skill" / "scripts" / "manager.py"
+
+    def cold_start(*command):
+        return lambda: subprocess.run([sys.executable, str(manager_script), *command], capture_output=True)
+
+    results = {
+        "execute_full_save": measure(lambda: gm.execute_full_save(chapter="基准"), repeat),
+        "execute_full_load": measure(load, repeat),
+        "trigger_global_sync": measure(gm.trigger_global_sync, repeat),
+        "process_story_event": measure(story_event, repeat),
+        "check_story_content": measure(lambda: gm.check_story_content(world["chapter"]), repeat),
+        "cold_start_check_story": measure(cold_start("--check-story", "冷启动"), repeat),
+        "cold_start_list_saves": measure(cold_start("--list-saves", "--limit", "5"), repeat),
+    }
+    gm.shutdown()
+    return results
+
+
+# ---- 报告表格 ----
+
+# 各列宽度（按终端显示宽度计，中文字符占两格）；首列左对齐，其余右对齐
+RESULT_COLUMNS = (24, 12, 12, 12, 14)
+COMPARE_COLUMNS = (24, 12, 12, 10)
+
+
+def _display_width(text):
+    return sum(2 if unicodedata.east_asian_width(ch) in "WF" else 1 for ch in text)
+
+
+def format_row(widths, *cells):
+    """按列宽拼接一行表格，表头与数据行共用同一套列宽"""
+    parts = []
+    for i, (width, cell) in enumerate(zip(widths, cells)):
+        cell = str(cell)
+        padding = " " * max(width - _display_width(cell), 0)
+        parts.append(cell + padding if i == 0 else padding + cell)
+    return "".join(parts)
+
+
+# ---- 基线对比 ----
+
+def compare(current, baseline, threshold=None):
+    """按中位数逐项对比，返回 (报告行列表, 是否存在超过阈值的退化)"""
+    lines = [format_row(COMPARE_COLUMNS, "操作", "基线ms", "本次ms", "变化")]
+    regressed = False
+    for name, result in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            lines.append(format_row(COMPARE_COLUMNS, name, "-", f"{result['median_ms']:.2f}", "新增"))
+            continue
+        change = (result["median_ms"] - base["median_ms"]) / base["median_ms"] * 100 if base["median_ms"] else 0.0
+        flag = ""
+        if threshold is not None and change > threshold:
+            regressed = True
+            flag = "  ← 退化"
+        lines.append(format_row(COMPARE_COLUMNS, name, f"{base['median_ms']:.2f}",
+                                f"{result['median_ms']:.2f}", f"{change:+.1f}%") + flag)
+    if baseline.get("scale") != current["scale"]:
+        lines.append(f"注意：基线规模 {baseline.get('scale')} 与本次 {current['scale']} 不同，结果不可直接比较。")
+    return lines, regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="江湖系统基准测试（虚拟江湖）")
+    parser.add_argument("--npcs", type=int, default=DEFAULT_SCALE["npcs"], help="追加的 NPC 档案数")
+    parser.add_argument("--memories", type=int, default=DEFAULT_SCALE["memories"], help="长期记忆条数")
+    parser.add_argument("--saves", type=int, default=DEFAULT_SCALE["saves"], help="预先生成的存档数")
+    parser.add_argument("--chapter-chars", type=int, default=DEFAULT_SCALE["chapter_chars"], help="校验章节的字数")
+    parser.add_argument("--repeat", type=int, default=5, help="每项测量的重复次数")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子（相同种子生成相同的江湖）")
+    parser.add_argument("--output", type=str, help="结果写入的 JSON 文件")
+    parser.add_argument("--baseline", type=str, help="与之对比的基线 JSON 文件")
+    parser.add_argument("--fail-over", type=float, help="中位数退化超过该百分比时以退出码 1 结束")
+    parser.add_argument("--workdir", type=str, help="生成虚拟江湖的目录（默认临时目录，结束后删除）")
+    args = parser.parse_args(argv)
+
+    scale = {"npcs": args.npcs, "memories": args.memories, "saves": args.saves,
+             "chapter_chars": args.chapter_chars, "seed": args.seed}
+    workdir = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix="wuxia-bench-"))
+    try:
+        started = time.perf_counter()
+        world = generate_world(workdir, args.npcs, args.memories, args.saves, args.chapter_chars, args.seed)
+        print(f">>> 虚拟江湖生成完毕（{time.perf_counter() - started:.1f} 秒）：{scale}")
+        results = run_benchmarks(world, args.repeat)
+    finally:
+        if not args.workdir:
+            from connection import close_all
+            close_all()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "scale": scale,
+        "results": results,
+    }
+    print(format_row(RESULT_COLUMNS, "操作", "中位数ms", "最小ms", "最大ms", "内存峰值KB"))
+    for name, r in results.items():
+        print(format_row(RESULT_COLUMNS, name, f"{r['median_ms']:.2f}", f"{r['min_ms']:.2f}",
+                         f"{r['max_ms']:.2f}", f"{r['peak_kb']:.1f}"))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"\n结果已写入 {args.output}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        lines, regressed = compare(report, baseline, args.fail_over)
+        print("\n" + "\n".join(lines))
+        if regressed:
+            sys.exit(1)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+常驻主控的轻量客户端：通过 Unix 套接字向 manager.py --serve 发送 JSON-RPC 2.0 请求（每行一条消息）。
+本模块只依赖标准库，不导入 manager，供各技能脚本以毫秒级开销调用；
+常驻主控未启动时抛出 ServerUnavailable，调用方可退回到子进程方式。
+
+示例：
+    python client.py ping
+    python client.py save '{"chapter": "第一回"}'
+    python client.py check_story '{"path": "history/chapters/chapter_1.md"}'
+"""
+import itertools
+import json
+import os
+import socket
+import sys
+from pathlib import Path
+
+ENV_VAR = "WUXIA_SOCKET"
+DEFAULT_SOCKET = Path(__file__).parent.parent / "assets" / "manager.sock"
+
+
+class ServerUnavailable(ConnectionError):
+    """常驻主控未启动（或套接字不可用）"""
+
+
+class RPCError(RuntimeError):
+    """服务端返回的错误：code 为 JSON-RPC 错误码，output 为出错前的控制台输出"""
+    def __init__(self, code, message, output=""):
+        super().__init__(message)
+        self.code = code
+        self.output = output
+
+
+def socket_path(path=None):
+    """套接字路径：显式参数 > 环境变量 WUXIA_SOCKET > assets/manager.sock"""
+    return Path(path or os.environ.get(ENV_VAR) or DEFAULT_SOCKET)
+
+
+class ManagerClient:
+    """
+    保持一条连接的客户端，可连续发送多个请求。
+    call() 返回结果值，服务端在处理期间打印的内容保存在 last_output（echo=True 时同时转印到本地标准输出）。
+    """
+    def __init__(self, path=None, timeout=60.0, echo=False):
+        self.path = socket_path(path)
+        self.timeout = timeout
+        self.echo = echo
+        self.last_output = ""
+        self._sock = None
+        self._reader = None
+        self._ids = itertools.count(1)
+
+    def connect(self):
+        if self._sock is None:
+            if not hasattr(socket, "AF_UNIX"):
+                raise ServerUnavailable("当前平台不支持 Unix 套接字")
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(str(self.path))
+            except (FileNotFoundError, ConnectionRefusedError) as e:
+                sock.close()
+                raise ServerUnavailable(f"常驻主控未启动：{self.path}") from e
+            self._sock = sock
+            self._reader = sock.makefile("rb")
+        return self
+
+    def call(self, method, **params):
+        self.connect()
+        request = {"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": params}
+        try:
+            self._sock.sendall(json.dumps(request, ensure_ascii=False).encode("utf-8") + b"\n")
+            line = self._reader.readline()
+        except OSError as e:
+            self.close()
+            raise ServerUnavailable(f"与常驻主控的连接中断：{e}") from e
+        if not line:
+            self.close()
+            raise ServerUnavailable("常驻主控已关闭连接")
+
+        response = json.loads(line)
+        if "error" in response:
+            error = response["error"]
+            self.last_output = (error.get("data") or {}).get("output", "")
+            self._echo()
+            raise RPCError(error["code"], error["message"], self.last_output)
+        result = response["result"]
+        self.last_output = result.get("output", "")
+        self._echo()
+        return result.get("value")
+
+    def _echo(self):
+        if self.echo and self.last_output:
+            sys.stdout.write(self.last_output)
+
+    def close(self):
+        if self._sock is not None:
+            self._reader.close()
+            self._sock.close()
+            self._sock = self._reader = None
+
+    def __enter__(self):
+        return self.connect()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def call(method, params=None, socket_file=None, echo=False):
+    """单次调用：连接、发送一个请求（params 为参数字典）并关闭连接"""
+    with ManagerClient(socket_file, echo=echo) as client:
+        return client.call(method, **(params or {}))
+
+
+def available(socket_file=None):
+    """常驻主控是否在运行"""
+    try:
+        call("ping", socket_file=socket_file)
+        return True
+    except ServerUnavailable:
+        return False
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="常驻主控客户端")
+    parser.add_argument("method", help="方法名（如 ping、save、load、sync、event、check_story）")
+    parser.add_argument("params", nargs="?", default="{}", help="JSON 格式的参数对象")
+    parser.add_argument("--socket", type=str, help="套接字路径（默认 assets/manager.sock）")
+    args = parser.parse_args()
+
+    try:
+        value = call(args.method, json.loads(args.params), args.socket, echo=True)
+    except ServerUnavailable as e:
+        print(f"!!! {e}（请先运行 manager.py --serve）")
+        sys.exit(2)
+    except RPCError as e:
+        print(f"!!! 调用失败：{e}")
+        sys.exit(1)
+    if value is not None:
+        print(json.dumps(value, ensure_ascii=False, indent=2))
+    if value is False or (isinstance(value, dict) and value.get("ok") is False):
+        sys.exit(1)
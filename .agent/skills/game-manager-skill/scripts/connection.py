@@ -0,0 +1,139 @@
+"""
+共享 SQLite 连接管理：persistence 与 memory 共用。
+每个线程对每个数据库只保持一条长连接，统一开启 WAL 日志与调优 pragma，
+并以显式事务（嵌套时使用 SAVEPOINT）界定写入范围。
+"""
+import atexit
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import tracing
+
+# 连接建立后依次执行的 pragma
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",   # WAL 下仅在检查点 fsync
+    "PRAGMA cache_size=-8192",     # 约 8 MB 页缓存
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+# 每条连接缓存的预编译语句数量
+STATEMENT_CACHE_SIZE = 256
+
+_local = threading.local()
+_all_connections = []
+_lock = threading.Lock()
+
+
+def _key(db_path):
+    return os.path.abspath(os.fspath(db_path))
+
+
+def _state():
+    if not hasattr(_local, "connections"):
+        _local.connections = {}
+        _local.depth = {}
+    return _local
+
+
+def get_connection(db_path):
+    """获取当前线程对该数据库的长连接（自动提交模式，事务由 transaction() 管理）"""
+    state = _state()
+    key = _key(db_path)
+    conn = state.connections.get(key)
+    if conn is None:
+        os.makedirs(os.path.dirname(key), exist_ok=True)
+        conn = sqlite3.connect(
+            key,
+            isolation_level=None,
+            cached_statements=STATEMENT_CACHE_SIZE,
+            check_same_thread=False
+        )
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        if tracing.is_enabled():
+            conn.set_trace_callback(tracing.sql_statement)
+        state.connections[key] = conn
+        state.depth[key] = 0
+        with _lock:
+            _all_connections.append(conn)
+    return conn
+
+
+@contextmanager
+def transaction(db_path, immediate=True):
+    """
+    显式事务范围：最外层使用 BEGIN IMMEDIATE（只读时传 immediate=False 使用 DEFERRED，
+    不抢占写锁），内层嵌套使用 SAVEPOINT，异常时回滚到对应层级并继续抛出。
+    """
+    state = _state()
+    key = _key(db_path)
+    conn = get_connection(key)
+    depth = state.depth[key]
+
+    with tracing.span("db.transaction" if depth == 0 else "db.savepoint", "db"):
+        if depth == 0:
+            conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN DEFERRED")
+        else:
+            conn.execute(f"SAVEPOINT sp_{depth}")
+        state.depth[key] = depth + 1
+
+        try:
+            yield conn
+        except BaseException:
+            if depth == 0:
+                conn.execute("ROLLBACK")
+            else:
+                conn.execute(f"ROLLBACK TO sp_{depth}")
+                conn.execute(f"RELEASE sp_{depth}")
+            raise
+        else:
+            if depth == 0:
+                conn.execute("COMMIT")
+            else:
+                conn.execute(f"RELEASE sp_{depth}")
+        finally:
+            state.depth[key] = depth
+
+
+def close_connection(db_path):
+    """关闭当前线程对该数据库的连接（如需删除或替换数据库文件时）"""
+    state = _state()
+    key = _key(db_path)
+    conn = state.connections.pop(key, None)
+    state.depth.pop(key, None)
+    if conn is not None:
+        with _lock:
+            if conn in _all_connections:
+                _all_connections.remove(conn)
+        conn.close()
+
+
+def close_all():
+    """关闭进程内全部连接；最后一条连接关闭时 SQLite 会完成 WAL 检查点"""
+    with _lock:
+        connections = list(_all_connections)
+        _all_connections.clear()
+    for conn in connections:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+    if hasattr(_local, "connections"):
+        _local.connections.clear()
+        _local.depth.clear()
+
+
+def _toggle_tracing(enabled):
+    """开启追踪时为所有已打开的连接挂上 SQL 语句回调，关闭时移除"""
+    with _lock:
+        connections = list(_all_connections)
+    for conn in connections:
+        conn.set_trace_callback(tracing.sql_statement if enabled else None)
+
+
+tracing.on_toggle(_toggle_tracing)
+atexit.register(close_all)
@@ -0,0 +1,77 @@
+"""
+参考文件内容缓存：按 (路径, mtime_ns, size) 校验有效性，命中时只需一次 stat；
+总字节数超过上限时按最近最少使用淘汰。由 SkillManager 的读写路径共用（写入时直接回填）。
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from tracing import span
+
+# 默认缓存上限：8 MB 文本
+DEFAULT_MAX_BYTES = 8 * 1024 * 1024
+
+
+class ContentCache:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # 路径 -> (mtime_ns, size, content)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def read(self, path):
+        """读取文件内容（UTF-8），文件不存在时返回 None"""
+        key = os.fspath(path)
+        try:
+            st = os.stat(key)
+        except FileNotFoundError:
+            self.invalidate(key)
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+
+        # 文本模式读取，换行处理与 Path.read_text 一致
+        with span("file.read", "io", path=os.path.basename(key)), open(key, encoding="utf-8") as f:
+            content = f.read()
+            st = os.fstat(f.fileno())
+        self._store(key, st.st_mtime_ns, st.st_size, content)
+        return content
+
+    def put(self, path, content):
+        """写入后回填缓存（调用方已把 content 写入 path）"""
+        key = os.fspath(path)
+        st = os.stat(key)
+        self._store(key, st.st_mtime_ns, st.st_size, content)
+
+    def invalidate(self, path):
+        key = os.fspath(path)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry:
+                self._bytes -= entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _store(self, key, mtime_ns, size, content):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old:
+                self._bytes -= old[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (mtime_ns, size, content)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
@@ -6,13 +6,97 @@ SKILL_ROOT = Path(__file__).parent.parent
 SAVES_DIR = SKILL_ROOT / "assets" / "saves"
 DB_PATH = SAVES_DIR / "wuxiaX.db"
 
-def init_db():
-    if not SAVES_DIR.exists():
-        SAVES_DIR.mkdir(parents=True, exist_ok=True)
-    
-    conn = sqlite3.connect(DB_PATH)
+# 结构迁移：按 PRAGMA user_version 逐级执行，第 N 项将库升级到版本 N+1
+MIGRATIONS = [
+    # v1: 内容寻址存档——每份参考文件按哈希只存一次，存档行仅记录清单
+    [
+        """
+        CREATE TABLE IF NOT EXISTS save_blobs (
+            hash TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            content TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS save_manifest (
+            save_id INTEGER NOT NULL,
+            skill TEXT NOT NULL,
+            file TEXT NOT NULL,
+            hash TEXT NOT NULL,
+            PRIMARY KEY (save_id, skill, file)
+        )
+        """,
+    ],
+    # v2: 存档槽元数据索引——列出存档时无需触碰 data_json 与内容块
+    [
+        """
+        CREATE TABLE IF NOT EXISTS save_slots (
+            save_id INTEGER PRIMARY KEY,
+            timestamp TEXT NOT NULL,
+            chapter TEXT,
+            location TEXT,
+            size_bytes INTEGER NOT NULL DEFAULT 0,
+            stored_bytes INTEGER NOT NULL DEFAULT 0,
+            file_count INTEGER NOT NULL DEFAULT 0,
+            skills_digest TEXT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_save_slots_chapter ON save_slots (chapter, save_id)",
+        "CREATE INDEX IF NOT EXISTS idx_save_slots_location ON save_slots (location, save_id)",
+        "CREATE INDEX IF NOT EXISTS idx_save_slots_timestamp ON save_slots (timestamp)",
+        # 一次性回填已有存档
+        """
+        INSERT OR IGNORE INTO save_slots
+            (save_id, timestamp, chapter, location, size_bytes, stored_bytes, file_count)
+        SELECT g.id, g.timestamp, g.chapter, g.location,
+               length(CAST(g.data_json AS BLOB))
+                   + COALESCE((SELECT SUM(b.size) FROM save_manifest m
+                               JOIN save_blobs b ON b.hash = m.hash WHERE m.save_id = g.id), 0),
+               length(CAST(g.data_json AS BLOB)),
+               (SELECT COUNT(*) FROM save_manifest m WHERE m.save_id = g.id)
+        FROM game_saves g
+        """,
+    ],
+    # v3: 关键帧/增量链——存档清单只记录相对上一存档的变动，每隔若干次写一次完整关键帧
+    [
+        """
+        CREATE TABLE IF NOT EXISTS save_chain (
+            save_id INTEGER PRIMARY KEY,
+            parent_id INTEGER,
+            keyframe INTEGER NOT NULL,
+            depth INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_save_chain_parent ON save_chain (parent_id)",
+        "CREATE INDEX IF NOT EXISTS idx_save_manifest_hash ON save_manifest (hash)",
+        # 既有内容寻址存档都是完整清单，登记为关键帧
+        """
+        INSERT OR IGNORE INTO save_chain (save_id, parent_id, keyframe, depth)
+        SELECT DISTINCT save_id, NULL, 1, 0 FROM save_manifest
+        """,
+    ],
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def migrate(conn):
+    """将已有数据库升级到最新结构，返回升级后的版本号（事务由调用方提交）"""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for target in range(version, SCHEMA_VERSION):
+        for statement in MIGRATIONS[target]:
+            conn.execute(statement)
+        conn.execute(f"PRAGMA user_version = {target + 1}")
+    return max(version, SCHEMA_VERSION)
+
+
+def create_schema(conn):
+    """建立存档表并执行全部迁移"""
     cursor = conn.cursor()
-    
+
+    # 新库启用增量回收，压缩时可用 incremental_vacuum 归还空闲页（对已有表的库不生效）
+    cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+
     # 创建存档表
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS game_saves (
@@ -24,10 +108,18 @@ def init_db():
             metadata_json TEXT
         )
     """)
-    
+    return migrate(conn)
+
+
+def init_db(db_path=None):
+    db_path = Path(db_path) if db_path else DB_PATH
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+
+    conn = sqlite3.connect(db_path)
+    create_schema(conn)
     conn.commit()
     conn.close()
-    print(f"数据库初始化成功：{DB_PATH}")
+    print(f"数据库初始化成功：{db_path}")
 
 if __name__ == "__main__":
     init_db()
@@ -0,0 +1,70 @@
+"""
+实体状态增量：相邻两个版本之间只记录变动的字段，长文本字段按行记录替换片段。
+状态约定为 JSON 可序列化的字典（如主角快照 {"hp": ..., "location": ..., "full_sheet": ...}）。
+"""
+import difflib
+
+# 超过该长度的文本字段按行求差，短字段直接整体替换
+TEXT_DIFF_MIN_LENGTH = 200
+
+
+def make_delta(old, new):
+    """
+    计算 old -> new 的增量：
+    {"set": {字段: 新值}, "text": {字段: [[起始行, 结束行, [新行...]], ...]}, "del": [字段...]}
+    """
+    delta = {"set": {}, "text": {}, "del": [k for k in old if k not in new]}
+    for key, value in new.items():
+        if key in old and old[key] == value:
+            continue
+        previous = old.get(key)
+        if (isinstance(value, str) and isinstance(previous, str)
+                and max(len(value), len(previous)) >= TEXT_DIFF_MIN_LENGTH):
+            delta["text"][key] = _line_ops(previous, value)
+        else:
+            delta["set"][key] = value
+    return {k: v for k, v in delta.items() if v}
+
+
+def apply_delta(old, delta):
+    """将增量应用到 old，返回新状态（不修改 old）"""
+    state = dict(old)
+    for key in delta.get("del", []):
+        state.pop(key, None)
+    state.update(delta.get("set", {}))
+    for key, ops in delta.get("text", {}).items():
+        lines = state.get(key, "").splitlines(keepends=True)
+        # 从后往前替换，前面的行号不受影响
+        for start, end, replacement in reversed(ops):
+            lines[start:end] = replacement
+        state[key] = "".join(lines)
+    return state
+
+
+def _line_ops(old_text, new_text):
+    old_lines = old_text.splitlines(keepends=True)
+    new_lines = new_text.splitlines(keepends=True)
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    return [
+        [i1, i2, new_lines[j1:j2]]
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != "equal"
+    ]
+
+
+def describe_changes(old, new):
+    """
+    对比两个状态，返回可读的变动说明：
+    {字段: {"old": 旧值, "new": 新值}}，长文本字段给出 {"diff": [统一差异行...]}。
+    """
+    changes = {}
+    for key in sorted(set(old) | set(new), key=str):
+        before, after = old.get(key), new.get(key)
+        if before == after:
+            continue
+        if (isinstance(before, str) and isinstance(after, str)
+                and max(len(before), len(after)) >= TEXT_DIFF_MIN_LENGTH):
+            changes[key] = {"diff": list(difflib.unified_diff(
+                before.splitlines(), after.splitlines(), lineterm="", n=0))[2:]}
+        else:
+            changes[key] = {"old": before, "new": after}
+    return changes
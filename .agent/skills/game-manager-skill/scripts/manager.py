@@ -1,51 +1,265 @@
+import time
+_IMPORT_STARTED = time.perf_counter()
+
 import os
+import sys
 import json
-import re
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime
-from persistence import save_game, load_game
-from memory import GameMemory
+from content_cache import ContentCache
+from watcher import ReferenceWatcher
+from tracing import traced, span
+
+# 启动开销：存档库（persistence）、记忆库（memory）、资料卡解析、线程池与 difflib 均在首次使用时才导入，
+# 只读校验类命令（如 --check-story）不会连接 SQLite 或执行建表语句。
+
+# 主角资料卡解析器由 protagonist-skill 提供，各技能共用（首次使用时导入）
+sys.path.append(str(Path(__file__).parent.parent.parent / "protagonist-skill" / "scripts"))
+
+# 读档时并行写回参考文件的线程数上限
+WRITE_WORKERS = 8
+
+# 只读命令的冷启动预算（毫秒，进程内：模块导入 + 初始化 + 执行，不含解释器自身启动）
+STARTUP_BUDGET_MS = 50
+
+# 启动阶段耗时记录：[(阶段名, 毫秒)]，由 --startup-profile 打印
+STARTUP_PHASES = []
+STARTUP_TIMES = {"import": (time.perf_counter() - _IMPORT_STARTED) * 1000}
+
+# 延迟导入的模块：剖析时报告本次运行实际加载了哪些
+LAZY_MODULES = ("persistence", "memory", "sqlite3", "character_sheet", "story_checker",
+                "concurrent.futures", "difflib")
+
+
+@contextmanager
+def startup_phase(name):
+    """记录一个启动阶段（模块导入、延迟初始化等一次性开销）的耗时"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STARTUP_PHASES.append((name, (time.perf_counter() - start) * 1000))
+
+
+def atomic_write_text(path, content):
+    """先写同目录下的临时文件再原子替换，读者不会看到写了一半的文件"""
+    with span("file.write", "io", path=path.name):
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_text(content, encoding="utf-8")
+        os.replace(tmp_path, path)
 
 class SkillRegistry:
     """
     功法名册：管理所有已登记的 Agent Skills 及其元数据。
+    扫描结果缓存在清单文件中，以目录 mtime 校验：启动时每个技能只需 stat 两次，
+    只有目录发生变动的技能才重新扫描；SKILL.md 元数据在首次访问时解析并写回缓存。
     """
-    def __init__(self, skills_dir):
+    CACHE_VERSION = 2
+    DEFAULT_CACHE_PATH = Path(__file__).parent.parent / "assets" / "registry_cache.json"
+
+    def __init__(self, skills_dir, cache_path=None):
         self.skills_dir = skills_dir
+        self.cache_path = Path(cache_path) if cache_path else self.DEFAULT_CACHE_PATH
         self.registry = {}
-        self.load_registry()
+        self._cache = {}
+        self._cache_dirty = False
+        with startup_phase("注册表加载"):
+            self.load_registry()
+
+    def _read_cache(self):
+        try:
+            cache = json.loads(self.cache_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        if cache.get("version") != self.CACHE_VERSION or cache.get("skills_dir") != str(self.skills_dir):
+            return {}
+        return cache
+
+    def _write_cache(self):
+        if not self._cache_dirty:
+            return
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(self._cache, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp_path, self.cache_path)
+            self._cache_dirty = False
+        except OSError:
+            # 缓存只是加速手段，写失败不影响功能
+            pass
+
+    @staticmethod
+    def _mtime(path):
+        try:
+            return path.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def _scan_skill(self, skill_path, dir_mtime, refs_mtime):
+        ref_dir = skill_path / "references"
+        return {
+            "dir_mtime": dir_mtime,
+            "refs_mtime": refs_mtime,
+            "references": sorted(f.name for f in ref_dir.glob("*.md")) if refs_mtime is not None else [],
+            "has_scripts": (skill_path / "scripts").exists()
+        }
 
+    @traced("registry.load")
     def load_registry(self):
-        """扫描并加载所有技能的元数据"""
-        if not self.skills_dir.exists():
+        """加载所有技能的元数据（优先使用清单缓存，仅重扫发生变动的技能）"""
+        dir_mtime = self._mtime(self.skills_dir)
+        if dir_mtime is None:
             return
-        for skill_path in self.skills_dir.iterdir():
-            if skill_path.is_dir():
-                skill_md = skill_path / "SKILL.md"
-                if skill_md.exists():
-                    # 这里可以解析 YAML 元数据，暂时简单记录
-                    self.registry[skill_path.name] = {
-                        "path": skill_path,
-                        "references": [f.name for f in (skill_path / "references").glob("*.md")] if (skill_path / "references").exists() else [],
-                        "has_scripts": (skill_path / "scripts").exists()
-                    }
+        cache = self._read_cache()
+        cached_skills = cache.get("skills", {})
+        cached_others = cache.get("other_dirs", {})
+
+        # 技能目录本身未变动时，名单直接取自缓存：已登记的技能与尚无 SKILL.md 的子目录
+        # （在已有子目录中新建 SKILL.md 只改变该子目录的 mtime，技能目录的 mtime 不变）
+        if cache.get("skills_dir_mtime") == dir_mtime:
+            names = sorted({*cached_skills, *cached_others})
+        else:
+            names = sorted(p.name for p in self.skills_dir.iterdir() if p.is_dir())
+            self._cache_dirty = True
+
+        skills, other_dirs = {}, {}
+        for name in names:
+            skill_path = self.skills_dir / name
+            skill_mtime = self._mtime(skill_path)
+            refs_mtime = self._mtime(skill_path / "references")
+            entry = cached_skills.get(name)
+            if entry and entry["dir_mtime"] == skill_mtime and entry["refs_mtime"] == refs_mtime:
+                skills[name] = entry
+            elif skill_mtime is not None and (skill_path / "SKILL.md").exists():
+                skills[name] = self._scan_skill(skill_path, skill_mtime, refs_mtime)
+                self._cache_dirty = True
+            else:
+                if skill_mtime is not None:
+                    other_dirs[name] = skill_mtime
+                if entry or cached_others.get(name) != skill_mtime:
+                    self._cache_dirty = True
+
+        self._cache = {
+            "version": self.CACHE_VERSION,
+            "skills_dir": str(self.skills_dir),
+            "skills_dir_mtime": dir_mtime,
+            "skills": skills,
+            "other_dirs": other_dirs
+        }
+        self.registry = {
+            name: {
+                "path": self.skills_dir / name,
+                "references": entry["references"],
+                "has_scripts": entry["has_scripts"]
+            }
+            for name, entry in skills.items()
+        }
+        self._write_cache()
 
     def get_skill(self, name):
         return self.registry.get(name)
 
+    def get_metadata(self, name):
+        """读取技能 SKILL.md 的 frontmatter（name、description 等），按 SKILL.md 的 mtime 缓存"""
+        entry = self._cache.get("skills", {}).get(name)
+        if entry is None:
+            return None
+        skill_md = self.skills_dir / name / "SKILL.md"
+        md_mtime = self._mtime(skill_md)
+        if entry.get("skill_md_mtime") != md_mtime or "metadata" not in entry:
+            entry["metadata"] = parse_frontmatter(skill_md.read_text(encoding="utf-8")) if md_mtime else {}
+            entry["skill_md_mtime"] = md_mtime
+            self._cache_dirty = True
+            self._write_cache()
+        return entry["metadata"]
+
+
+def _line_changes(old_text, new_text):
+    """统计 old -> new 新增与删除的行数"""
+    added = removed = 0
+    import difflib
+    matcher = difflib.SequenceMatcher(None, old_text.splitlines(), new_text.splitlines(), autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag != "equal":
+            removed += i2 - i1
+            added += j2 - j1
+    return added, removed
+
+
+def format_diff_report(report):
+    """把 apply_global_snapshot(dry_run=True) 的差异报告格式化为文本"""
+    if not report:
+        return "当前世界与存档一致，无需变动。"
+    lines = [f"读档将变动 {len(report)} 份文件："]
+    for item in report:
+        lines.append(f"  [{item['action']}] {item['skill']}/{item['file']}  +{item['added']} -{item['removed']} 行")
+    return "\n".join(lines)
+
+
+def parse_frontmatter(text):
+    """解析 Markdown 顶部 --- 包围的简单 YAML 键值（仅支持单行 key: value）"""
+    lines = text.splitlines()
+    if not lines or lines[0].strip() != "---":
+        return {}
+    metadata = {}
+    for line in lines[1:]:
+        if line.strip() == "---":
+            break
+        key, sep, value = line.partition(":")
+        if sep and key.strip() and not line.startswith((" ", "\t")):
+            metadata[key.strip()] = value.strip().strip("\"'")
+    return metadata
+
 class SkillManager:
     """
     造化主控：通过 SkillRegistry 动态管理所有 Agent Skills。
     """
-    def __init__(self):
-        # __file__ 为 .../.agent/skills/game-manager-skill/scripts/manager.py
-        # .parent.parent.parent.parent 为 .agent 目录
-        # .parent.parent.parent.parent.parent 为项目根目录
-        self.base_dir = Path(__file__).parent.parent.parent.parent.parent
-        self.skills_dir = self.base_dir / ".agent" / "skills"
-        self.registry = SkillRegistry(self.skills_dir)
-        self.memory = GameMemory()
+    def __init__(self, autosave=False, base_dir=None):
+        """base_dir 指定另一个项目根目录（如基准测试生成的虚拟江湖），其存档库与记忆库均位于该目录内"""
+        if base_dir is None:
+            # __file__ 为 .../.agent/skills/game-manager-skill/scripts/manager.py
+            # .parent.parent.parent.parent 为 .agent 目录
+            # .parent.parent.parent.parent.parent 为项目根目录
+            self.base_dir = Path(__file__).parent.parent.parent.parent.parent
+            self.skills_dir = self.base_dir / ".agent" / "skills"
+            self.db_path = None   # 使用 persistence 的默认存档库
+            self.registry = SkillRegistry(self.skills_dir)
+            self._memory_path = None
+        else:
+            self.base_dir = Path(base_dir)
+            self.skills_dir = self.base_dir / ".agent" / "skills"
+            assets_dir = self.skills_dir / "game-manager-skill" / "assets"
+            self.db_path = assets_dir / "saves" / "wuxiaX.db"
+            self.registry = SkillRegistry(self.skills_dir, assets_dir / "registry_cache.json")
+            self._memory_path = assets_dir / "game_memory.db"
+        self._memory = None
+        self._intel_module = None   # 非默认项目根目录时单独加载的情报模块
         self.active_skills = self.registry.registry # 兼容旧接口
+        # 参考文件读写与快照互斥，保证后台存档读到的是完整文件
+        self._io_lock = threading.RLock()
+        # 参考文件内容缓存（按 mtime/size 校验，写入时回填）
+        self.content_cache = ContentCache()
+        # 参考文件脏集合追踪：快照只重新读取、重新求哈希变动过的文件
+        self.watcher = ReferenceWatcher(
+            {name: info["path"] / "references" for name, info in self.active_skills.items()})
+        self._ref_state = {}   # (技能名, 文件名) -> (内容, 哈希)
+        self.autosaver = None
+        self.compactor = None
+        if autosave:
+            self.enable_autosave()
+
+    @property
+    def memory(self):
+        """长期记忆库：首次访问时才导入 memory 模块、连接 SQLite 并建表"""
+        if self._memory is None:
+            with self._io_lock:
+                if self._memory is None:
+                    with startup_phase("init memory（导入 + 连接 + 建表）"):
+                        from memory import GameMemory
+                        self._memory = GameMemory(self._memory_path) if self._memory_path else GameMemory()
+        return self._memory
 
     def get_skill_data(self, skill_name, reference_file):
         """读取指定技能的参考数据内容"""
@@ -53,9 +267,7 @@ class SkillManager:
             return None
 
         target_path = self.active_skills[skill_name]["path"] / "references" / reference_file
-        if target_path.exists():
-            return target_path.read_text(encoding="utf-8")
-        return None
+        return self.content_cache.read(target_path)
 
     def update_skill_data(self, skill_name, reference_file, new_content):
         """落笔修改指定技能的参考数据，并记录变动至记忆"""
@@ -63,136 +275,337 @@ class SkillManager:
             print(f"错误：未发现功法 {skill_name}")
             return False
 
-        ref_dir = self.active_skills[skill_name]["path"] / "references"
-        ref_dir.mkdir(parents=True, exist_ok=True)
-        target_path = ref_dir / reference_file
-
-        # 记录变动前的记忆（可选）
-        old_content = target_path.read_text(encoding="utf-8") if target_path.exists() else "（新创）"
-
-        target_path.write_text(new_content, encoding="utf-8")
-
+        old_contents = self._write_references({(skill_name, reference_file): new_content})
         # 铭刻变动记忆
+        self._log_change(skill_name, reference_file, old_contents[(skill_name, reference_file)], new_content)
+        return True
+
+    @traced("file.write_batch")
+    def _write_references(self, contents):
+        """
+        写入一批参考文件 {(技能名, 文件名): 内容}：多个文件时由线程池并行写入，
+        每个文件都经临时文件原子替换。返回各文件写入前的内容（不存在为 None）。
+        """
+        def write(item):
+            (skill_name, filename), content = item
+            ref_dir = self.active_skills[skill_name]["path"] / "references"
+            ref_dir.mkdir(parents=True, exist_ok=True)
+            atomic_write_text(ref_dir / filename, content)
+
+        with self._io_lock:
+            paths = {key: self.active_skills[key[0]]["path"] / "references" / key[1] for key in contents}
+            old_contents = {key: self.content_cache.read(path) for key, path in paths.items()}
+            if len(contents) > 1:
+                from concurrent.futures import ThreadPoolExecutor
+                with ThreadPoolExecutor(max_workers=min(WRITE_WORKERS, len(contents))) as pool:
+                    list(pool.map(write, contents.items()))
+            else:
+                for item in contents.items():
+                    write(item)
+            for key, content in contents.items():
+                self.content_cache.put(paths[key], content)
+                self.watcher.mark(*key)
+        return old_contents
+
+    def _log_change(self, skill_name, reference_file, old_content, new_content):
+        if old_content is None:
+            old_content = "（新创）"
         self.memory.add_long_term(
             "世界变动",
             f"修改了 {skill_name} 的 {reference_file}",
             f"旧貌：{old_content[:50]}... 新颜：{new_content[:50]}..."
         )
+
+    def get_character_sheet(self):
+        """读取并解析主角资料卡，文件不存在时返回 None"""
+        content = self.get_skill_data("protagonist-skill", "character_sheet.md")
+        if not content:
+            return None
+        from character_sheet import CharacterSheet
+        with span("regex.character_sheet", "regex"):
+            return CharacterSheet(content)
+
+    def save_character_sheet(self, sheet):
+        """写回修改过的主角资料卡（未修改时不落盘）"""
+        if not sheet.changed:
+            return False
+        self.update_skill_data("protagonist-skill", "character_sheet.md", sheet.render())
+        sheet.changed_lines.clear()
         return True
 
     def take_global_snapshot(self):
         """
         遍览诸般功法，摄取当前世界所有 Skill 的状态快照。
         """
+        return self._take_snapshot()[0]
+
+    @traced("snapshot.take")
+    def _take_snapshot(self):
+        """摄取快照，同时返回各文件的内容哈希 {(技能名, 文件名): 哈希}"""
         snapshot = {
             "skills": {},
             "world_time": datetime.now().isoformat()
         }
-        for skill_name, info in self.active_skills.items():
-            snapshot["skills"][skill_name] = {}
-            ref_dir = info["path"] / "references"
-            if ref_dir.exists():
-                for ref_file in ref_dir.glob("*.md"):
-                    content = ref_file.read_text(encoding="utf-8")
-                    snapshot["skills"][skill_name][ref_file.name] = content
-        
-        # 摄取短期记忆作为剧情衔接
+        hashes = {}
+        with self._io_lock:
+            self._refresh_references()
+            for skill_name in self.active_skills:
+                snapshot["skills"][skill_name] = {}
+            for (skill_name, filename), (content, digest) in sorted(self._ref_state.items()):
+                snapshot["skills"][skill_name][filename] = content
+                hashes[(skill_name, filename)] = digest
+
+            # 摄取短期记忆作为剧情衔接
+            short_term = list(self.memory.short_term)
         snapshot["memory"] = {
-            "short_term": self.memory.short_term,
-            "last_log": self.memory.short_term[-1]["narrative"] if self.memory.short_term else ""
+            "short_term": short_term,
+            "last_log": short_term[-1]["narrative"] if short_term else ""
         }
-        return snapshot
+        return snapshot, hashes
+
+    @traced("snapshot.refresh_dirty")
+    def _refresh_references(self):
+        """只重新读取脏集合中的参考文件并更新哈希，其余沿用上次的结果"""
+        from persistence import content_hash
+        with self._io_lock:
+            for skill_name, filename in self.watcher.drain():
+                path = self.active_skills[skill_name]["path"] / "references" / filename
+                content = self.content_cache.read(path)
+                if content is None:
+                    self._ref_state.pop((skill_name, filename), None)
+                else:
+                    self._ref_state[(skill_name, filename)] = (content, content_hash(content))
+
+    def watch_references(self, interval=2.0):
+        """开启后台轮询：定期发现外部修改并预先读取、求哈希，存档时几乎无需再读文件"""
+        self.watcher.start(interval, self._refresh_references)
+        return self.watcher
+
+    def diff_snapshot(self, snapshot):
+        """
+        对比快照与当前参考文件，返回有差异的文件 [(技能名, 文件名, 存档哈希, 当前哈希或 None)]。
+        当前文件的哈希取自增量快照缓存（只重新读取变动过的文件）；
+        惰性快照（persistence.LazySnapshot）直接使用清单中的哈希，不读取存档内容。
+        """
+        from persistence import content_hash
+        with self._io_lock:
+            self._refresh_references()
+            current = {key: digest for key, (_, digest) in self._ref_state.items()}
 
-    def apply_global_snapshot(self, snapshot):
+        diffs = []
+        for skill_name, files in snapshot["skills"].items():
+            if skill_name not in self.active_skills:
+                continue
+            hashes = getattr(files, "hashes", None)
+            for filename in files:
+                digest = hashes[filename] if hashes is not None else content_hash(files[filename])
+                existing = current.get((skill_name, filename))
+                if existing != digest:
+                    diffs.append((skill_name, filename, digest, existing))
+        return diffs
+
+    def _diff_contents(self, snapshot, diffs):
+        """取出有差异文件的存档内容（惰性快照一次批量读取）"""
+        if hasattr(snapshot, "fetch"):
+            contents = snapshot.fetch([digest for _, _, digest, _ in diffs])
+            return {(s, f): contents[digest] for s, f, digest, _ in diffs}
+        return {(s, f): snapshot["skills"][s][f] for s, f, _, _ in diffs}
+
+    @traced("snapshot.apply")
+    def apply_global_snapshot(self, snapshot, restore_memory=True, dry_run=False):
         """
         万法归宗：将快照中的数据回写到各 Skill 的 references 目录（差异对比机制）。
+        按内容哈希比对，只读取并写回存在差异的文件；写入并行进行，变动记忆在同一事务内提交。
+        dry_run=True 时不做任何修改，返回差异报告（见 format_diff_report）。
         """
         if not snapshot or "skills" not in snapshot:
             return False
 
         print(">>> 正在核对世界线差异...")
-        for skill_name, files in snapshot["skills"].items():
-            for filename, content in files.items():
-                target_path = self.active_skills.get(skill_name, {}).get("path")
-                if target_path:
-                    target_file = target_path / "references" / filename
-                    # 差异判定
-                    if target_file.exists():
-                        current_content = target_file.read_text(encoding="utf-8")
-                        if current_content != content:
-                            print(f"检测到差异：{skill_name}/{filename}，正在同步至数据库版本。")
-                            self.update_skill_data(skill_name, filename, content)
-                    else:
-                        print(f"补全缺失文件：{skill_name}/{filename}")
-                        self.update_skill_data(skill_name, filename, content)
-        
+        diffs = self.diff_snapshot(snapshot)
+        contents = self._diff_contents(snapshot, diffs)
+
+        if dry_run:
+            report = []
+            for skill_name, filename, _, existing in diffs:
+                new_content = contents[(skill_name, filename)]
+                old_content = self._ref_state[(skill_name, filename)][0] if existing else ""
+                added, removed = _line_changes(old_content, new_content)
+                report.append({"skill": skill_name, "file": filename,
+                               "action": "修改" if existing else "新增", "added": added, "removed": removed})
+            return report
+
+        for skill_name, filename, _, existing in diffs:
+            if existing:
+                print(f"检测到差异：{skill_name}/{filename}，正在同步至数据库版本。")
+            else:
+                print(f"补全缺失文件：{skill_name}/{filename}")
+
+        if contents:
+            old_contents = self._write_references(contents)
+            # 所有变动记忆在同一事务内提交
+            with self.memory.batch():
+                for (skill_name, filename), content in contents.items():
+                    self._log_change(skill_name, filename, old_contents[(skill_name, filename)], content)
+
         # 恢复短期记忆
-        if "memory" in snapshot and "short_term" in snapshot["memory"]:
+        if restore_memory and "memory" in snapshot and "short_term" in snapshot["memory"]:
             self.memory.short_term = snapshot["memory"]["short_term"]
             
         return True
 
-    def execute_full_save(self, chapter="未知", location="未知"):
-        """执行完整存档：抓取所有 Skill 状态并存入 SQLite 数据库"""
-        data = self.take_global_snapshot()
+    def execute_full_save(self, chapter="未知", location="未知", background=False):
+        """
+        执行完整存档：抓取所有 Skill 状态并存入 SQLite 数据库。
+        background=True 且已开启自动存档时，仅提交请求并立即返回 None。
+        """
+        if background and self.autosaver:
+            self.autosaver.submit(chapter=chapter, location=location)
+            return None
+        return self._write_full_save(chapter, location)
+
+    @traced("game.save")
+    def _write_full_save(self, chapter="未知", location="未知"):
+        data, hashes = self._take_snapshot()
         # 自动尝试从小模块提取位置
         if location == "未知":
-            sheet = self.get_skill_data("protagonist-skill", "character_sheet.md")
-            loc_match = re.search(r"当前位置\*\*：(.*?)$", sheet, re.M) if sheet else None
-            location = loc_match.group(1) if loc_match else "未知"
-
-        return save_game(data, chapter=chapter, location=location)
+            sheet = self.get_character_sheet()
+            location = (sheet.location if sheet else None) or "未知"
+
+        from persistence import save_game
+        return save_game(data, chapter=chapter, location=location, db_path=self.db_path, hashes=hashes)
+
+    def enable_autosave(self):
+        """开启后台自动存档：剧情事件处理后只提交请求，由写入线程落库"""
+        if self.autosaver is None:
+            from autosave import AutosaveWriter
+            self.autosaver = AutosaveWriter(self._write_full_save)
+        return self.autosaver
+
+    def flush_autosave(self, timeout=None):
+        """等待后台存档全部落库，返回最近一次存档 ID"""
+        if self.autosaver:
+            return self.autosaver.flush(timeout)
+        return None
 
-    def execute_full_load(self, save_id=None):
-        """执行完整读档：从本地数据库恢复数据并同步至各 Skill 目录"""
-        data = load_game(save_id)
-        if data:
-            return self.apply_global_snapshot(data)
+    def shutdown(self, timeout=None):
+        """关闭自动存档、后台压缩与文件监视线程（退出前调用，确保最后一份存档写入）"""
+        if self.autosaver:
+            self.autosaver.close(timeout)
+            self.autosaver = None
+        if self.compactor:
+            self.compactor.stop(timeout)
+            self.compactor = None
+        self.watcher.stop(timeout)
+
+    @traced("game.load")
+    def execute_full_load(self, save_id=None, skills=None, files=None, dry_run=False):
+        """
+        执行完整读档：从本地数据库恢复数据并同步至各 Skill 目录。
+        指定 skills / files 时只恢复对应技能或文件（不恢复短期记忆），其余内容不会被读取。
+        dry_run=True 时只返回差异报告，不修改任何文件。
+        """
+        if self.autosaver:
+            # 先让未落库的存档写完，避免读到旧档
+            self.autosaver.flush()
+        from persistence import open_snapshot
+        snapshot = open_snapshot(save_id, skills=skills, files=files, db_path=self.db_path)
+        if snapshot:
+            return self.apply_global_snapshot(snapshot, restore_memory=not (skills or files), dry_run=dry_run)
         return False
 
+    def list_save_slots(self, limit=20, before_id=None, chapter=None, location=None):
+        """分页列出存档槽（只读元数据索引），返回 (存档列表, 下一页游标)"""
+        from persistence import list_saves
+        slots = list_saves(limit=limit, before_id=before_id, chapter=chapter, location=location,
+                           db_path=self.db_path)
+        next_cursor = slots[-1]["save_id"] if len(slots) == limit else None
+        return slots, next_cursor
+
+    def compact_saves(self, policy=None, full_vacuum=False):
+        """按保留策略压缩存档库（默认：最近一小时全保留，更早的每章保留最新一份）"""
+        from retention import compact
+        if self.autosaver:
+            self.autosaver.flush()
+        result = compact(policy, db_path=self.db_path, full_vacuum=full_vacuum)
+        print(f">>> 存档压缩完成：删除 {result['deleted']} 份存档，回收 {result['blobs']} 个内容块。")
+        return result
+
+    def schedule_compaction(self, interval=600, policy=None):
+        """开启后台定时压缩（与自动存档并行，不阻塞存档写入）"""
+        from retention import CompactionScheduler
+        self.compactor = CompactionScheduler(interval, policy, self.db_path)
+        return self.compactor
+
+    @traced("game.reset")
     def reset_game_state(self):
         """
         万象更新：重置游戏世界至初始状态。
-        1. 从 templates 目录还原 references。
-        2. 清空存档数据库。
+        1. 从 templates 目录还原 references（内容哈希与模板一致的文件跳过）。
+        2. 清空存档数据库（删表重建）。
         3. 清空历史章节。
+        返回各阶段耗时（秒）与还原的文件数。
         """
+        from persistence import content_hash, reset_saves
         print(">>> 正在初始化江湖世界...")
+        timings = {}
+        started = time.perf_counter()
 
-        # 1. 还原模板
+        # 1. 还原模板：只写回与模板不一致的文件，并行写入
+        templates = {}
         for skill_name, info in self.active_skills.items():
             template_dir = info["path"] / "templates"
-            if template_dir.exists():
-                for template_file in template_dir.glob("*.md"):
-                    content = template_file.read_text(encoding="utf-8")
-                    self.update_skill_data(skill_name, template_file.name, content)
-                    print(f"  - 已重置功法数据：{skill_name}/{template_file.name}")
+            if template_dir.is_dir():
+                for entry in os.scandir(template_dir):
+                    if entry.name.endswith(".md") and entry.is_file():
+                        templates[(skill_name, entry.name)] = self.content_cache.read(entry.path)
+        with self._io_lock:
+            self._refresh_references()
+            changed = {
+                key: content for key, content in templates.items()
+                if self._ref_state.get(key, (None, None))[1] != content_hash(content)
+            }
+            if changed:
+                self._write_references(changed)
+        for skill_name, filename in sorted(changed):
+            print(f"  - 已重置功法数据：{skill_name}/{filename}")
+        print(f"  - 功法数据共 {len(templates)} 份，{len(templates) - len(changed)} 份与模板一致已跳过。")
+        timings["templates"] = time.perf_counter() - started
 
         # 2. 清空存档数据库
-        from persistence import DB_PATH
-        if DB_PATH.exists():
-            import sqlite3
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM game_saves")
-            conn.commit()
-            conn.close()
+        phase = time.perf_counter()
+        if self.autosaver:
+            self.autosaver.flush()
+        if reset_saves(self.db_path):
             print("  - 已清除所有江湖存档。")
+        timings["saves"] = time.perf_counter() - phase
 
         # 3. 清空历史章节
+        phase = time.perf_counter()
         chapters_dir = self.base_dir / "history" / "chapters"
-        if chapters_dir.exists():
-            for chapter_file in chapters_dir.glob("*.md"):
-                chapter_file.unlink()
+        if chapters_dir.is_dir():
+            for entry in os.scandir(chapters_dir):
+                if entry.name.endswith(".md") and entry.is_file():
+                    os.unlink(entry.path)
             print("  - 已粉碎所有历史残章。")
+        timings["chapters"] = time.perf_counter() - phase
 
-        # 4. 重置记忆
+        # 4. 重置记忆：只铭刻一条重置摘要
         self.memory.short_term = []
         # 可以选择是否清空长期记忆数据库，目前保留
-        
+        if changed:
+            self.memory.add_long_term(
+                "世界变动", f"江湖重置，还原了 {len(changed)} 份功法数据",
+                "、".join(f"{s}/{f}" for s, f in sorted(changed)))
+
+        timings["total"] = time.perf_counter() - started
+        timings["files"] = len(changed)
+        print(f"  - 耗时：模板 {timings['templates'] * 1000:.1f} ms，存档库 {timings['saves'] * 1000:.1f} ms，"
+              f"章节 {timings['chapters'] * 1000:.1f} ms，合计 {timings['total'] * 1000:.1f} ms")
         print("\n>>> 江湖已重置，乾坤再启。")
-        return True
+        return timings
 
+    @traced("game.sync")
     def trigger_global_sync(self):
         """
         全局同步钩子：章节结束后检索所有 Skill 是否需要更新。
@@ -206,29 +619,17 @@ class SkillManager:
         print("\n>>> 全局同步校验完成，江湖因果已锁定。")
         return True
 
+    @traced("story.check")
     def check_story_content(self, content):
         """
-        文案质量校检：
-        1. 检测是否存在 (省略/略写/...) 等占位符。
-        2. 检测总字数是否达到 5,000 字标准。
+        文案质量校检（见 story_checker.py，一次扫描完成）：
+        1. 检测是否存在 (省略/略写/...) 等占位符，报告每一处命中的位置。
+        2. 检测有效字数（不计 markdown 符号与空白）是否达到 5,000 字标准。
+        content 可以是文案字符串、文件路径（Path）或文本流。
         """
-        errors = []
-
-        # 1. 占位符检测 (针对常见的中英文括号省略表达)
-        placeholders = [
-            r"\(.*?省略.*?\)", r"（.*?省略.*?）",
-            r"\(.*?略写.*?\)", r"（.*?略写.*?）",
-            r"\(.*?待续.*?\)", r"（.*?待续.*?）",
-            r"省略后续", r"后续细节", r"字细节"
-        ]
-        for pattern in placeholders:
-            if re.search(pattern, content):
-                errors.append(f"检测到占位符/略写痕迹：'{re.search(pattern, content).group()}'。请展开描写，严禁使用概括性描述替代正文。")
-
-        # 2. 字数检测
-        char_count = len(content)
-        if char_count < 5000:
-            errors.append(f"当前文案长度为 {char_count} 字，未达到 5,000 字的最低标准。请继续扩充细节、心理描写、环境烘托或支线对话。")
+        from story_checker import check_story, format_errors
+        result = check_story(content)
+        errors = format_errors(result)
 
         if errors:
             print("\n[ERROR] 文案校验未通过：")
@@ -236,61 +637,165 @@ class SkillManager:
                 print(f"  - {err}")
             return False
 
-        print(f"\n[SUCCESS] 文案校验通过！总长度：{char_count} 字。")
+        print(f"\n[SUCCESS] 文案校验通过！有效字数：{result['chars']} 字。")
         return True
 
+    @traced("sync.protagonist")
     def sync_protagonist_to_memory(self):
         """将主角当前状态快照同步至记忆库"""
-        content = self.get_skill_data("protagonist-skill", "character_sheet.md")
-        if content:
+        sheet = self.get_character_sheet()
+        if sheet:
             # 提取核心数据用于记忆显示
-            hp_match = re.search(r"气血 \(HP\)\*\*：(\d+) / (\d+)", content)
-            location_match = re.search(r"当前位置\*\*：(.*?)$", content, re.M)
-
+            hp = sheet.hp
             data = {
-                "hp": hp_match.group(1) if hp_match else "未知",
-                "location": location_match.group(1) if location_match else "未知",
-                "full_sheet": content
+                "hp": str(hp[0]) if hp else "未知",
+                "location": sheet.location or "未知",
+                "full_sheet": sheet.render()
             }
-            self.memory.save_entity_state("protagonist", data)
-            print(f"  - 已捕捉神识快照：位置[{data['location']}] 气血[{data['hp']}]")
+            version = self.memory.save_entity_state("protagonist", data)
+            print(f"  - 已捕捉神识快照（第 {version} 版）：位置[{data['location']}] 气血[{data['hp']}]")
             return True
         return False
 
+    @traced("sync.intelligence")
     def sync_intelligence_system(self):
         """
-        情报系统同步钩子：检查并更新情报系统状态
+        情报系统同步钩子：在进程内读取情报系统的结构化记录并汇报状态，返回活跃情报列表
         """
         print(">>> 正在同步江湖情报系统...")
 
-        # 获取最新情报列表（通过调用 intelligence_manager.py）
-        import subprocess
-        result = subprocess.run(
-            ["python", ".agent/skills/intelligence-skill/scripts/intelligence_manager.py", "--list"],
-            capture_output=True,
-            text=True,
-            encoding="utf-8"
-        )
-
-        print(f"  - 情报系统状态：{result.stdout[:200] if result.stdout else '无情报'}")
+        intel = self.intelligence_api()
+        if intel is None:
+            print("  - 情报系统状态：未安装情报技能")
+            return []
+        with span("intel.load", "db"):
+            records = intel.load_intelligence()
+        if records:
+            summary = intel.summarize_intelligence(records)
+            dist = " ".join(f"{t}:{n}" for t, n in summary["types"].items() if n)
+            print(f"  - 情报系统状态：活跃情报 {summary['count']} 条（{dist}），最高等级【{summary['max_level']}】")
+            for r in records[:3]:
+                print(f"    [{r['level']}] {r['id']} {r['content']}（{r['location']}）")
+        else:
+            print("  - 情报系统状态：无情报")
         print("\n>>> 江湖情报同步完成。")
-        return True
+        return records
+
+    def intelligence_api(self):
+        """导入情报技能的脚本模块（按注册表中的技能路径定位，与当前工作目录无关）"""
+        info = self.active_skills.get("intelligence-skill")
+        if not info:
+            return None
+        scripts_dir = str(info["path"] / "scripts")
+        if scripts_dir not in sys.path:
+            sys.path.append(scripts_dir)
+        import intelligence_manager
+        module_path = info["path"] / "scripts" / "intelligence_manager.py"
+        if Path(intelligence_manager.__file__).resolve() == module_path.resolve():
+            return intelligence_manager
+        # 另一项目根目录（如临时复制的江湖）的情报技能：按文件单独加载，使其读写该目录下的情报库
+        if self._intel_module is None:
+            import importlib.util
+            spec = importlib.util.spec_from_file_location(f"intelligence_manager_{id(self)}", module_path)
+            self._intel_module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(self._intel_module)
+        return self._intel_module
 
     def process_story_event(self, event_type, description, impact_data=None):
         """
         根据剧情发展动态驱动技能数据修改。
         event_type: 事件类型（如 'combat_result', 'travel', 'item_get'）
         """
-        self.memory.add_short_term(description)
+        return self.process_story_events([(event_type, description, impact_data)])
+
+    @traced("story.events")
+    def process_story_events(self, events):
+        """
+        批量处理剧情事件：先把整串事件折叠为各参考文件的最终状态，
+        每个被改动的文件只写一次，所有长期记忆在一个事务内提交。
+        events: (event_type, description, impact_data) 元组，或含 type/description/impact 键的字典。
+          - travel: {"location": 新地点}
+          - combat_result: {"hp": 气血增减, "mp": 内力增减}（结果限制在 0 与上限之间）
+          - item_get: {"item": 物品} 或 {"items": [物品, ...]}
+        返回 {"events": 事件数, "files": [写入的文件], "memories": 新增长期记忆数}
+        """
+        from character_sheet import HP, MP, LOCATION
+        sheet = None
+        sheet_loaded = False
+        memories = []
+        count = 0
+
+        for event in events:
+            if isinstance(event, dict):
+                event_type, description, impact = event.get("type"), event.get("description", ""), event.get("impact")
+            else:
+                event_type, description, impact = (tuple(event) + (None,))[:3]
+            count += 1
+            self.memory.add_short_term(description)
+            if not impact or event_type not in ("travel", "combat_result", "item_get"):
+                continue
+
+            # 资料卡只在第一次需要时读取解析一次，后续事件都在内存中修改
+            if not sheet_loaded:
+                sheet, sheet_loaded = self.get_character_sheet(), True
+            if sheet is None:
+                continue
+
+            if event_type == "travel":
+                new_location = impact.get("location")
+                if new_location:
+                    # 修改主角技能中的位置（只替换该字段所在行；资料卡没有该字段时不修改，不中断整批事件）
+                    if LOCATION in sheet.fields:
+                        sheet.set(LOCATION, new_location)
+                    # 位置未变（或无法记录）时同样记下行踪
+                    memories.append(("行踪", f"抵达了 {new_location}", description))
+            elif event_type == "combat_result":
+                changes = []
+                for field, key in ((HP, "hp"), (MP, "mp")):
+                    delta = impact.get(key)
+                    if delta and sheet.get_ratio(field):
+                        changes.append(f"{field} {sheet.adjust_ratio(field, delta)}")
+                if changes:
+                    memories.append(("战斗", "、".join(changes), description))
+            elif event_type == "item_get":
+                items = list(impact.get("items") or [])
+                if impact.get("item"):
+                    items.append(impact["item"])
+                for item in items:
+                    sheet.add_item(item)
+                if items:
+                    memories.append(("物品", f"获得了 {'、'.join(items)}", description))
+
+        files = []
+        with self.memory.batch():
+            if sheet is not None and self.save_character_sheet(sheet):
+                files.append("protagonist-skill/character_sheet.md")
+            for category, event, details in memories:
+                self.memory.add_long_term(category, event, details)
+
+        if self.autosaver:
+            self.autosaver.submit()
+        return {"events": count, "files": files, "memories": len(memories)}
+
+def print_startup_profile(read_only=False):
+    """打印启动耗时分解（进程内计时，不含解释器自身启动）"""
+    total = (time.perf_counter() - _IMPORT_STARTED) * 1000
+    imported = STARTUP_TIMES["import"]
+    init = STARTUP_TIMES.get("init", 0.0)
+    print("\n[启动剖析]（不含解释器启动）")
+    print(f"  {'模块导入':<10}{imported:>9.1f} ms")
+    print(f"  {'初始化':<11}{init:>9.1f} ms")
+    print(f"  {'命令执行':<10}{total - imported - init:>9.1f} ms")
+    for name, ms in STARTUP_PHASES:
+        print(f"    · {name}：{ms:.1f} ms")
+    loaded = [m for m in LAZY_MODULES if m in sys.modules]
+    skipped = [m for m in LAZY_MODULES if m not in sys.modules]
+    print(f"  延迟加载：已导入 {', '.join(loaded) or '无'}；未导入 {', '.join(skipped) or '无'}")
+    verdict = ""
+    if read_only:
+        verdict = f"（只读命令预算 {STARTUP_BUDGET_MS} ms，{'超出预算' if total > STARTUP_BUDGET_MS else '达标'}）"
+    print(f"  {'合计':<12}{total:>9.1f} ms{verdict}")
 
-        if event_type == "travel" and impact_data:
-            new_location = impact_data.get("location")
-            # 修改主角技能中的位置
-            sheet = self.get_skill_data("protagonist-skill", "character_sheet.md")
-            if sheet:
-                new_sheet = re.sub(r"- \*\*当前位置\*\*：(.*?)$", f"- **当前位置**：{new_location}", sheet, flags=re.M)
-                self.update_skill_data("protagonist-skill", "character_sheet.md", new_sheet)
-                self.memory.add_long_term("行踪", f"抵达了 {new_location}", description)
 
 if __name__ == "__main__":
     import os
@@ -306,10 +811,40 @@ if __name__ == "__main__":
     parser.add_argument("--sync", action="store_true", help="执行全局同步校验")
     parser.add_argument("--save", action="store_true", help="执行全量存档")
     parser.add_argument("--load", action="store_true", help="从最新存档读档")
+    parser.add_argument("--save-id", type=int, help="读档时指定存档 ID（默认最新）")
+    parser.add_argument("--skills", nargs="+", help="读档时只恢复指定技能")
+    parser.add_argument("--files", nargs="+", help="读档时只恢复指定文件名（如 character_sheet.md）")
+    parser.add_argument("--dry-run", action="store_true", help="读档时只列出将被变动的文件，不做修改")
+    parser.add_argument("--list-saves", action="store_true", help="分页列出存档槽")
+    parser.add_argument("--limit", type=int, default=20, help="--list-saves 每页条数")
+    parser.add_argument("--before", type=int, help="--list-saves 分页游标：列出 ID 小于该值的存档")
+    parser.add_argument("--chapter", type=str, help="--list-saves 按章节筛选")
+    parser.add_argument("--location", type=str, help="--list-saves 按地点前缀筛选")
+    parser.add_argument("--compact", action="store_true", help="按保留策略压缩存档库")
+    parser.add_argument("--vacuum", action="store_true", help="--compact 时执行完整 VACUUM")
     parser.add_argument("--check-story", type=str, help="校验故事文案质量与长度")
+    parser.add_argument("--check-story-file", type=str, help="校验故事文件（- 表示从标准输入读取）")
+    parser.add_argument("--trace", type=str, metavar="PATH", help="开启耗时追踪，结束时导出 Chrome Trace JSON 并打印汇总表")
+    parser.add_argument("--serve", action="store_true", help="启动常驻主控，通过 Unix 套接字接收 JSON-RPC 请求（见 client.py）")
+    parser.add_argument("--socket", type=str, help="--serve 的套接字路径（默认 assets/manager.sock）")
+    parser.add_argument("--startup-profile", action="store_true", help="结束时打印模块导入、初始化与执行的耗时分解")
 
     args = parser.parse_args()
+    if args.trace:
+        import tracing
+        tracing.enable(args.trace)
+    if args.serve:
+        from server import serve
+        serve(SkillManager, args.socket)
+        sys.exit(0)
+    if args.startup_profile:
+        import atexit
+        atexit.register(print_startup_profile, read_only=bool(
+            args.check_story or args.check_story_file or args.list_saves or not (
+                args.reset or args.sync or args.save or args.load or args.compact)))
+    init_started = time.perf_counter()
     gm = SkillManager()
+    STARTUP_TIMES["init"] = (time.perf_counter() - init_started) * 1000
 
     if args.reset:
         gm.reset_game_state()
@@ -318,10 +853,29 @@ if __name__ == "__main__":
     elif args.save:
         gm.execute_full_save()
     elif args.load:
-        gm.execute_full_load()
+        result = gm.execute_full_load(args.save_id, skills=args.skills, files=args.files, dry_run=args.dry_run)
+        if args.dry_run and result is not False:
+            print(format_diff_report(result))
+    elif args.compact:
+        gm.compact_saves(full_vacuum=args.vacuum)
+    elif args.list_saves:
+        slots, next_cursor = gm.list_save_slots(args.limit, args.before, args.chapter, args.location)
+        if not slots:
+            print("暂无符合条件的存档。")
+        for slot in slots:
+            size_kb = slot["size_bytes"] / 1024
+            stored_kb = slot["stored_bytes"] / 1024
+            print(f"[{slot['save_id']}] {slot['timestamp'][:19]} | {slot['chapter']} | {slot['location']} "
+                  f"| {slot['file_count']} 份文件 {size_kb:.1f} KB（新增 {stored_kb:.1f} KB）")
+        if next_cursor is not None:
+            print(f"\n下一页：--list-saves --before {next_cursor}")
     elif args.check_story:
         if not gm.check_story_content(args.check_story):
             sys.exit(1) # 校验失败退出码为 1
+    elif args.check_story_file:
+        source = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8") if args.check_story_file == "-" else Path(args.check_story_file)
+        if not gm.check_story_content(source):
+            sys.exit(1)
     else:
         # 默认测试：尝试读取主角卡
         sheet = gm.get_skill_data("protagonist-skill", "character_sheet.md")
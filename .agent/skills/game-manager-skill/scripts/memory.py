@@ -1,12 +1,64 @@
-import sqlite3
 import json
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timezone
+from connection import get_connection, transaction, close_connection
+from entity_versions import make_delta, apply_delta, describe_changes
+from tracing import traced
+
+# 中日韩统一表意文字（含扩展 A 与兼容区）连续片段，以及其余字母数字词
+_CJK_RUN = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+")
+_TOKEN_RUN = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+|[^\W_\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+")
+
+
+def bigram_tokens(text):
+    """
+    全文索引分词：中文无空格分隔，按连续汉字切成二元组，并在片段末尾补一个单字，
+    使单字查询（前缀匹配）也能命中；其余字母数字按词保留。返回以空格连接的词串。
+    """
+    tokens = []
+    for run in _TOKEN_RUN.findall(text or ""):
+        if _CJK_RUN.fullmatch(run):
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+            tokens.append(run[-1])
+        else:
+            tokens.append(run.lower())
+    return " ".join(tokens)
+
+
+def _match_query(query):
+    """把自然查询串转换为 FTS5 MATCH 表达式：每个片段为一个短语，片段之间为 AND"""
+    terms = []
+    for run in _TOKEN_RUN.findall(query or ""):
+        if _CJK_RUN.fullmatch(run):
+            if len(run) == 1:
+                terms.append(f'"{run}"*')
+            else:
+                terms.append('"' + " ".join(run[i:i + 2] for i in range(len(run) - 1)) + '"')
+        else:
+            terms.append(f'"{run.lower()}"*')
+    return " ".join(terms)
+
+
+def _db_time(value):
+    """把 datetime 转为库内 CURRENT_TIMESTAMP 的格式（UTC）；字符串原样使用"""
+    if isinstance(value, datetime):
+        return value.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    return value
 
 class GameMemory:
     """
     武侠世界记忆中枢：负责长期记忆（数据库）与短期记忆（内存/缓存）的存取。
     """
+    # 批量写入缓冲：行数超过阈值，或第一条缓冲后等待超过时限，即自动落库
+    BATCH_MAX_ROWS = 500
+    BATCH_MAX_SECONDS = 2.0
+    # 实体版本每隔多少版存一次完整基准，其余版本只存相对上一版的增量
+    ENTITY_BASE_INTERVAL = 20
+
     def __init__(self, db_path=None):
         if db_path is None:
             # 默认存储在技能的 assets 目录下
@@ -15,12 +67,17 @@ class GameMemory:
             self.db_path = Path(db_path)
 
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._buffer = []          # 批量模式下待写入的长期记忆
+        self._buffer_lock = threading.RLock()   # 缓冲的追加、提交与丢弃互斥（定时提交在计时线程中执行）
+        self._flush_timer = None
+        self._batch_depth = 0
+        self._entity_latest = {}   # {实体名: (版本号, 状态)}，省去追加版本时的重建
         self._init_db()
         self.short_term = [] # 短期记忆缓存
 
     def _init_db(self):
         """初始化长期记忆表"""
-        with sqlite3.connect(self.db_path) as conn:
+        with transaction(self.db_path) as conn:
             cursor = conn.cursor()
             # 长期记忆：存储关键事件、人物好感度重大转折、世界线变动
             cursor.execute('''
@@ -32,6 +89,11 @@ class GameMemory:
                     timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
                 )
             ''')
+            # 按类别/时间倒序检索的复合索引（id 作为同一时刻的次序）
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_ltm_category_time ON long_term_memory (category, timestamp, id)"
+            )
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_ltm_time ON long_term_memory (timestamp, id)")
             # 实体状态快照
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS entity_snapshots (
@@ -40,37 +102,275 @@ class GameMemory:
                     last_update DATETIME DEFAULT CURRENT_TIMESTAMP
                 )
             ''')
-            conn.commit()
+            # 实体版本历史：基准版本存完整状态，其余版本存相对上一版的增量
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS entity_versions (
+                    entity_name TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    is_base INTEGER NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (entity_name, version)
+                )
+            ''')
+            # 长期记忆全文索引（无内容表，rowid 即记忆 id，只存二元组分词）
+            try:
+                cursor.execute('''
+                    CREATE VIRTUAL TABLE IF NOT EXISTS long_term_memory_fts
+                    USING fts5(key_event, details, content='', tokenize='unicode61')
+                ''')
+                self.fts_enabled = True
+                self._index_pending(cursor)
+            except sqlite3.OperationalError:
+                # SQLite 未编译 FTS5 时退化为 LIKE 扫描
+                self.fts_enabled = False
+
+    def _index_pending(self, cursor):
+        """为尚未进入全文索引的记忆补建索引（首次升级或外部直接写表时）"""
+        row = cursor.execute("SELECT rowid FROM long_term_memory_fts ORDER BY rowid DESC LIMIT 1").fetchone()
+        last_id = row[0] if row else 0
+        pending = cursor.execute(
+            "SELECT id, key_event, details FROM long_term_memory WHERE id > ? ORDER BY id", (last_id,)
+        ).fetchall()
+        cursor.executemany(
+            "INSERT INTO long_term_memory_fts (rowid, key_event, details) VALUES (?, ?, ?)",
+            [(mem_id, bigram_tokens(event), bigram_tokens(details)) for mem_id, event, details in pending]
+        )
+        return len(pending)
 
+    @traced("memory.add_long_term")
     def add_long_term(self, category, event, details=""):
-        """铭刻一段长久记忆"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute(
+        """铭刻一段长久记忆（处于 batch() 中时先进入缓冲，超过行数或时间阈值、或离开时统一提交）"""
+        if self._batch_depth:
+            with self._buffer_lock:
+                self._buffer.append((category, event, details))
+                if len(self._buffer) >= self.BATCH_MAX_ROWS:
+                    self.flush()
+                elif self._flush_timer is None:
+                    # 第一条缓冲记忆启动计时：到期时即使批次仍未结束也先行提交
+                    self._flush_timer = threading.Timer(self.BATCH_MAX_SECONDS, self._flush_on_deadline)
+                    self._flush_timer.daemon = True
+                    self._flush_timer.start()
+            return
+
+        with transaction(self.db_path) as conn:
+            cursor = conn.execute(
                 "INSERT INTO long_term_memory (category, key_event, details) VALUES (?, ?, ?)",
                 (category, event, details)
             )
-            conn.commit()
+            if self.fts_enabled:
+                conn.execute(
+                    "INSERT INTO long_term_memory_fts (rowid, key_event, details) VALUES (?, ?, ?)",
+                    (cursor.lastrowid, bigram_tokens(event), bigram_tokens(details))
+                )
 
-    def query_long_term(self, category=None):
-        """回溯长久记忆"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            if category:
-                cursor.execute("SELECT * FROM long_term_memory WHERE category = ? ORDER BY timestamp DESC", (category,))
-            else:
-                cursor.execute("SELECT * FROM long_term_memory ORDER BY timestamp DESC")
-            return cursor.fetchall()
+    @contextmanager
+    def batch(self):
+        """
+        批量铭刻：范围内的 add_long_term 先写入缓冲，离开时以一次 executemany、一个事务提交。
+        可嵌套，只有最外层正常离开时才提交；缓冲超过 BATCH_MAX_ROWS 行、第一条缓冲后超过
+        BATCH_MAX_SECONDS 秒（由计时线程提交，批次闲置时也生效）或期间有查询时会提前提交。
+        最外层因异常离开时丢弃尚未提交的缓冲（已提前提交的记忆保留），异常照常抛出。
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                with self._buffer_lock:
+                    self._cancel_timer()
+                    self._buffer = []
+            raise
+        self._batch_depth -= 1
+        if not self._batch_depth:
+            self.flush()
+
+    @traced("memory.flush")
+    def flush(self):
+        """将缓冲中的长期记忆一次性写入数据库，返回写入条数"""
+        with self._buffer_lock:
+            self._cancel_timer()
+            if not self._buffer:
+                return 0
+            rows, self._buffer = self._buffer, []
+            with transaction(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.executemany(
+                    "INSERT INTO long_term_memory (category, key_event, details) VALUES (?, ?, ?)", rows
+                )
+                if self.fts_enabled:
+                    self._index_pending(cursor)
+            return len(rows)
+
+    def _cancel_timer(self):
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+
+    def _flush_on_deadline(self):
+        """计时线程：到期提交缓冲，随后关闭本线程的数据库连接"""
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"[记忆库] 定时提交失败：{e}")
+        finally:
+            close_connection(self.db_path)
+
+    @traced("memory.query_long_term")
+    def query_long_term(self, category=None, since=None, until=None, limit=None):
+        """回溯长久记忆（按时间倒序），条件同 iter_long_term"""
+        return list(self.iter_long_term(category, since=since, until=until, limit=limit))
+
+    def iter_long_term(self, category=None, since=None, until=None, limit=None, page_size=200):
+        """
+        逐条回溯长久记忆（按时间倒序）。以 (timestamp, id) 键集分页，每次只取 page_size 行，
+        内存占用与表大小无关。since / until 为时间下界（含）与上界（不含），
+        可为 datetime 或 "YYYY-MM-DD HH:MM:SS"（UTC）字符串；limit 为最多返回条数。
+        """
+        self.flush()
+        conn = get_connection(self.db_path)
+        filters, params = [], []
+        if category:
+            filters.append("category = ?")
+            params.append(category)
+        if since is not None:
+            filters.append("timestamp >= ?")
+            params.append(_db_time(since))
+        if until is not None:
+            filters.append("timestamp < ?")
+            params.append(_db_time(until))
+
+        remaining = limit
+        cursor_key = None
+        while remaining is None or remaining > 0:
+            page_filters, page_params = list(filters), list(params)
+            if cursor_key:
+                page_filters.append("(timestamp, id) < (?, ?)")
+                page_params.extend(cursor_key)
+            where = f"WHERE {' AND '.join(page_filters)}" if page_filters else ""
+            size = page_size if remaining is None else min(page_size, remaining)
+            rows = conn.execute(
+                f"SELECT * FROM long_term_memory {where} ORDER BY timestamp DESC, id DESC LIMIT ?",
+                page_params + [size]
+            ).fetchall()
+            yield from rows
+            if len(rows) < size:
+                return
+            if remaining is not None:
+                remaining -= len(rows)
+            cursor_key = (rows[-1][4], rows[-1][0])
+
+    @traced("memory.search")
+    def search_long_term(self, query, limit=20, since=None, category=None):
+        """
+        全文检索长久记忆（事件与详情），按相关度排序返回至多 limit 条。
+        since 可为 datetime 或 "YYYY-MM-DD HH:MM:SS"（UTC）字符串，只返回此后的记忆。
+        """
+        self.flush()
+        conn = get_connection(self.db_path)
+        filters, params = "", []
+        if since is not None:
+            filters += " AND m.timestamp >= ?"
+            params.append(_db_time(since))
+        if category:
+            filters += " AND m.category = ?"
+            params.append(category)
+
+        if self.fts_enabled:
+            match = _match_query(query)
+            if not match:
+                return []
+            return conn.execute(f"""
+                SELECT m.* FROM long_term_memory_fts f
+                JOIN long_term_memory m ON m.id = f.rowid
+                WHERE long_term_memory_fts MATCH ?{filters}
+                ORDER BY f.rank LIMIT ?
+            """, [match] + params + [limit]).fetchall()
 
+        terms = [t for t in (query or "").split() if t]
+        likes = "".join(" AND (m.key_event || ' ' || COALESCE(m.details, '')) LIKE ?" for _ in terms)
+        return conn.execute(f"""
+            SELECT m.* FROM long_term_memory m WHERE 1 = 1{likes}{filters}
+            ORDER BY m.timestamp DESC LIMIT ?
+        """, [f"%{t}%" for t in terms] + params + [limit]).fetchall()
+
+    @traced("memory.save_entity")
     def save_entity_state(self, name, data):
-        """记录实体（如NPC、物品）的最新神识快照"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute(
+        """
+        记录实体（如NPC、物品）的最新神识快照，并追加一个历史版本（与上一版相同则不追加）。
+        返回当前版本号。
+        """
+        with transaction(self.db_path) as conn:
+            conn.execute(
                 "INSERT OR REPLACE INTO entity_snapshots (entity_name, state_data, last_update) VALUES (?, ?, ?)",
                 (name, json.dumps(data, ensure_ascii=False), datetime.now().isoformat())
             )
-            conn.commit()
+            return self._append_entity_version(conn, name, data)
+
+    def _append_entity_version(self, conn, name, data):
+        latest = self._entity_latest.get(name)
+        row = conn.execute(
+            "SELECT MAX(version) FROM entity_versions WHERE entity_name = ?", (name,)
+        ).fetchone()
+        last_version = row[0] or 0
+        if not latest or latest[0] != last_version:
+            latest = (last_version, self.get_entity_version(name, last_version)) if last_version else None
+
+        if latest and latest[1] == data:
+            return last_version
+
+        version = last_version + 1
+        is_base = not latest or not isinstance(data, dict) or not isinstance(latest[1], dict) \
+            or (version - 1) % self.ENTITY_BASE_INTERVAL == 0
+        payload = data if is_base else make_delta(latest[1], data)
+        conn.execute(
+            "INSERT INTO entity_versions (entity_name, version, is_base, payload) VALUES (?, ?, ?, ?)",
+            (name, version, int(is_base), json.dumps(payload, ensure_ascii=False))
+        )
+        self._entity_latest[name] = (version, data)
+        return version
+
+    @traced("memory.get_entity_version")
+    def get_entity_version(self, name, version=None):
+        """重建实体在某一版本（默认最新）的状态：取最近的基准版本并依次叠加增量"""
+        conn = get_connection(self.db_path)
+        if version is None:
+            version = conn.execute(
+                "SELECT MAX(version) FROM entity_versions WHERE entity_name = ?", (name,)
+            ).fetchone()[0]
+            if version is None:
+                return None
+        rows = conn.execute("""
+            SELECT is_base, payload FROM entity_versions
+            WHERE entity_name = ? AND version <= ? AND version >= (
+                SELECT MAX(version) FROM entity_versions
+                WHERE entity_name = ? AND version <= ? AND is_base = 1
+            )
+            ORDER BY version
+        """, (name, version, name, version)).fetchall()
+        if not rows:
+            return None
+
+        state = json.loads(rows[0][1])
+        for _, payload in rows[1:]:
+            state = apply_delta(state, json.loads(payload))
+        return state
+
+    def list_entity_versions(self, name):
+        """列出实体的全部版本 [(版本号, 记录时间, 是否基准)]"""
+        return [
+            (version, created_at, bool(is_base))
+            for version, created_at, is_base in get_connection(self.db_path).execute(
+                "SELECT version, created_at, is_base FROM entity_versions WHERE entity_name = ? ORDER BY version",
+                (name,))
+        ]
+
+    def entity_changes(self, name, from_version, to_version=None):
+        """对比实体两个版本之间的变动（to_version 默认最新），格式见 entity_versions.describe_changes"""
+        before = self.get_entity_version(name, from_version) or {}
+        after = self.get_entity_version(name, to_version) or {}
+        return describe_changes(before, after)
 
     def add_short_term(self, narrative):
         """暂存短期记忆（如当前章节的即时描写）"""
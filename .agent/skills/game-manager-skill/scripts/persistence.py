@@ -1,67 +1,463 @@
-import sqlite3
 import json
+import hashlib
 import os
+import weakref
 from pathlib import Path
 from datetime import datetime
+from connection import get_connection, transaction
+from tracing import traced
 
 # 获取技能根目录
 SKILL_ROOT = Path(__file__).parent.parent
 SAVES_DIR = SKILL_ROOT / "assets" / "saves"
 DB_PATH = SAVES_DIR / "wuxiaX.db"
 
-def ensure_db():
-    if not DB_PATH.exists():
-        from db_init import init_db
-        init_db()
+# 存档格式版本：3.x 为内容寻址格式（save_blobs + save_manifest），3.1 起清单为关键帧/增量链
+SAVE_FORMAT_VERSION = "3.1.0"
 
-def save_game(data, chapter="未知", location="未知"):
+# 每隔多少次存档写一次完整清单（关键帧），其余存档只记录相对上一存档的增量
+KEYFRAME_INTERVAL = 10
+
+# 增量清单中表示“文件已删除”的哈希
+_DELETED = ""
+
+# 单条 SQL 中 IN (...) 参数的上限，低于 SQLite 默认的 999
+_SQL_BATCH = 500
+
+# 沿增量链回溯到最近的关键帧（结果按 关键帧 -> 目标存档 排序）
+_CHAIN_SQL = """
+    WITH RECURSIVE chain(id, parent, keyframe, lvl) AS (
+        SELECT save_id, parent_id, keyframe, 0 FROM save_chain WHERE save_id = ?
+        UNION ALL
+        SELECT c.save_id, c.parent_id, c.keyframe, chain.lvl + 1
+        FROM save_chain c JOIN chain ON c.save_id = chain.parent
+        WHERE chain.keyframe = 0
+    )
+    SELECT id FROM chain ORDER BY lvl DESC
+"""
+
+# 本进程最近一次写入的完整清单：{数据库: (save_id, {(skill, file): hash}, 技能摘要)}，省去下次存档的回溯。
+# 其他进程可能已重置或清理存档（存档 ID 可被复用），使用前须与库中存档槽的技能摘要核对
+_last_manifest = {}
+
+# 本进程内已完成结构迁移的数据库
+_migrated = set()
+
+# 本进程内仍打开的惰性快照：其尚未读取的内容块不会被 retention.collect_garbage 回收
+_open_snapshots = weakref.WeakSet()
+
+# 存档相关的全部表（先删引用方）
+SAVE_TABLES = ("save_manifest", "save_chain", "save_slots", "save_blobs", "game_saves")
+
+
+class SaveCompacted(LookupError):
+    """惰性快照打开后，存档或其内容块已被压缩清理（通常是另一进程执行了压缩或重置）"""
+
+
+def _resolve(db_path):
+    return Path(db_path) if db_path else DB_PATH
+
+
+def ensure_db(db_path=None):
+    db_path = _resolve(db_path)
+    if db_path in _migrated:
+        return
+    from db_init import init_db, create_schema
+    if not db_path.exists():
+        init_db(db_path)
+    else:
+        # 旧库补齐新表，每个进程只检查一次
+        with transaction(db_path) as conn:
+            create_schema(conn)
+    _migrated.add(db_path)
+
+
+@traced("save.reset")
+def reset_saves(db_path=None):
     """
-    保存游戏数据到 SQLite 数据库
+    清空全部存档：直接删表后按当前结构重建（比逐行 DELETE 快得多），并清除进程内的清单缓存。
+    存档 ID 会从 1 重新开始。数据库不存在时返回 False。
     """
-    ensure_db()
-    
+    db_path = _resolve(db_path)
+    if not db_path.exists():
+        return False
+    from db_init import create_schema
+    with transaction(db_path) as conn:
+        for table in SAVE_TABLES:
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
+        conn.execute("PRAGMA user_version = 0")
+        create_schema(conn)
+    # 旧存档 ID 已失效，不能再作为增量基准
+    _last_manifest.pop(str(db_path), None)
+    _migrated.add(db_path)
+    return True
+
+
+def content_hash(content):
+    """参考文件内容的寻址哈希"""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def skills_digest(manifest):
+    """按技能汇总清单哈希（取前 12 位），用于在存档列表中比对哪些技能有变动"""
+    per_skill = {}
+    for skill_name, filename, digest in sorted(manifest):
+        per_skill.setdefault(skill_name, hashlib.sha256()).update(f"{filename}\0{digest}\n".encode("utf-8"))
+    return {skill_name: h.hexdigest()[:12] for skill_name, h in per_skill.items()}
+
+
+def _existing_hashes(cursor, hashes):
+    """查询已入库的内容哈希，避免重复写入相同的文件内容"""
+    found = set()
+    hashes = list(hashes)
+    for i in range(0, len(hashes), _SQL_BATCH):
+        chunk = hashes[i:i + _SQL_BATCH]
+        placeholders = ",".join("?" * len(chunk))
+        cursor.execute(f"SELECT hash FROM save_blobs WHERE hash IN ({placeholders})", chunk)
+        found.update(row[0] for row in cursor.fetchall())
+    return found
+
+
+@traced("save.write")
+def save_game(data, chapter="未知", location="未知", db_path=None, hashes=None):
+    """
+    保存游戏数据到 SQLite 数据库。
+    data["skills"] 中的每份参考文件按内容哈希存入 save_blobs（相同内容只存一次），
+    存档行只记录 (skill, file, hash) 清单与其余元数据，未变动的文件不再占用空间。
+    清单每 KEYFRAME_INTERVAL 次存档写一次完整关键帧，其余只记录相对上一存档的增量。
+    hashes 为调用方已算好的 {(skill, file): 哈希}，命中的文件不再重新求哈希。
+    """
+    hashes = hashes or {}
+    db_path = _resolve(db_path)
+    ensure_db(db_path)
+
     timestamp = datetime.now().isoformat()
+
+    skills = data.get("skills", {})
+    shell = {k: v for k, v in data.items() if k != "skills"}
+
+    blobs = {}
+    manifest = []
+    for skill_name, files in skills.items():
+        for filename, content in files.items():
+            digest = hashes.get((skill_name, filename)) or content_hash(content)
+            blobs[digest] = content
+            manifest.append((skill_name, filename, digest))
+
+    digest = json.dumps(skills_digest(manifest), ensure_ascii=False)
+    with transaction(db_path) as conn:
+        save_id = _write_save(conn.cursor(), timestamp, chapter, location, shell, blobs, manifest,
+                              digest, db_key=str(db_path))
+    _last_manifest[str(db_path)] = (save_id, {(s, f): h for s, f, h in manifest}, digest)
+
+    return f"DB_SAVE_ID_{save_id}"
+
+
+def resolve_manifest(cursor, save_id, skills=None, files=None):
+    """
+    还原某次存档的完整清单 {(skill, file): hash}：取最近的关键帧，再按顺序叠加其后的增量。
+    未登记在增量链中的存档（迁移前的内容寻址存档）视为关键帧。
+    """
+    chain = [row[0] for row in cursor.execute(_CHAIN_SQL, (save_id,)).fetchall()] or [save_id]
+    position = {sid: i for i, sid in enumerate(chain)}
+    sql, params = _filtered(
+        f"SELECT save_id, skill, file, hash FROM save_manifest WHERE save_id IN ({','.join('?' * len(chain))})",
+        chain, skills, files)
+    rows = sorted(cursor.execute(sql, params).fetchall(), key=lambda r: position[r[0]])
+
+    manifest = {}
+    for _, skill_name, filename, digest in rows:
+        if digest == _DELETED:
+            manifest.pop((skill_name, filename), None)
+        else:
+            manifest[(skill_name, filename)] = digest
+    return manifest
+
+
+def pinned_hashes(db_path=None):
+    """本进程内打开的惰性快照仍可能读取的内容哈希"""
+    db_path = _resolve(db_path)
+    pinned = set()
+    for snapshot in list(_open_snapshots):
+        if snapshot.db_path == db_path:
+            pinned |= snapshot.unfetched()
+    return pinned
+
+
+def _parent_manifest(cursor, db_key, parent_id):
+    """上一存档的完整清单：进程内缓存仍与库中存档槽一致时直接使用，否则从库中还原"""
+    cached = _last_manifest.get(db_key)
+    if cached and cached[0] == parent_id:
+        row = cursor.execute("SELECT skills_digest FROM save_slots WHERE save_id = ?", (parent_id,)).fetchone()
+        if row and row[0] == cached[2]:
+            return cached[1]
+    return resolve_manifest(cursor, parent_id)
+
+
+def _write_save(cursor, timestamp, chapter, location, shell, blobs, manifest, digest, db_key=None):
+    """在调用方的事务内写入内容块、存档行与清单，返回存档 ID"""
+    sizes = {h: len(content.encode("utf-8")) for h, content in blobs.items()}
+    new_hashes = set(blobs) - _existing_hashes(cursor, blobs)
+    cursor.executemany(
+        "INSERT OR IGNORE INTO save_blobs (hash, size, content) VALUES (?, ?, ?)",
+        [(h, sizes[h], blobs[h]) for h in new_hashes]
+    )
+
+    # 决定写关键帧还是增量：上一存档不在增量链中（旧格式）或链已足够长时写关键帧
+    parent_id = cursor.execute("SELECT MAX(id) FROM game_saves").fetchone()[0]
+    parent = cursor.execute(
+        "SELECT depth FROM save_chain WHERE save_id = ?", (parent_id,)
+    ).fetchone() if parent_id else None
+    keyframe = parent is None or parent[0] + 1 >= KEYFRAME_INTERVAL
+
+    if keyframe:
+        chain_parent, depth, rows = None, 0, manifest
+    else:
+        base = _parent_manifest(cursor, db_key, parent_id)
+        current = {(s, f): h for s, f, h in manifest}
+        rows = [(s, f, h) for (s, f), h in current.items() if base.get((s, f)) != h]
+        rows += [(s, f, _DELETED) for (s, f) in base if (s, f) not in current]
+        chain_parent, depth = parent_id, parent[0] + 1
+
     # 提取元数据
     metadata = {
-        "version": "2.0.0",
-        "save_type": "sqlite"
+        "version": SAVE_FORMAT_VERSION,
+        "save_type": "sqlite-cas",
+        "files": len(manifest),
+        "new_blobs": len(new_hashes),
+        "keyframe": keyframe,
+        "delta_files": len(rows)
     }
-    
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
+
+    shell_json = json.dumps(shell, ensure_ascii=False)
     cursor.execute("""
         INSERT INTO game_saves (timestamp, chapter, location, data_json, metadata_json)
         VALUES (?, ?, ?, ?, ?)
-    """, (timestamp, chapter, location, json.dumps(data, ensure_ascii=False), json.dumps(metadata)))
-    
+    """, (timestamp, chapter, location, shell_json, json.dumps(metadata)))
+
     save_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    
-    return f"DB_SAVE_ID_{save_id}"
+    cursor.executemany(
+        "INSERT INTO save_manifest (save_id, skill, file, hash) VALUES (?, ?, ?, ?)",
+        [(save_id, skill_name, filename, digest) for skill_name, filename, digest in rows]
+    )
+    cursor.execute(
+        "INSERT INTO save_chain (save_id, parent_id, keyframe, depth) VALUES (?, ?, ?, ?)",
+        (save_id, chain_parent, int(keyframe), depth)
+    )
+
+    # 存档槽元数据：列表查询只读这一张表
+    shell_bytes = len(shell_json.encode("utf-8"))
+    cursor.execute("""
+        INSERT INTO save_slots
+            (save_id, timestamp, chapter, location, size_bytes, stored_bytes, file_count, skills_digest)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, (
+        save_id, timestamp, chapter, location,
+        shell_bytes + sum(sizes[h] for _, _, h in manifest),
+        shell_bytes + sum(sizes[h] for h in new_hashes),
+        len(manifest),
+        digest
+    ))
+    return save_id
 
-def load_game(save_id=None):
+def load_game(save_id=None, skills=None, files=None, db_path=None):
     """
     读取存档数据。如果 save_id 为空，读取最新存档。
+    内容寻址存档按清单从 save_blobs 重组 skills；旧格式存档直接返回原始 JSON。
+    skills / files 可只取指定技能或指定文件名，未选中的内容块不会被读取和解码。
+    """
+    snapshot = open_snapshot(save_id, skills=skills, files=files, db_path=db_path)
+    return snapshot.materialize() if snapshot else None
+
+
+@traced("save.open")
+def open_snapshot(save_id=None, skills=None, files=None, db_path=None):
+    """
+    打开存档的惰性快照：只读取存档行与文件清单，文件内容在访问时才从 save_blobs 取出。
+    存档不存在时返回 None。
     """
-    if not DB_PATH.exists():
+    db_path = _resolve(db_path)
+    if not db_path.exists():
         return None
+    ensure_db(db_path)
 
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    if save_id:
-        cursor.execute("SELECT data_json FROM game_saves WHERE id = ?", (save_id,))
-    else:
-        cursor.execute("SELECT data_json FROM game_saves ORDER BY id DESC LIMIT 1")
-    
-    row = cursor.fetchone()
-    conn.close()
-    
-    if row:
-        return json.loads(row[0])
-    return None
+    # 读事务保证存档行与清单来自同一版本
+    with transaction(db_path, immediate=False) as conn:
+        cursor = conn.cursor()
+        if save_id:
+            cursor.execute("SELECT id, data_json FROM game_saves WHERE id = ?", (save_id,))
+        else:
+            cursor.execute("SELECT id, data_json FROM game_saves ORDER BY id DESC LIMIT 1")
+
+        row = cursor.fetchone()
+        if not row:
+            return None
+
+        shell = json.loads(row[1])
+        manifest = {}
+        contents = {}
+        if "skills" in shell:
+            # 旧格式：内容已随 data_json 解码，只做筛选
+            for skill_name, skill_files in shell.pop("skills").items():
+                for filename, content in skill_files.items():
+                    if _selected(skill_name, filename, skills, files):
+                        digest = content_hash(content)
+                        manifest.setdefault(skill_name, {})[filename] = digest
+                        contents[digest] = content
+        else:
+            for (skill_name, filename), digest in resolve_manifest(cursor, row[0], skills, files).items():
+                manifest.setdefault(skill_name, {})[filename] = digest
+
+    return LazySnapshot(db_path, row[0], shell, manifest, contents)
+
+
+def _selected(skill_name, filename, skills, files):
+    return (not skills or skill_name in skills) and (not files or filename in files)
+
+
+def _filtered(sql, params, skills, files):
+    """为清单查询追加技能/文件名筛选条件"""
+    params = list(params)
+    if skills:
+        sql += f" AND skill IN ({','.join('?' * len(skills))})"
+        params.extend(skills)
+    if files:
+        sql += f" AND file IN ({','.join('?' * len(files))})"
+        params.extend(files)
+    return sql, params
+
+
+class LazySnapshot:
+    """
+    惰性存档快照：行为与 load_game 返回的字典一致（snapshot["skills"][技能][文件]），
+    但文件内容只在首次访问时按哈希读取，并可通过 hash_of() 在不读取内容的情况下比对差异。
+    """
+    def __init__(self, db_path, save_id, shell, manifest, contents=None):
+        self.db_path = db_path
+        self.save_id = save_id
+        self.shell = shell
+        self.manifest = manifest          # {skill: {file: hash}}
+        self._contents = contents or {}   # {hash: content}
+        self._skills = {name: LazySkillFiles(self, name) for name in manifest}
+        _open_snapshots.add(self)
+
+    def unfetched(self):
+        """清单中尚未读取的内容哈希"""
+        return {h for files in self.manifest.values() for h in files.values() if h not in self._contents}
+
+    def __getitem__(self, key):
+        if key == "skills":
+            return self._skills
+        return self.shell[key]
+
+    def __contains__(self, key):
+        return key == "skills" or key in self.shell
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def hash_of(self, skill_name, filename):
+        return self.manifest.get(skill_name, {}).get(filename)
+
+    @traced("save.fetch_blobs")
+    def fetch(self, hashes):
+        """批量读取尚未缓存的内容块"""
+        missing = [h for h in dict.fromkeys(hashes) if h not in self._contents]
+        if missing:
+            conn = get_connection(self.db_path)
+            for i in range(0, len(missing), _SQL_BATCH):
+                chunk = missing[i:i + _SQL_BATCH]
+                placeholders = ",".join("?" * len(chunk))
+                for digest, content in conn.execute(
+                        f"SELECT hash, content FROM save_blobs WHERE hash IN ({placeholders})", chunk):
+                    self._contents[digest] = content
+            lost = [h for h in missing if h not in self._contents]
+            if lost:
+                raise SaveCompacted(f"存档 {self.save_id} 已被压缩清理（{len(lost)} 个内容块不复存在），请重新读档")
+        return {h: self._contents[h] for h in hashes}
+
+    def materialize(self):
+        """展开为普通字典（与旧版 load_game 返回值一致）"""
+        data = dict(self.shell)
+        data["skills"] = {name: dict(files.items()) for name, files in self._skills.items()}
+        return data
+
+
+class LazySkillFiles:
+    """单个技能的文件视图：按需取出内容，items() 一次批量读取该技能的全部文件"""
+    def __init__(self, snapshot, skill_name):
+        self._snapshot = snapshot
+        self.skill_name = skill_name
+        self.hashes = snapshot.manifest[skill_name]
+
+    def __getitem__(self, filename):
+        digest = self.hashes[filename]
+        return self._snapshot.fetch([digest])[digest]
+
+    def __contains__(self, filename):
+        return filename in self.hashes
+
+    def __iter__(self):
+        return iter(self.hashes)
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def keys(self):
+        return self.hashes.keys()
+
+    def items(self):
+        contents = self._snapshot.fetch(list(self.hashes.values()))
+        return [(filename, contents[digest]) for filename, digest in self.hashes.items()]
+
+    def get(self, filename, default=None):
+        return self[filename] if filename in self.hashes else default
+
+@traced("save.list")
+def list_saves(limit=20, before_id=None, chapter=None, location=None, db_path=None):
+    """
+    列出存档槽元数据（按存档 ID 倒序），只查询 save_slots，从不读取存档内容。
+    before_id 为键集分页游标：传入上一页最后一条的 save_id 获取下一页。
+    chapter 精确匹配；location 按前缀匹配（如“大研镇”可匹配“大研镇（前往圣堂石窟途中）”）。
+    """
+    db_path = _resolve(db_path)
+    if not db_path.exists():
+        return []
+    ensure_db(db_path)
+
+    clauses, params = [], []
+    if before_id is not None:
+        clauses.append("save_id < ?")
+        params.append(before_id)
+    if chapter:
+        clauses.append("chapter = ?")
+        params.append(chapter)
+    if location:
+        # 区间条件可走 (location, save_id) 索引
+        clauses.append("location >= ? AND location < ?")
+        params.extend([location, location + "\U0010ffff"])
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    conn = get_connection(db_path)
+    rows = conn.execute(f"""
+        SELECT save_id, timestamp, chapter, location, size_bytes, stored_bytes, file_count, skills_digest
+        FROM save_slots {where}
+        ORDER BY save_id DESC LIMIT ?
+    """, params + [limit]).fetchall()
+
+    return [
+        {
+            "save_id": row[0],
+            "timestamp": row[1],
+            "chapter": row[2],
+            "location": row[3],
+            "size_bytes": row[4],
+            "stored_bytes": row[5],
+            "file_count": row[6],
+            "skills_digest": json.loads(row[7]) if row[7] else {}
+        }
+        for row in rows
+    ]
 
 if __name__ == "__main__":
     # 示例测试
@@ -69,4 +465,4 @@ if __name__ == "__main__":
     save_info = save_game(test_data, "测试章节", "大研镇")
     print(f"存档已保存：{save_info}")
     loaded = load_game()
-    print(f"读取数据成功: {loaded == test_data}")
+    print(f"读取数据成功: {loaded == {**test_data, 'skills': {}}}")
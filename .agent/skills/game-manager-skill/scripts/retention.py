@@ -0,0 +1,160 @@
+"""
+存档保留策略与压缩：
+1. 按策略筛出过期存档（如“最近一小时全保留，更早的每章只留最新一份”）。
+2. 删除存档前把它的清单增量并入后继存档，保证增量链仍可还原。
+3. 回收不再被任何清单引用的内容块，并归还空闲页。
+每个存档的删除都是独立的短事务，压缩可在后台线程运行而不阻塞存档写入。
+"""
+import threading
+from datetime import datetime, timedelta
+
+from connection import get_connection, transaction
+from persistence import ensure_db, pinned_hashes, _resolve
+
+
+class RetentionPolicy:
+    """
+    存档保留策略。
+    keep_recent: 该时长内的存档全部保留
+    per_chapter: 更早的存档每个章节保留最新的几份
+    keep_latest: 无论多旧，始终保留最新的几份存档
+    """
+    def __init__(self, keep_recent=timedelta(hours=1), per_chapter=1, keep_latest=1):
+        self.keep_recent = keep_recent
+        self.per_chapter = per_chapter
+        self.keep_latest = keep_latest
+
+    def select_expired(self, slots, now=None):
+        """slots 为按 save_id 倒序的 (save_id, timestamp, chapter)，返回应删除的 save_id 列表"""
+        now = now or datetime.now()
+        cutoff = now - self.keep_recent
+        kept_per_chapter = {}
+        expired = []
+        for index, (save_id, timestamp, chapter) in enumerate(slots):
+            kept = kept_per_chapter.get(chapter, 0)
+            # 保留下来的存档都计入该章节的名额
+            if index < self.keep_latest or _parse_time(timestamp) >= cutoff or kept < self.per_chapter:
+                kept_per_chapter[chapter] = kept + 1
+            else:
+                expired.append(save_id)
+        return expired
+
+
+def _parse_time(timestamp):
+    try:
+        return datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError):
+        return datetime.min
+
+
+def delete_save(cursor, save_id):
+    """
+    删除一份存档（在调用方的事务内）。
+    若有后继存档以它为增量基准，先把它的清单并入后继：后继已有的条目优先，
+    被删的是关键帧时后继升级为关键帧。
+    """
+    chain = cursor.execute(
+        "SELECT parent_id, keyframe, depth FROM save_chain WHERE save_id = ?", (save_id,)
+    ).fetchone()
+    children = [row[0] for row in cursor.execute(
+        "SELECT save_id FROM save_chain WHERE parent_id = ?", (save_id,)).fetchall()]
+
+    for child in children:
+        cursor.execute("""
+            INSERT OR IGNORE INTO save_manifest (save_id, skill, file, hash)
+            SELECT ?, skill, file, hash FROM save_manifest WHERE save_id = ?
+        """, (child, save_id))
+        if chain is None or chain[1]:
+            # 成为新的关键帧：删除标记已无意义
+            cursor.execute("DELETE FROM save_manifest WHERE save_id = ? AND hash = ''", (child,))
+            cursor.execute(
+                "UPDATE save_chain SET parent_id = NULL, keyframe = 1, depth = 0 WHERE save_id = ?", (child,))
+        else:
+            cursor.execute(
+                "UPDATE save_chain SET parent_id = ?, depth = ? WHERE save_id = ?", (chain[0], chain[2], child))
+
+    for table, column in (("save_manifest", "save_id"), ("save_chain", "save_id"),
+                          ("save_slots", "save_id"), ("game_saves", "id")):
+        cursor.execute(f"DELETE FROM {table} WHERE {column} = ?", (save_id,))
+
+
+def collect_garbage(db_path=None):
+    """
+    删除不再被任何清单引用的内容块，返回删除数量。
+    本进程内仍打开的惰性快照尚未读取的内容块暂不回收（留待下次压缩）；
+    其他进程的快照无法感知，它们读取时会得到 SaveCompacted。
+    """
+    db_path = _resolve(db_path)
+    pinned = pinned_hashes(db_path)
+    with transaction(db_path) as conn:
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS pinned_blobs (hash TEXT PRIMARY KEY)")
+        conn.execute("DELETE FROM temp.pinned_blobs")
+        conn.executemany("INSERT OR IGNORE INTO temp.pinned_blobs (hash) VALUES (?)", [(h,) for h in pinned])
+        cursor = conn.execute("""
+            DELETE FROM save_blobs
+            WHERE NOT EXISTS (SELECT 1 FROM save_manifest m WHERE m.hash = save_blobs.hash)
+              AND NOT EXISTS (SELECT 1 FROM temp.pinned_blobs p WHERE p.hash = save_blobs.hash)
+        """)
+        return cursor.rowcount
+
+
+def reclaim_space(db_path=None, full_vacuum=False):
+    """
+    归还空闲页。启用了 auto_vacuum=INCREMENTAL 的库执行增量回收（不阻塞读）；
+    full_vacuum=True 时执行一次完整 VACUUM 并为旧库开启增量回收（期间会阻塞写入）。
+    """
+    conn = get_connection(_resolve(db_path))
+    if full_vacuum:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    elif conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        conn.execute("PRAGMA incremental_vacuum")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def compact(policy=None, db_path=None, now=None, full_vacuum=False):
+    """
+    执行一次压缩：按策略删除过期存档、回收内容块并归还空间。
+    返回 {"deleted": 删除存档数, "blobs": 回收内容块数}。
+    """
+    db_path = _resolve(db_path)
+    if not db_path.exists():
+        return {"deleted": 0, "blobs": 0}
+    ensure_db(db_path)
+    policy = policy or RetentionPolicy()
+
+    slots = get_connection(db_path).execute(
+        "SELECT save_id, timestamp, chapter FROM save_slots ORDER BY save_id DESC").fetchall()
+    expired = policy.select_expired(slots, now)
+
+    # 从旧到新逐个删除，每份一个短事务，期间新的存档可以穿插写入
+    for save_id in sorted(expired):
+        with transaction(db_path) as conn:
+            delete_save(conn.cursor(), save_id)
+
+    blobs = collect_garbage(db_path)
+    reclaim_space(db_path, full_vacuum=full_vacuum)
+    return {"deleted": len(expired), "blobs": blobs}
+
+
+class CompactionScheduler:
+    """后台定时压缩线程：每隔 interval 秒按策略压缩一次"""
+    def __init__(self, interval=600, policy=None, db_path=None):
+        self.interval = interval
+        self.policy = policy
+        self.db_path = db_path
+        self.last_result = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="wuxia-compaction", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.last_result = compact(self.policy, self.db_path)
+            except Exception as e:
+                print(f"[存档压缩] 执行失败：{e}")
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._thread.join(timeout)
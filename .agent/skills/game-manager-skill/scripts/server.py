@@ -0,0 +1,259 @@
+"""
+常驻主控：manager.py --serve 启动后保持一个预热的 SkillManager（注册表、记忆库与存档库长连接、
+内容缓存与快照脏集合常驻内存），通过本地 Unix 套接字以 JSON-RPC 2.0（每行一条消息）处理
+存档、读档、同步、剧情事件与文案校验请求，省去每条指令重新启动解释器与初始化的开销。
+所有调用在同一个工作线程中串行执行：数据库长连接按线程复用，调用期间该线程的控制台输出随结果返回
+（标准输出按线程分流，自动存档、后台压缩等其他线程的输出仍写到服务端自身的标准输出）。
+客户端见 client.py。
+"""
+import contextlib
+import inspect
+import io
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from client import socket_path
+from tracing import span
+
+# JSON-RPC 2.0 错误码
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        # 一条连接可连续发送多个请求，直到客户端关闭
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            response = self.server.game.handle_line(line)
+            self.wfile.write(json.dumps(response, ensure_ascii=False, default=str).encode("utf-8") + b"\n")
+            self.wfile.flush()
+            if self.server.game.stopping:
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                return
+
+
+class _ThreadOutput:
+    """
+    按线程分流的标准输出：处于 capture() 中的线程写入该次调用的缓冲，其余线程写入原标准输出。
+    contextlib.redirect_stdout 会替换整个进程的 sys.stdout，后台线程的输出会混进响应，故不使用。
+    """
+    def __init__(self, stream):
+        self.stream = stream
+        self._local = threading.local()
+
+    @contextlib.contextmanager
+    def capture(self):
+        self._local.buffer = buffer = io.StringIO()
+        try:
+            yield buffer
+        finally:
+            self._local.buffer = None
+
+    def _target(self):
+        return getattr(self._local, "buffer", None) or self.stream
+
+    def write(self, text):
+        return self._target().write(text)
+
+    def flush(self):
+        self._target().flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class GameServer:
+    """
+    常驻主控服务。factory 为无参可调用对象，返回 SkillManager（reload 时重新调用）。
+    连接由各自的线程接收，实际调用统一交给单个工作线程执行。
+    """
+    def __init__(self, factory, path=None):
+        self.path = socket_path(path)
+        self.stopping = False
+        self.requests = 0
+        self.started = time.time()
+        self._factory = factory
+        self._worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="wuxia-serve")
+        self._output = _ThreadOutput(sys.stdout)
+        sys.stdout = self._output
+        self.manager = self._worker.submit(factory).result()
+        self._server = None
+        self.methods = {
+            "ping": self.ping,
+            "save": self.save,
+            "load": self.load,
+            "list_saves": self.list_saves,
+            "sync": self.sync,
+            "event": self.event,
+            "events": self.events,
+            "check_story": self.check_story,
+            "reset": self.reset,
+            "compact": self.compact,
+            "reload": self.reload,
+            "shutdown": self.shutdown,
+        }
+
+    # ---- 方法 ----
+
+    def ping(self):
+        return {"pid": os.getpid(), "uptime": round(time.time() - self.started, 1), "requests": self.requests}
+
+    def save(self, chapter="未知", location="未知"):
+        return self.manager.execute_full_save(chapter=chapter, location=location)
+
+    def load(self, save_id=None, skills=None, files=None, dry_run=False):
+        return self.manager.execute_full_load(save_id, skills=skills, files=files, dry_run=dry_run)
+
+    def list_saves(self, limit=20, before=None, chapter=None, location=None):
+        slots, next_cursor = self.manager.list_save_slots(limit, before, chapter, location)
+        return {"saves": slots, "next": next_cursor}
+
+    def sync(self):
+        return self.manager.trigger_global_sync()
+
+    def event(self, type, description, impact=None):
+        return self.manager.process_story_event(type, description, impact)
+
+    def events(self, events):
+        return self.manager.process_story_events(events)
+
+    def check_story(self, content=None, path=None):
+        """校验文案字符串或文件（相对路径以项目根目录为准），返回 {"ok", "chars", "hits", "errors"}"""
+        from story_checker import check_story, format_errors
+        if (content is None) == (path is None):
+            raise TypeError("content 与 path 必须且只能给出一个")
+        if path is not None:
+            source = Path(path)
+            if not source.is_absolute():
+                source = self.manager.base_dir / source
+        else:
+            source = content
+        with span("story.check", "op"):
+            result = check_story(source)
+        result["errors"] = format_errors(result)
+        return result
+
+    def reset(self):
+        return self.manager.reset_game_state()
+
+    def compact(self, vacuum=False):
+        return self.manager.compact_saves(full_vacuum=vacuum)
+
+    def reload(self):
+        """重新构建 SkillManager（新增或删除技能目录后调用）"""
+        self.manager.shutdown()
+        self.manager = self._factory()
+        return sorted(self.manager.active_skills)
+
+    def shutdown(self):
+        self.stopping = True
+        return True
+
+    # ---- 协议 ----
+
+    def _invoke(self, func, params):
+        with self._output.capture() as output:
+            try:
+                value = func(**params)
+            except Exception as e:
+                return None, e, output.getvalue()
+        return value, None, output.getvalue()
+
+    def handle_line(self, line):
+        """处理一条 JSON-RPC 请求（bytes 或 str），返回响应对象"""
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            return _error(None, PARSE_ERROR, f"无法解析请求：{e}")
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            return _error(None, INVALID_REQUEST, "请求必须是含 method 字段的对象")
+
+        request_id = request.get("id")
+        func = self.methods.get(request["method"])
+        if func is None:
+            return _error(request_id, METHOD_NOT_FOUND, f"未知方法：{request['method']}")
+        params = request.get("params") or {}
+        if not isinstance(params, dict):
+            return _error(request_id, INVALID_PARAMS, "params 必须是对象（按名称传参）")
+        try:
+            inspect.signature(func).bind(**params)
+        except TypeError as e:
+            return _error(request_id, INVALID_PARAMS, str(e))
+
+        with span(f"rpc.{request['method']}", "rpc"):
+            value, error, output = self._worker.submit(self._invoke, func, params).result()
+        self.requests += 1
+        if error is not None:
+            return _error(request_id, INTERNAL_ERROR, f"{type(error).__name__}: {error}", {"output": output})
+        return {"jsonrpc": "2.0", "id": request_id, "result": {"value": value, "output": output}}
+
+    # ---- 生命周期 ----
+
+    def bind(self):
+        """绑定套接字；遗留的套接字文件若无人监听则清理，已有服务在运行时报错"""
+        if self.path.exists():
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(str(self.path))
+            except (ConnectionRefusedError, FileNotFoundError):
+                self.path.unlink(missing_ok=True)
+            else:
+                raise RuntimeError(f"已有常驻主控在运行：{self.path}")
+            finally:
+                probe.close()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._server = _UnixServer(str(self.path), _Handler)
+        self._server.game = self
+        return self
+
+    def serve_forever(self):
+        if self._server is None:
+            self.bind()
+        try:
+            self._server.serve_forever(poll_interval=0.2)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        """停止接收请求，写完自动存档并关闭后台线程，删除套接字文件"""
+        if self._server is not None:
+            self._server.server_close()
+            self._server = None
+            self.path.unlink(missing_ok=True)
+        self._worker.submit(self.manager.shutdown).result()
+        self._worker.shutdown()
+        if sys.stdout is self._output:
+            sys.stdout = self._output.stream
+
+
+def _error(request_id, code, message, data=None):
+    error = {"code": code, "message": message}
+    if data:
+        error["data"] = data
+    return {"jsonrpc": "2.0", "id": request_id, "error": error}
+
+
+def serve(factory, path=None):
+    """启动常驻主控并阻塞，直到收到 shutdown 请求或 Ctrl+C"""
+    server = GameServer(factory, path).bind()
+    print(f">>> 常驻主控已就绪：{server.path}（已加载技能 {len(server.manager.active_skills)} 个，Ctrl+C 退出）", flush=True)
+    server.serve_forever()
+    print(f">>> 常驻主控已退出，共处理 {server.requests} 个请求。")
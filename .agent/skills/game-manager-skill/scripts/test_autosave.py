@@ -0,0 +1,67 @@
+import sqlite3
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+# 添加脚本路径到 sys.path
+scripts_dir = Path(__file__).parent
+sys.path.append(str(scripts_dir))
+
+from autosave import AutosaveWriter
+from benchmark import copy_skills
+
+
+def test_bursts_are_merged_and_flushed():
+    gate = threading.Event()
+    started = threading.Event()
+    written = []
+
+    def slow_save(chapter="未知"):
+        started.set()
+        gate.wait(5)
+        written.append(chapter)
+        return f"DB_SAVE_ID_{len(written)}"
+
+    writer = AutosaveWriter(slow_save)
+    writer.submit(chapter="第一回")
+    # 等写入线程取走第一条请求后再连续提交
+    assert started.wait(5)
+    for i in range(2, 6):
+        writer.submit(chapter=f"第{i}回")
+    gate.set()
+
+    assert writer.flush(timeout=5) == "DB_SAVE_ID_2"
+    assert written == ["第一回", "第5回"]
+    assert writer.merged == 3
+
+    writer.close(timeout=5)
+    assert not writer.pending()
+
+
+# 先存一档（打开数据库连接），再提交一份慢速存档后直接退出进程
+EXIT_WITH_PENDING_SAVE = """
+import sys, time
+sys.path.insert(0, sys.argv[1])
+from pathlib import Path
+from manager import SkillManager
+gm = SkillManager(autosave=True, base_dir=Path(sys.argv[2]))
+gm.process_story_event("travel", "来到大研镇", {"location": "大研镇"})
+gm.flush_autosave()
+save = gm.autosaver._save_fn
+gm.autosaver._save_fn = lambda *a, **k: time.sleep(0.3) or save(*a, **k)
+gm.process_story_event("travel", "来到漱玉矶", {"location": "漱玉矶"})
+"""
+
+
+def test_pending_save_is_written_at_exit(tmp_path):
+    skills_dir = copy_skills(tmp_path)
+    result = subprocess.run([sys.executable, "-c", EXIT_WITH_PENDING_SAVE, str(scripts_dir), str(tmp_path)],
+                            capture_output=True, text=True, encoding="utf-8")
+    assert result.returncode == 0, result.stderr
+    assert "写入失败" not in result.stdout
+
+    conn = sqlite3.connect(skills_dir / "game-manager-skill" / "assets" / "saves" / "wuxiaX.db")
+    locations = [row[0] for row in conn.execute("SELECT location FROM game_saves ORDER BY id")]
+    conn.close()
+    assert locations == ["大研镇", "漱玉矶"]
@@ -0,0 +1,69 @@
+import sys
+from pathlib import Path
+
+# 添加脚本路径到 sys.path
+scripts_dir = Path(__file__).parent
+sys.path.append(str(scripts_dir))
+sys.path.append(str(scripts_dir.parent.parent / "protagonist-skill" / "scripts"))
+
+from character_sheet import CharacterSheet, HP, MP, LOCATION
+
+SHEET = """# 主角资料卡
+
+## 核心属性
+- **气血 (HP)**：50 / 50
+- **内力 (MP)**：30 / 30
+
+## 武学功法
+- 无
+
+## 背包物品
+- 粗布衣
+- 青钢长剑
+
+## 剧情进度
+- **当前位置**：大研镇
+"""
+
+
+def test_field_updates_touch_only_their_line():
+    sheet = CharacterSheet(SHEET)
+    assert sheet.hp == (50, 50)
+    assert sheet.location == "大研镇"
+
+    assert sheet.set(LOCATION, "桃花坞")
+    assert sheet.adjust_ratio(HP, -70) == 0
+    assert sheet.adjust_ratio(MP, 10) == 30
+    assert not sheet.set(LOCATION, "桃花坞")
+
+    rendered = sheet.render()
+    assert rendered == SHEET.replace("50 / 50", "0 / 50").replace("大研镇", "桃花坞")
+    assert len(sheet.changed_lines) == 2
+
+
+def test_inventory_list_edits():
+    sheet = CharacterSheet(SHEET)
+    assert sheet.inventory == ["粗布衣", "青钢长剑"]
+
+    sheet.add_item("金创药")
+    sheet.add_item("太极剑法", "武学功法")
+    assert sheet.inventory == ["粗布衣", "青钢长剑", "金创药"]
+    assert sheet.items("武学功法") == ["太极剑法"]
+    # 插入行后字段索引随之更新
+    assert sheet.location == "大研镇"
+
+    assert sheet.remove_item("粗布衣")
+    assert not sheet.remove_item("不存在")
+    assert sheet.remove_item("太极剑法", "武学功法")
+    assert "## 武学功法\n- 无\n" in sheet.render()
+    assert sheet.to_dict()["背包物品"] == ["青钢长剑", "金创药"]
+
+
+def test_add_item_creates_missing_section():
+    text = SHEET.replace("## 背包物品\n- 粗布衣\n- 青钢长剑\n\n", "")
+    sheet = CharacterSheet(text)
+    assert sheet.inventory == []
+    sheet.add_item("金创药")
+    assert sheet.inventory == ["金创药"]
+    assert sheet.render() == text.rstrip("\n") + "\n\n## 背包物品\n- 金创药\n"
+    assert sheet.location == "大研镇"
@@ -0,0 +1,61 @@
+import sys
+import os
+from pathlib import Path
+
+# 添加脚本路径到 sys.path
+scripts_dir = Path(__file__).parent
+sys.path.append(str(scripts_dir))
+
+from content_cache import ContentCache
+
+
+def test_cache_hits_until_file_changes(tmp_path):
+    sheet = tmp_path / "character_sheet.md"
+    sheet.write_text("气血 50 / 50", encoding="utf-8")
+    cache = ContentCache()
+
+    assert cache.read(sheet) == "气血 50 / 50"
+    assert cache.read(sheet) == "气血 50 / 50"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # 外部修改：mtime/size 变化即失效
+    sheet.write_text("气血 20 / 50（重伤）", encoding="utf-8")
+    assert cache.read(sheet) == "气血 20 / 50（重伤）"
+    assert cache.misses == 2
+
+    sheet.unlink()
+    assert cache.read(sheet) is None
+
+
+def test_write_through_and_lru_byte_budget(tmp_path):
+    cache = ContentCache(max_bytes=10)
+    files = []
+    for name in "abc":
+        path = tmp_path / f"{name}.md"
+        path.write_text(name * 4, encoding="utf-8")
+        cache.put(path, name * 4)
+        files.append(path)
+
+    # 12 字节超出上限，最早的 a.md 被淘汰
+    assert list(cache._entries) == [os.fspath(p) for p in files[1:]]
+    assert cache._bytes == 8
+    assert cache.read(files[2]) == "cccc" and cache.hits == 1
+
+
+def test_reference_watcher_reports_only_changed_files(tmp_path):
+    from watcher import ReferenceWatcher
+    refs = tmp_path / "references"
+    refs.mkdir()
+    (refs / "npc_list.md").write_text("沈浪", encoding="utf-8")
+    (refs / "quest_log.md").write_text("主线", encoding="utf-8")
+    watcher = ReferenceWatcher({"npc-skill": refs, "missing-skill": tmp_path / "absent"})
+
+    assert watcher.drain() == {("npc-skill", "npc_list.md"), ("npc-skill", "quest_log.md")}
+    assert watcher.drain() == set()
+
+    # 外部修改、删除由轮询发现；自身写入直接标记
+    (refs / "npc_list.md").write_text("沈浪、朱七七", encoding="utf-8")
+    (refs / "quest_log.md").unlink()
+    watcher.mark("npc-skill", "side.md")
+    assert watcher.drain() == {("npc-skill", "npc_list.md"), ("npc-skill", "quest_log.md"),
+                               ("npc-skill", "side.md")}
@@ -0,0 +1,106 @@
+import shutil
+import sys
+from pathlib import Path
+
+# 添加脚本路径到 sys.path
+scripts_dir = Path(__file__).parent
+sys.path.append(str(scripts_dir))
+intel_dir = scripts_dir.parent.parent / "intelligence-skill"
+sys.path.append(str(intel_dir / "scripts"))
+
+from intel_store import IntelStore
+
+
+def make_store(tmp_path):
+    md_path = tmp_path / "intelligence_database.md"
+    shutil.copy(intel_dir / "references" / "intelligence_database.md", md_path)
+    return IntelStore(md_path, tmp_path / "intelligence.db"), md_path
+
+
+def test_import_and_indexed_lookup(tmp_path):
+    store, _ = make_store(tmp_path)
+    record = store.get("INT-20260213-003")
+    assert record["type"] == "神秘事件" and record["valid_to"] == "2026-02-17"
+    assert record["details"].startswith("据漱玉矶渔民反映")
+    assert [r["id"] for r in store.query(type_filter="门派动态")] == ["INT-20260213-001"]
+    assert store.get("INT-missing") is None
+    assert store.next_sequence("2026-02-13") == 5
+
+
+def test_updates_patch_view_and_persist(tmp_path):
+    store, md_path = make_store(tmp_path)
+    # 先整份生成一次，之后逐条改写的结果应与整份重新生成一致
+    md_path.write_text(store.render(), encoding="utf-8")
+
+    store.update("INT-20260213-002", status="已验证")
+    store.update("INT-20260213-003", related_quest="QUEST-001")
+    store.update("INT-20260213-001", status="已验证为假")
+    view = md_path.read_text(encoding="utf-8")
+    assert view == store.render()
+
+    archived = view.split("## 历史情报")[1]
+    assert "| **INT-20260213-002** | 江湖传闻 | 普通 |" in archived
+    assert "| INT-20260213-003 | QUEST-001 |" in view
+    assert "#### 江湖传闻\n\n暂无" in view
+
+    # 新开一个存储实例：状态来自表，且与视图一致
+    reopened = IntelStore(md_path, tmp_path / "intelligence.db")
+    assert reopened.get("INT-20260213-002")["status"] == "已验证"
+    assert reopened.get("INT-20260213-003")["related_quest"] == "QUEST-001"
+
+
+def test_external_edit_is_reimported(tmp_path):
+    store, md_path = make_store(tmp_path)
+    assert store.get("INT-20260213-004")["location"] == "丈人村"
+    md_path.write_text(md_path.read_text(encoding="utf-8").replace("| 丈人村 |", "| 拱石村 |"), encoding="utf-8")
+    assert store.get("INT-20260213-004")["location"] == "拱石村"
+
+
+def test_expire_archives_only_ended_windows(tmp_path):
+    store, md_path = make_store(tmp_path)
+    md_path.write_text(store.render(), encoding="utf-8")
+    store.update("INT-20260213-002", status="已验证")
+    store.update("INT-20260213-003", related_quest="QUEST-001")
+
+    # 2026-02-16 之前到期的只有 004（002 已验证，不再参与过期）
+    assert [r["id"] for r in store.expire("2026-02-16")] == ["INT-20260213-004"]
+    signature = md_path.stat().st_mtime_ns
+    assert store.expire("2026-02-16") == []
+    assert md_path.stat().st_mtime_ns == signature
+
+    expired = store.expire("2026-02-18")
+    assert [r["id"] for r in expired] == ["INT-20260213-001", "INT-20260213-003"]
+    view = md_path.read_text(encoding="utf-8")
+    assert view == store.render()
+    assert store.query() == []
+    assert store.get("INT-20260213-002")["status"] == "已验证"
+    assert "| INT-20260213-003 | QUEST-001 | 漱玉矶深夜传来古怪声响，疑似机关启动 | 已失效 |" in view
+
+    # 新增情报只追加记录块与日志行，历史情报保留
+    record = dict(store.get("INT-20260213-001"), id="INT-20260218-001", status="活跃",
+                  valid_from="2026-02-18", valid_to="2026-02-20")
+    store.add([record], current_date="2026-02-18", log={
+        "date": "2026-02-18", "count": "1", "type_dist": "门派动态:1", "max_level": "普通", "note": "日常情报更新"})
+    view = md_path.read_text(encoding="utf-8")
+    assert view == store.render()
+    assert "## 当前日期情报 (2026-02-18)" in view
+    assert [r["status"] for r in store.query(statuses=None)].count("已失效") == 3
+
+
+def test_batch_writes_view_once(tmp_path, monkeypatch):
+    store, md_path = make_store(tmp_path)
+    md_path.write_text(store.render(), encoding="utf-8")
+    writes = []
+    write_view = store._write_view
+    monkeypatch.setattr(store, "_write_view", lambda content: (writes.append(content), write_view(content)))
+
+    record = dict(store.get("INT-20260213-001"), id="INT-20260218-001", status="活跃",
+                  valid_from="2026-02-18", valid_to="2026-02-20")
+    with store.batch():
+        assert len(store.expire("2026-02-16")) == 2
+        store.update("INT-20260213-003", related_quest="QUEST-001")
+        store.add([record], current_date="2026-02-18")
+        assert writes == []
+    assert len(writes) == 1
+    assert md_path.read_text(encoding="utf-8") == store.render()
+    assert "| INT-20260213-003 | QUEST-001 |" in writes[0]
@@ -5,14 +5,16 @@ from pathlib import Path
 scripts_dir = Path(__file__).parent
 sys.path.append(str(scripts_dir))
 
+from benchmark import copy_skills
 from manager import SkillManager
 from memory import GameMemory
 
-def test_full_cycle():
+def test_full_cycle(tmp_path):
     print("=== 开始全流程测试 ===")
 
-    # 1. 初始化 SkillManager
-    gm = SkillManager()
+    # 1. 初始化 SkillManager（在临时复制的江湖中运行，不改动仓库中的参考文件与数据库）
+    copy_skills(tmp_path)
+    gm = SkillManager(base_dir=tmp_path)
     print(f"已加载技能数量: {len(gm.active_skills)}")
     assert "protagonist-skill" in gm.active_skills
 
@@ -39,15 +41,67 @@ def test_full_cycle():
     assert found
     print("记忆持久化验证成功。")
 
+    # 4b. 批量事件：折叠为最终状态，资料卡只写一次
+    result = gm.process_story_events([
+        ("combat_result", "江未央身中一掌。", {"hp": -10, "mp": -5}),
+        {"type": "item_get", "description": "拾得一瓶金创药。", "impact": {"item": "测试金创药"}},
+        ("travel", "江未央离开山谷。", {"location": test_location + "外"}),
+        ("combat_result", "调息片刻。", {"hp": 4}),
+    ])
+    assert result["events"] == 4
+    assert result["files"] == ["protagonist-skill/character_sheet.md"]
+    assert result["memories"] == 4
+    sheet = gm.get_character_sheet()
+    assert sheet.location == test_location + "外"
+    assert "测试金创药" in sheet.inventory
+    print("批量事件处理验证成功。")
+
+    # 4c. 快照回写：按哈希比对，dry_run 只报告差异
+    snapshot = gm.take_global_snapshot()
+    assert gm.apply_global_snapshot(snapshot, dry_run=True) == []
+    snapshot["skills"]["protagonist-skill"]["character_sheet.md"] = updated_sheet
+    report = gm.apply_global_snapshot(snapshot, restore_memory=False, dry_run=True)
+    assert [(r["skill"], r["file"], r["action"]) for r in report] == \
+        [("protagonist-skill", "character_sheet.md", "修改")]
+    assert gm.apply_global_snapshot(snapshot, restore_memory=False)
+    assert gm.get_character_sheet().location == test_location
+    print("快照差异回写验证成功。")
+
     # 5. 测试快照同步
     gm.sync_protagonist_to_memory()
     print("主角快照同步完成。")
 
+    # 6. 情报同步在进程内完成，返回结构化记录，且不替换标准输出
+    stdout = sys.stdout
+    records = gm.sync_intelligence_system()
+    assert sys.stdout is stdout
+    assert all(r["id"].startswith("INT-") and r["status"] for r in records)
+    assert (tmp_path / ".agent" / "skills" / "intelligence-skill" / "assets" / "intelligence.db").exists()
+    print("情报系统同步完成。")
+
     print("=== 测试完成，全流程通畅 ===")
 
+
+def test_events_tolerate_sheet_without_location(tmp_path):
+    skills_dir = copy_skills(tmp_path)
+    sheet_path = skills_dir / "protagonist-skill" / "references" / "character_sheet.md"
+    sheet_path.write_text("\n".join(line for line in sheet_path.read_text(encoding="utf-8").split("\n")
+                                    if "**当前位置**" not in line), encoding="utf-8")
+    gm = SkillManager(base_dir=tmp_path)
+
+    result = gm.process_story_events([
+        ("travel", "江未央来到山谷。", {"location": "测试隐秘山谷"}),
+        ("item_get", "拾得一瓶金创药。", {"item": "测试金创药"}),
+    ])
+    # 位置无处记录但行踪照常记下，后续事件继续生效
+    assert result["memories"] == 2
+    assert "测试金创药" in gm.get_character_sheet().inventory
+    assert any("测试隐秘山谷" in m[2] for m in gm.memory.query_long_term("行踪"))
+
 if __name__ == "__main__":
+    import tempfile
     try:
-        test_full_cycle()
+        test_full_cycle(Path(tempfile.mkdtemp(prefix="wuxia-test-")))
     except Exception as e:
         print(f"测试失败: {e}")
         import traceback
@@ -0,0 +1,126 @@
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+# 添加脚本路径到 sys.path
+scripts_dir = Path(__file__).parent
+sys.path.append(str(scripts_dir))
+
+from memory import GameMemory, bigram_tokens
+
+
+def test_bigram_tokens_for_unsegmented_chinese():
+    assert bigram_tokens("染血的玉佩") == "染血 血的 的玉 玉佩 佩"
+    assert bigram_tokens("HP回复 50") == "hp 回复 复 50"
+
+
+def test_search_long_term_ranks_chinese_matches(tmp_path):
+    memory = GameMemory(tmp_path / "memory.db")
+    memory.add_long_term("江湖秘闻", "江未央击败了强敌", "强敌临终前交出了一枚染血的玉佩")
+    memory.add_long_term("行踪", "抵达了 大研镇", "沿途听闻玉佩的传闻，玉佩据说出自长生殿")
+    memory.add_long_term("行踪", "抵达了 漱玉矶", "海边风急浪高")
+
+    hits = memory.search_long_term("玉佩")
+    assert [h[2] for h in hits] == ["抵达了 大研镇", "江未央击败了强敌"]
+    assert [h[2] for h in memory.search_long_term("玉佩", category="江湖秘闻")] == ["江未央击败了强敌"]
+    # 单字查询同样可命中词尾
+    assert len(memory.search_long_term("矶")) == 1
+    assert memory.search_long_term("玉佩", since="2999-01-01 00:00:00") == []
+
+
+def test_existing_rows_are_indexed_on_open(tmp_path):
+    db = tmp_path / "memory.db"
+    memory = GameMemory(db)
+    memory.fts_enabled = False
+    memory.add_long_term("江湖秘闻", "发现了玉佩", "")
+    assert GameMemory(db).search_long_term("玉佩")[0][2] == "发现了玉佩"
+
+
+def test_batch_commits_once_and_stays_searchable(tmp_path):
+    memory = GameMemory(tmp_path / "memory.db")
+    with memory.batch():
+        for i in range(3):
+            memory.add_long_term("世界变动", f"修改了第{i}份卷宗", "玉佩")
+        with memory.batch():
+            memory.add_long_term("世界变动", "嵌套批次", "")
+        assert len(memory._buffer) == 4
+
+    assert memory._buffer == []
+    assert len(memory.query_long_term("世界变动")) == 4
+    assert len(memory.search_long_term("玉佩")) == 3
+
+
+def test_batch_flushes_by_size_threshold(tmp_path):
+    memory = GameMemory(tmp_path / "memory.db")
+    memory.BATCH_MAX_ROWS = 2
+    with memory.batch():
+        for i in range(5):
+            memory.add_long_term("行踪", f"第{i}站")
+        assert len(memory._buffer) == 1
+
+
+def test_idle_batch_flushes_after_deadline(tmp_path):
+    memory = GameMemory(tmp_path / "memory.db")
+    memory.BATCH_MAX_SECONDS = 0.1
+    with memory.batch():
+        memory.add_long_term("行踪", "闲置的批次")
+        # 批次保持打开且不再写入：到期后由计时线程提交，其他连接可见
+        reader = sqlite3.connect(tmp_path / "memory.db")
+        deadline = time.monotonic() + 5
+        count = 0
+        while count == 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+            count = reader.execute("SELECT COUNT(*) FROM long_term_memory").fetchone()[0]
+        reader.close()
+        assert count == 1
+        assert memory._buffer == []
+    assert len(memory.query_long_term("行踪")) == 1
+
+
+def test_batch_discards_buffer_when_block_raises(tmp_path):
+    memory = GameMemory(tmp_path / "memory.db")
+    try:
+        with memory.batch():
+            memory.add_long_term("行踪", "半途而废")
+            raise ValueError("中断")
+    except ValueError:
+        pass
+    assert memory._buffer == []
+    assert memory.query_long_term("行踪") == []
+
+
+def test_iter_long_term_pages_newest_first(tmp_path):
+    memory = GameMemory(tmp_path / "memory.db")
+    with memory.batch():
+        for i in range(25):
+            memory.add_long_term("行踪" if i % 2 else "世界变动", f"第{i}站")
+
+    recent = list(memory.iter_long_term("行踪", limit=5, page_size=2))
+    assert [r[2] for r in recent] == ["第23站", "第21站", "第19站", "第17站", "第15站"]
+    assert len(list(memory.iter_long_term(page_size=4))) == 25
+    assert memory.query_long_term("行踪", until="1970-01-01 00:00:00") == []
+
+
+def test_entity_versions_rebuild_and_diff(tmp_path):
+    memory = GameMemory(tmp_path / "memory.db")
+    memory.ENTITY_BASE_INTERVAL = 3
+    sheet = "".join(f"- **属性{i}**：{i}\n" for i in range(40))
+    states = []
+    for i in range(7):
+        sheet = sheet.replace(f"**属性{i}**：{i}", f"**属性{i}**：{i * 10}")
+        state = {"hp": str(50 - i), "location": f"第{i}站", "full_sheet": sheet}
+        states.append(state)
+        assert memory.save_entity_state("protagonist", state) == i + 1
+
+    # 内容未变不追加新版本
+    assert memory.save_entity_state("protagonist", states[-1]) == 7
+
+    fresh = GameMemory(tmp_path / "memory.db")
+    for version, state in enumerate(states, start=1):
+        assert fresh.get_entity_version("protagonist", version) == state
+    assert [v[2] for v in fresh.list_entity_versions("protagonist")] == [True, False, False, True, False, False, True]
+
+    changes = fresh.entity_changes("protagonist", 2, 4)
+    assert changes["hp"] == {"old": "49", "new": "47"}
+    assert "+- **属性2**：20" in changes["full_sheet"]["diff"]
@@ -0,0 +1,124 @@
+import sys
+import sqlite3
+from pathlib import Path
+
+# 添加脚本路径到 sys.path
+scripts_dir = Path(__file__).parent
+sys.path.append(str(scripts_dir))
+
+from persistence import save_game, load_game, list_saves, open_snapshot, reset_saves
+
+
+def make_snapshot(sheet="气血 50 / 50", npc="沈浪"):
+    return {
+        "skills": {
+            "protagonist-skill": {"character_sheet.md": sheet},
+            "npc-skill": {"npc_list.md": npc * 100},
+        },
+        "world_time": "2026-02-13T08:00:00",
+        "memory": {"short_term": [], "last_log": ""}
+    }
+
+
+def test_content_addressed_roundtrip(tmp_path):
+    db = tmp_path / "saves.db"
+    first = make_snapshot()
+    second = make_snapshot(sheet="气血 20 / 50")
+
+    id1 = save_game(first, "第一回", "大研镇", db_path=db)
+    id2 = save_game(second, "第二回", "漱玉矶", db_path=db)
+
+    assert load_game(int(id1.rsplit("_", 1)[1]), db_path=db) == first
+    assert load_game(db_path=db) == second
+
+    # 未变动的 npc_list.md 只存一次
+    conn = sqlite3.connect(db)
+    blob_count = conn.execute("SELECT COUNT(*) FROM save_blobs").fetchone()[0]
+    conn.close()
+    assert blob_count == 3
+
+
+def test_legacy_save_still_loads(tmp_path):
+    db = tmp_path / "saves.db"
+    save_game({"skills": {}}, db_path=db)
+    legacy = make_snapshot()
+
+    import json
+    conn = sqlite3.connect(db)
+    conn.execute(
+        "INSERT INTO game_saves (timestamp, chapter, location, data_json, metadata_json) VALUES (?, ?, ?, ?, ?)",
+        ("2026-01-01T00:00:00", "旧章", "旧地", json.dumps(legacy, ensure_ascii=False), "{}")
+    )
+    conn.commit()
+    conn.close()
+
+    assert load_game(db_path=db) == legacy
+
+
+def test_list_saves_paginates_metadata_only(tmp_path):
+    db = tmp_path / "saves.db"
+    for i in range(5):
+        chapter = "第一回" if i < 3 else "第二回"
+        save_game(make_snapshot(sheet=f"气血 {i} / 50"), chapter, f"大研镇·{i}", db_path=db)
+
+    first_page = list_saves(limit=2, db_path=db)
+    assert [s["save_id"] for s in first_page] == [5, 4]
+    second_page = list_saves(limit=2, before_id=first_page[-1]["save_id"], db_path=db)
+    assert [s["save_id"] for s in second_page] == [3, 2]
+
+    assert [s["save_id"] for s in list_saves(chapter="第一回", db_path=db)] == [3, 2, 1]
+    assert [s["save_id"] for s in list_saves(location="大研镇·4", db_path=db)] == [5]
+
+    slot = first_page[0]
+    assert slot["file_count"] == 2
+    assert set(slot["skills_digest"]) == {"protagonist-skill", "npc-skill"}
+    # 只有主角卡变动，npc 摘要不变
+    assert slot["skills_digest"]["npc-skill"] == first_page[1]["skills_digest"]["npc-skill"]
+    assert slot["stored_bytes"] < slot["size_bytes"]
+
+
+def test_partial_load_reads_only_selected_files(tmp_path):
+    db = tmp_path / "saves.db"
+    full = make_snapshot()
+    save_game(full, db_path=db)
+
+    partial = load_game(skills=["protagonist-skill"], db_path=db)
+    assert partial["skills"] == {"protagonist-skill": full["skills"]["protagonist-skill"]}
+    assert partial["world_time"] == full["world_time"]
+
+    lazy = open_snapshot(files=["npc_list.md"], db_path=db)
+    assert list(lazy["skills"]) == ["npc-skill"]
+    assert lazy.hash_of("npc-skill", "npc_list.md")
+    assert lazy._contents == {}
+    assert lazy["skills"]["npc-skill"]["npc_list.md"] == full["skills"]["npc-skill"]["npc_list.md"]
+
+
+def test_reset_saves_restarts_ids_without_stale_delta_base(tmp_path):
+    db = tmp_path / "saves.db"
+    save_game(make_snapshot(), "第一回", "大研镇", db_path=db)
+    save_game(make_snapshot(sheet="气血 20 / 50"), "第二回", "漱玉矶", db_path=db)
+
+    assert reset_saves(db)
+    assert list_saves(db_path=db) == []
+
+    # 重建后 ID 从 1 开始，新存档不能以旧进程缓存的清单为增量基准
+    fresh = make_snapshot(npc="朱七七")
+    assert save_game(fresh, "第一回", "大研镇", db_path=db) == "DB_SAVE_ID_1"
+    assert load_game(db_path=db) == fresh
+    assert not reset_saves(tmp_path / "missing.db")
+
+
+def test_stale_manifest_cache_is_not_used_as_delta_base(tmp_path):
+    import persistence
+    db = tmp_path / "saves.db"
+    first = make_snapshot()
+    save_game(first, "第一回", "大研镇", db_path=db)
+    stale = persistence._last_manifest[str(db)]
+
+    # 模拟另一进程重置存档并写入新的 1 号存档；本进程的缓存仍指向旧的 1 号存档
+    reset_saves(db)
+    save_game(make_snapshot(sheet="气血 20 / 50"), "第一回", "大研镇", db_path=db)
+    persistence._last_manifest[str(db)] = stale
+
+    assert save_game(first, "第二回", "漱玉矶", db_path=db) == "DB_SAVE_ID_2"
+    assert load_game(2, db_path=db) == first
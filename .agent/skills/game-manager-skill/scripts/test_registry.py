@@ -0,0 +1,60 @@
+import sys
+from pathlib import Path
+
+# 添加脚本路径到 sys.path
+scripts_dir = Path(__file__).parent
+sys.path.append(str(scripts_dir))
+
+from manager import SkillRegistry
+
+
+def make_skill(root, name, refs=()):
+    skill = root / name
+    (skill / "references").mkdir(parents=True)
+    (skill / "SKILL.md").write_text(f"---\nname: {name}\ndescription: 测试技能\n---\n# {name}\n", encoding="utf-8")
+    for ref in refs:
+        (skill / "references" / ref).write_text("内容", encoding="utf-8")
+    return skill
+
+
+def test_registry_cache_rescans_only_changed_skills(tmp_path, monkeypatch):
+    skills_dir = tmp_path / "skills"
+    make_skill(skills_dir, "npc-skill", ["npc_list.md"])
+    quest = make_skill(skills_dir, "quest-skill", ["quest_log.md"])
+    cache = tmp_path / "registry_cache.json"
+
+    first = SkillRegistry(skills_dir, cache)
+    assert first.registry["npc-skill"]["references"] == ["npc_list.md"]
+    assert cache.exists()
+
+    # 新增参考文件只让该技能重新扫描
+    (quest / "references" / "side_quests.md").write_text("支线", encoding="utf-8")
+    scanned = []
+    original = SkillRegistry._scan_skill
+    monkeypatch.setattr(SkillRegistry, "_scan_skill",
+                        lambda self, path, *a: scanned.append(path.name) or original(self, path, *a))
+    second = SkillRegistry(skills_dir, cache)
+    assert scanned == ["quest-skill"]
+    assert second.registry["quest-skill"]["references"] == ["quest_log.md", "side_quests.md"]
+    assert second.registry["npc-skill"]["path"] == skills_dir / "npc-skill"
+
+    assert second.get_metadata("npc-skill") == {"name": "npc-skill", "description": "测试技能"}
+    scanned.clear()
+    third = SkillRegistry(skills_dir, cache)
+    assert scanned == []
+    assert third._cache["skills"]["npc-skill"]["metadata"]["description"] == "测试技能"
+
+
+def test_skill_md_added_to_existing_dir_is_registered(tmp_path):
+    skills_dir = tmp_path / "skills"
+    make_skill(skills_dir, "npc-skill")
+    draft = skills_dir / "draft-skill"
+    (draft / "references").mkdir(parents=True)
+    cache = tmp_path / "registry_cache.json"
+    assert "draft-skill" not in SkillRegistry(skills_dir, cache).registry
+
+    # 在已有子目录中新建 SKILL.md 不改变技能目录的 mtime，仍应被发现
+    dir_mtime = skills_dir.stat().st_mtime_ns
+    (draft / "SKILL.md").write_text("---\nname: draft-skill\n---\n", encoding="utf-8")
+    assert skills_dir.stat().st_mtime_ns == dir_mtime
+    assert "draft-skill" in SkillRegistry(skills_dir, cache).registry
@@ -0,0 +1,82 @@
+import sys
+import sqlite3
+from pathlib import Path
+from datetime import datetime, timedelta
+
+import pytest
+
+# 添加脚本路径到 sys.path
+scripts_dir = Path(__file__).parent
+sys.path.append(str(scripts_dir))
+
+import persistence
+from persistence import save_game, load_game, list_saves, open_snapshot, SaveCompacted
+from retention import RetentionPolicy, compact, collect_garbage
+
+
+def make_world(i):
+    skills = {
+        "protagonist-skill": {"character_sheet.md": f"当前位置：第{i}站"},
+        "npc-skill": {"npc_list.md": "沈浪" * 200},
+    }
+    if i % 3 == 0:
+        skills["quest-skill"] = {"quest_log.md": f"任务进度 {i}"}
+    return {"skills": skills, "world_time": f"T{i}", "memory": {"short_term": []}}
+
+
+def test_delta_chain_roundtrip_and_compaction(tmp_path, monkeypatch):
+    monkeypatch.setattr(persistence, "KEYFRAME_INTERVAL", 4)
+    db = tmp_path / "saves.db"
+    worlds = {}
+    for i in range(1, 11):
+        chapter = f"第{(i + 1) // 2}回"
+        save_id = int(save_game(make_world(i), chapter, db_path=db).rsplit("_", 1)[1])
+        worlds[save_id] = make_world(i)
+
+    # 清空进程缓存，强制沿增量链还原
+    persistence._last_manifest.clear()
+    for save_id, world in worlds.items():
+        assert load_game(save_id, db_path=db) == world
+
+    conn = sqlite3.connect(db)
+    keyframes = [r[0] for r in conn.execute("SELECT save_id FROM save_chain WHERE keyframe = 1 ORDER BY save_id")]
+    assert keyframes == [1, 5, 9]
+
+    # 全部视为一小时前的存档：每章只留最新一份，且始终保留最新存档
+    result = compact(RetentionPolicy(), db_path=db, now=datetime.now() + timedelta(hours=2))
+    remaining = [s["save_id"] for s in list_saves(db_path=db)]
+    assert remaining == [10, 8, 6, 4, 2]
+    assert result["deleted"] == 5
+    for save_id in remaining:
+        assert load_game(save_id, db_path=db) == worlds[save_id]
+
+    # 已删存档独有的内容块被回收
+    live = conn.execute("SELECT COUNT(DISTINCT hash) FROM save_manifest WHERE hash != ''").fetchone()[0]
+    assert conn.execute("SELECT COUNT(*) FROM save_blobs").fetchone()[0] == live
+    conn.close()
+
+
+def test_open_snapshot_survives_compaction_or_fails_clearly(tmp_path):
+    db = tmp_path / "saves.db"
+    for i in range(1, 4):
+        save_game(make_world(i), "第一回", db_path=db)
+
+    # 本进程打开的快照尚未读取的内容块不会被回收
+    snapshot = open_snapshot(1, db_path=db)
+    compact(RetentionPolicy(keep_recent=timedelta(0), per_chapter=1), db_path=db,
+            now=datetime.now() + timedelta(hours=2))
+    assert [s["save_id"] for s in list_saves(db_path=db)] == [3]
+    assert snapshot["skills"]["protagonist-skill"]["character_sheet.md"] == "当前位置：第1站"
+
+    # 快照释放后，下次压缩回收其内容块
+    del snapshot
+    assert collect_garbage(db) == 1
+
+    # 其他进程回收了内容块（本进程无法感知）：读取时报告存档已被清理，而不是 KeyError
+    snapshot = open_snapshot(3, db_path=db)
+    conn = sqlite3.connect(db)
+    conn.execute("DELETE FROM save_blobs")
+    conn.commit()
+    conn.close()
+    with pytest.raises(SaveCompacted, match="已被压缩清理"):
+        snapshot["skills"]["npc-skill"]["npc_list.md"]
@@ -0,0 +1,57 @@
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+# 添加脚本路径到 sys.path
+scripts_dir = Path(__file__).parent
+sys.path.append(str(scripts_dir))
+
+import client
+from benchmark import copy_skills
+from manager import SkillManager
+from server import GameServer, METHOD_NOT_FOUND, INVALID_PARAMS, PARSE_ERROR
+
+
+@pytest.mark.skipif(not hasattr(client.socket, "AF_UNIX"), reason="需要 Unix 套接字")
+def test_rpc_round_trip(tmp_path):
+    # 在临时复制的江湖中运行，不改动仓库中的存档库与参考文件
+    copy_skills(tmp_path)
+    path = tmp_path / "manager.sock"
+    server = GameServer(lambda: SkillManager(base_dir=tmp_path), path).bind()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    with client.ManagerClient(path) as c:
+        assert c.call("ping")["requests"] == 0
+        result = c.call("check_story", content="（此处省略）")
+        assert not result["ok"] and result["hits"][0]["text"] == "（此处省略）"
+        assert len(c.call("list_saves", limit=1)["saves"]) <= 1
+
+        with pytest.raises(client.RPCError) as e:
+            c.call("no_such_method")
+        assert e.value.code == METHOD_NOT_FOUND
+        with pytest.raises(client.RPCError) as e:
+            c.call("save", bogus=1)
+        assert e.value.code == INVALID_PARAMS
+        # 出错后连接仍可继续使用
+        assert c.call("ping")["requests"] == 3
+
+    assert server.handle_line(b"{not json")["error"]["code"] == PARSE_ERROR
+
+    # 只有执行调用的线程的输出随结果返回，同一时刻其他线程（如自动存档）的输出不会混入
+    def noisy():
+        background = threading.Thread(target=print, args=("后台线程输出",))
+        background.start()
+        background.join()
+        print("调用输出")
+        return True
+    server.methods["noisy"] = noisy
+    with client.ManagerClient(path) as c:
+        assert c.call("noisy") is True
+        assert c.last_output == "调用输出\n"
+    assert client.call("shutdown", socket_file=path) is True
+    thread.join(5)
+    assert not thread.is_alive() and not path.exists()
+    assert not client.available(path)
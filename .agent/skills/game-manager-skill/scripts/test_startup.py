@@ -0,0 +1,30 @@
+import subprocess
+import sys
+from pathlib import Path
+
+# 添加脚本路径到 sys.path
+scripts_dir = Path(__file__).parent
+sys.path.append(str(scripts_dir))
+
+
+def test_check_story_skips_database_layers():
+    # 只读校验命令不应导入存档库与记忆库，也不应连接 SQLite
+    result = subprocess.run(
+        [sys.executable, str(scripts_dir / "manager.py"), "--check-story", "测试", "--startup-profile"],
+        capture_output=True, text=True, encoding="utf-8"
+    )
+    assert result.returncode == 1   # 字数不足
+    assert "[启动剖析]" in result.stdout
+    assert "未导入 persistence, memory, sqlite3" in result.stdout
+
+
+def test_memory_is_created_on_first_use(tmp_path):
+    from benchmark import copy_skills
+    from manager import SkillManager
+    # 在临时复制的江湖中运行，不在仓库资产中建库
+    copy_skills(tmp_path)
+    gm = SkillManager(base_dir=tmp_path)
+    memory_db = tmp_path / ".agent" / "skills" / "game-manager-skill" / "assets" / "game_memory.db"
+    assert gm._memory is None and not memory_db.exists()
+    assert gm.memory is gm.memory
+    assert memory_db.exists()
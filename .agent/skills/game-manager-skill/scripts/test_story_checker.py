@@ -0,0 +1,48 @@
+import io
+import sys
+from pathlib import Path
+
+# 添加脚本路径到 sys.path
+scripts_dir = Path(__file__).parent
+sys.path.append(str(scripts_dir))
+
+from story_checker import check_story, format_errors
+
+
+def test_reports_every_placeholder_with_position_and_counts_text_only(tmp_path):
+    text = "# 第一回\n\n江未央拔剑而起，（此处省略三百字）。\n**风**起了，后续细节容后再叙。(待续)\n"
+    result = check_story(text, min_chars=10)
+
+    assert [(h["line"], h["column"], h["text"]) for h in result["hits"]] == [
+        (3, 9, "（此处省略三百字）"), (4, 9, "后续细节"), (4, 18, "(待续)")]
+    assert text[result["hits"][1]["offset"]:].startswith("后续细节")
+    # 只计汉字：markdown 符号、空白、括号与标点均不计入字数
+    assert result["chars"] == 30
+    assert not result["ok"]
+    assert len(format_errors(result, min_chars=10)) == 3
+
+    # 路径与文本流得到相同结果
+    chapter = tmp_path / "chapter.md"
+    chapter.write_text(text, encoding="utf-8")
+    assert check_story(chapter, min_chars=10) == result
+    assert check_story(io.StringIO(text), min_chars=10) == result
+
+    clean = check_story("江湖夜雨十年灯。" * 800)
+    assert clean["ok"] and clean["chars"] == 5600
+
+
+def test_punctuation_heavy_lines_count_han_only():
+    line = "“剑！”——“什么剑？！”……（《江湖》，第一卷；）、、。。！！？？\n"
+    assert check_story(line, min_chars=1)["chars"] == 9
+    assert check_story("！？。，、；：“”‘’（）《》【】……——" * 500)["chars"] == 0
+
+
+def test_nested_and_mixed_parentheses_placeholders():
+    text = ("他说（详见（上文）省略）。\n"
+            "(此处省略，详见（附录）)\n"
+            "（前文（此处省略））\n"
+            "（此处略写)与（笑）（待续）\n")
+    hits = check_story(text, min_chars=1)["hits"]
+    assert [(h["line"], h["text"]) for h in hits] == [
+        (1, "（详见（上文）省略）"), (2, "(此处省略，详见（附录）)"), (3, "（前文（此处省略））"),
+        (4, "（此处略写)"), (4, "（待续）")]
@@ -0,0 +1,37 @@
+import json
+import sys
+from pathlib import Path
+
+# 添加脚本路径到 sys.path
+scripts_dir = Path(__file__).parent
+sys.path.append(str(scripts_dir))
+
+import tracing
+from persistence import save_game
+
+
+def test_spans_recorded_only_when_enabled(tmp_path):
+    tracing.reset()
+    save_game({"skills": {"npc-skill": {"npc_list.md": "沈浪"}}}, db_path=tmp_path / "off.db")
+    assert tracing.events() == []
+
+    tracing.enable()
+    try:
+        save_game({"skills": {"npc-skill": {"npc_list.md": "沈浪"}}}, db_path=tmp_path / "on.db")
+        with tracing.span("custom.step", "test", note="一步"):
+            pass
+    finally:
+        tracing.disable()
+
+    names = {row[0]: row for row in tracing.summary()}
+    assert names["save.write"][1] == 1
+    assert names["db.transaction"][1] >= 1
+    assert names["db.statement"][1] > 0
+    assert "custom.step" in tracing.format_summary()
+
+    out = tmp_path / "trace.json"
+    count = tracing.export(out)
+    trace = json.loads(out.read_text(encoding="utf-8"))
+    assert len(trace["traceEvents"]) == count
+    assert any(e["name"] == "custom.step" and e["args"] == {"note": "一步"} for e in trace["traceEvents"])
+    tracing.reset()
@@ -0,0 +1,173 @@
+"""
+轻量级耗时追踪：span() 上下文与 traced 装饰器，默认关闭（关闭时每处埋点只有一次布尔判断）。
+开启后记录每个区间的名称、分类、起止时间与线程，可导出 Chrome Trace JSON
+（chrome://tracing 或 https://ui.perfetto.dev 打开），并打印按操作汇总的耗时表。
+开启方式：tracing.enable(输出路径)、环境变量 WUXIA_TRACE=输出路径，或 manager.py --trace 输出路径。
+"""
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+ENV_VAR = "WUXIA_TRACE"
+
+_enabled = False
+_output = None
+_events = []
+_lock = threading.Lock()
+_listeners = []
+_origin = time.perf_counter_ns()
+_NULL = nullcontext()
+
+
+class _Span:
+    __slots__ = ("name", "category", "args", "start")
+
+    def __init__(self, name, category, args):
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        event = {
+            "name": self.name, "cat": self.category, "ph": "X",
+            "ts": (self.start - _origin) / 1000, "dur": (end - self.start) / 1000,
+            "pid": os.getpid(), "tid": threading.get_ident(),
+        }
+        if self.args:
+            event["args"] = self.args
+        with _lock:
+            _events.append(event)
+        return False
+
+
+def is_enabled():
+    return _enabled
+
+
+def span(name, category="op", **args):
+    """记录一个耗时区间：with span("save.write", "db"): ...（关闭时为空操作）"""
+    if not _enabled:
+        return _NULL
+    return _Span(name, category, args)
+
+
+def traced(name=None, category="op"):
+    """函数耗时装饰器，name 默认为 模块.函数名"""
+    def decorate(func):
+        label = name or f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(label, category, None):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def instant(name, category="op", **args):
+    """记录一个瞬时事件（无时长，如单条 SQL 语句）"""
+    if not _enabled:
+        return
+    event = {
+        "name": name, "cat": category, "ph": "i", "s": "t",
+        "ts": (time.perf_counter_ns() - _origin) / 1000,
+        "pid": os.getpid(), "tid": threading.get_ident(),
+    }
+    if args:
+        event["args"] = args
+    with _lock:
+        _events.append(event)
+
+
+def sql_statement(statement):
+    """sqlite3 的 trace 回调：每条执行的 SQL 记为一个瞬时事件"""
+    instant("db.statement", "db", sql=statement[:200])
+
+
+def on_toggle(listener):
+    """注册开关回调 listener(enabled)，如为已打开的数据库连接挂上 SQL 追踪"""
+    _listeners.append(listener)
+    if _enabled:
+        listener(True)
+
+
+def enable(output=None):
+    """开启追踪；给出 output 时进程退出前自动导出 Chrome Trace 并打印汇总表"""
+    global _enabled, _output
+    _enabled = True
+    if output:
+        if _output is None:
+            atexit.register(_export_at_exit)
+        _output = output
+    for listener in _listeners:
+        listener(True)
+
+
+def disable():
+    global _enabled
+    _enabled = False
+    for listener in _listeners:
+        listener(False)
+
+
+def reset():
+    with _lock:
+        _events.clear()
+
+
+def events():
+    with _lock:
+        return list(_events)
+
+
+def export(path):
+    """导出 Chrome Trace JSON，返回事件数"""
+    data = events()
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": data, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+    return len(data)
+
+
+def summary():
+    """按操作汇总：[(名称, 次数, 总耗时 ms, 平均 ms, 最大 ms)]，按总耗时倒序（瞬时事件只计次数）"""
+    stats = {}
+    for event in events():
+        count, total, peak = stats.get(event["name"], (0, 0.0, 0.0))
+        duration = event.get("dur", 0.0) / 1000
+        stats[event["name"]] = (count + 1, total + duration, max(peak, duration))
+    rows = [(name, count, total, total / count, peak) for name, (count, total, peak) in stats.items()]
+    return sorted(rows, key=lambda row: (-row[2], -row[1]))
+
+
+def format_summary(rows=None):
+    rows = summary() if rows is None else rows
+    if not rows:
+        return "（无追踪记录）"
+    width = max(4, max(len(row[0]) for row in rows))
+    # 表头中文字符占两列，按显示宽度对齐
+    lines = [f"{'操作':<{width - 2}}  {'次数':>6}  {'总耗时ms':>9}  {'平均ms':>8}  {'最大ms':>8}"]
+    for name, count, total, mean, peak in rows:
+        lines.append(f"{name:<{width}}  {count:>8}  {total:>12.2f}  {mean:>10.3f}  {peak:>10.3f}")
+    return "\n".join(lines)
+
+
+def _export_at_exit():
+    if _output and _events:
+        count = export(_output)
+        print(f"\n[追踪] 已导出 {count} 个事件至 {_output}")
+        print(format_summary())
+
+
+if os.environ.get(ENV_VAR):
+    enable(os.environ[ENV_VAR])
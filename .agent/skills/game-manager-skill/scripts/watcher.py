@@ -0,0 +1,77 @@
+"""
+参考文件变动追踪：记录每个 references/*.md 的 (mtime_ns, size) 签名。
+轮询时每个目录只做一次 scandir，找出自上次以来新增、修改或删除的文件（脏集合）；
+SkillManager 自身的写入路径直接标记为脏，不依赖文件时间戳的精度。
+可选的后台线程定期轮询，把读取与求哈希挪出存档路径。
+"""
+import os
+import threading
+
+
+class ReferenceWatcher:
+    def __init__(self, dirs):
+        """dirs: {技能名: references 目录}"""
+        self.dirs = dict(dirs)
+        self._signatures = {}   # (技能名, 文件名) -> (mtime_ns, size)
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def mark(self, skill_name, filename):
+        """标记某个文件已变动（由写入方调用）"""
+        with self._lock:
+            self._dirty.add((skill_name, filename))
+
+    def poll(self):
+        """扫描所有目录，把签名变化的文件加入脏集合，返回本次新发现的变动数"""
+        seen = {}
+        for skill_name, ref_dir in self.dirs.items():
+            try:
+                entries = os.scandir(ref_dir)
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.name.endswith(".md") and entry.is_file():
+                        st = entry.stat()
+                        seen[(skill_name, entry.name)] = (st.st_mtime_ns, st.st_size)
+
+        with self._lock:
+            changed = {key for key, sig in seen.items() if self._signatures.get(key) != sig}
+            changed |= self._signatures.keys() - seen.keys()
+            self._signatures = seen
+            self._dirty |= changed
+        return len(changed)
+
+    def drain(self):
+        """轮询一次并取走脏集合"""
+        self.poll()
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        return dirty
+
+    def start(self, interval=2.0, callback=None):
+        """开启后台轮询线程；callback 在每次轮询后调用（如预读脏文件）"""
+        if self._thread:
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    if callback:
+                        callback()
+                    else:
+                        self.poll()
+                except Exception as e:
+                    print(f"[文件监视] 轮询失败：{e}")
+
+        self._thread = threading.Thread(target=run, name="wuxia-ref-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        if self._thread:
+            self._stop.set()
+            self._thread.join(timeout)
+            self._thread = None
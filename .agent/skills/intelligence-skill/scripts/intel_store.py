@@ -0,0 +1,655 @@
+"""
+情报存储：情报记录保存在带索引的 SQLite 表中（ID 唯一索引，类型/等级、状态/有效期、地域、关联任务均有索引），
+查询、验证与任务关联都是索引查找。intelligence_database.md 是由表生成的视图：
+情报变动时在视图行上只改写相关的记录块（换小节时从原小节摘除、追加到新小节），新增情报与日志只做追加，不重新生成整份文档；
+过期情报沿 (status, valid_to) 索引找出后成批移入“已失效情报”。
+视图文件本身仍需整份读入、整份原子写回（与文件大小成正比），batch() 内的多次修改合并为一次读写。
+markdown 被外部替换（读档、重置、手工编辑）时，下次访问按签名与内容哈希发现差异，并从 markdown 重新导入。
+"""
+import hashlib
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+SKILL_ROOT = Path(__file__).parent.parent
+DEFAULT_DB_PATH = SKILL_ROOT / "assets" / "intelligence.db"
+
+# SQLite 连接管理与耗时追踪由 game-manager-skill 提供
+sys.path.append(str(SKILL_ROOT.parent / "game-manager-skill" / "scripts"))
+from connection import get_connection, transaction
+from tracing import traced, span
+
+# 情报类型
+INTEL_TYPES = ["门派动态", "江湖传闻", "神秘事件", "人物行踪", "宝物线索"]
+
+# 情报等级
+INTEL_LEVELS = ["普通", "重要", "机密", "传说"]
+
+# 情报状态
+INTEL_STATUS = ["活跃", "已失效", "已验证", "已验证为假"]
+
+# 情报表格列（与 markdown 表头一一对应），有效期列拆为 valid_from / valid_to
+INTEL_COLUMNS = ["id", "type", "level", "content", "validity", "location", "status", "related_quest"]
+
+# 情报记录字段（表列与字典键一致）
+INTEL_FIELDS = ["id", "type", "level", "content", "details", "valid_from", "valid_to",
+                "location", "status", "related_quest"]
+
+# 历史情报按状态归入的小节
+ARCHIVE_HEADINGS = {
+    "已失效": "### 已失效情报 (Expired)",
+    "已验证": "### 已验证情报 (Verified)",
+    "已验证为假": "### 已验证为假情报 (Verified False)",
+}
+TRIGGERED_HEADING = "### 已触发情报任务 (Triggered Quests)"
+LOG_HEADING = "## 情报生成日志 (Intelligence Generation Log)"
+
+TABLE_HEADER = ["| ID | 类型 | 等级 | 内容 | 有效期 | 地域 | 状态 | 关联任务 |",
+                "| :--- | :--- | :--- | :--- | :--- | :--- | :--- | :--- |"]
+TRIGGERED_HEADER = ["| 情报ID | 关联任务 | 内容 | 状态 |",
+                    "| :--- | :--- | :--- | :--- |"]
+LOG_HEADER = ["| 日期 | 生成数量 | 类型分布 | 最高等级 | 备注 |",
+              "| :--- | :--- | :--- | :--- | :--- |"]
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS intelligence (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        id TEXT NOT NULL UNIQUE,
+        type TEXT NOT NULL,
+        level TEXT NOT NULL,
+        content TEXT NOT NULL,
+        details TEXT NOT NULL DEFAULT '',
+        valid_from TEXT NOT NULL DEFAULT '',
+        valid_to TEXT NOT NULL DEFAULT '',
+        location TEXT NOT NULL DEFAULT '',
+        status TEXT NOT NULL,
+        related_quest TEXT NOT NULL DEFAULT '-',
+        placed INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_intel_type_level ON intelligence (type, level)",
+    "CREATE INDEX IF NOT EXISTS idx_intel_status_valid ON intelligence (status, valid_to)",
+    # 视图中各小节按 (状态, 类型) 分组、按进入小节的先后排列
+    "CREATE INDEX IF NOT EXISTS idx_intel_section ON intelligence (status, type, placed)",
+    "CREATE INDEX IF NOT EXISTS idx_intel_location ON intelligence (location)",
+    "CREATE INDEX IF NOT EXISTS idx_intel_quest ON intelligence (related_quest)",
+    """
+    CREATE TABLE IF NOT EXISTS intel_log (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        date TEXT NOT NULL,
+        count TEXT NOT NULL,
+        type_dist TEXT NOT NULL,
+        max_level TEXT NOT NULL,
+        note TEXT NOT NULL DEFAULT ''
+    )
+    """,
+    "CREATE TABLE IF NOT EXISTS intel_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+)
+
+PREAMBLE = """# 江湖情报数据库 (Intelligence Database)
+
+此档案记录江湖中的各类情报，每日随时间流逝自动更新。
+
+---
+
+## 情报元数据 (Metadata)
+
+| 字段 | 说明 | 格式示例 |
+| :--- | :--- | :--- |
+| ID | 唯一标识符 | INT-20260213-001 |
+| 类型 | 门派动态/江湖传闻/神秘事件/人物行踪/宝物线索 | 门派动态 |
+| 等级 | 普通/重要/机密/传说 | 重要 |
+| 内容 | 简短描述（列表展示用） | 少林寺收异域弟子 |
+| 详情 | 完整描述（详情展示用） | 详细内容... |
+| 有效期 | 生成日期+持续时间 | 2026-02-13至2026-02-16 |
+| 地域 | 关联位置 | 少林寺 |
+| 状态 | 活跃/已失效/已验证/已验证为假 | 活跃 |
+| 关联任务 | 触发的支线任务ID | - |
+
+---
+"""
+
+COMMANDS = """## 情报查询命令
+
+```bash
+# 查看今日所有活跃情报
+python .agent/skills/intelligence-skill/scripts/intelligence_manager.py --list
+
+# 查看特定情报详情
+python .agent/skills/intelligence-skill/scripts/intelligence_manager.py --show INT-20260213-001
+
+# 更新每日情报
+python .agent/skills/intelligence-skill/scripts/intelligence_manager.py --update_daily
+
+# 验证情报为真/假
+python .agent/skills/intelligence-skill/scripts/intelligence_manager.py --verify INT-20260213-002 --result true/false
+
+# 标记情报已触发任务
+python .agent/skills/intelligence-skill/scripts/intelligence_manager.py --trigger INT-20260213-003 --task_id QUEST-001
+```
+"""
+
+
+# ---- markdown 解析 ----
+
+def parse_intel_row(line):
+    """解析一行情报表格，格式不符时返回 None"""
+    cells = [cell.strip() for cell in line.strip().strip("|").split("|")]
+    if len(cells) != len(INTEL_COLUMNS):
+        return None
+    record = dict(zip(INTEL_COLUMNS, cells))
+    record["id"] = record["id"].replace("**", "")
+    valid_from, _, valid_to = record.pop("validity").partition("至")
+    record["valid_from"], record["valid_to"] = valid_from, valid_to
+    record["details"] = ""
+    return record
+
+
+def parse_intel_markdown(content):
+    """
+    解析情报数据库文本，返回结构化数据：
+    {"current_date": 日期, "active": [情报...], "archived": [情报...], "log": [日志行...]}
+    每条情报为 {"id", "type", "level", "content", "details", "valid_from", "valid_to",
+    "location", "status", "related_quest"}；日志行为 {"date", "count", "type_dist", "max_level", "note"}。
+    """
+    intel_data = {"current_date": "", "active": [], "archived": [], "log": []}
+
+    # 单次逐行扫描：按所在章节归入活跃/历史，详情行挂到上一条情报
+    bucket = None
+    last = None
+    for line in content.splitlines():
+        if line.startswith("## "):
+            bucket = ("active" if line.startswith("## 当前日期情报")
+                      else "archived" if line.startswith("## 历史情报")
+                      else "log" if line.startswith("## 情报生成日志") else None)
+            if bucket == "active":
+                intel_data["current_date"] = line.partition("(")[2].rstrip(")").strip()
+            last = None
+        elif line.startswith("| **INT-") and bucket in ("active", "archived"):
+            last = parse_intel_row(line)
+            if last:
+                intel_data[bucket].append(last)
+        elif line.startswith("**详情**：") and last is not None:
+            last["details"] = line[len("**详情**："):].strip()
+        elif bucket == "log" and line.startswith("| ") and not line.startswith(("| 日期", "| :")):
+            cells = [cell.strip() for cell in line.strip().strip("|").split("|")]
+            if len(cells) == 5:
+                intel_data["log"].append(dict(zip(("date", "count", "type_dist", "max_level", "note"), cells)))
+
+    return intel_data
+
+
+# ---- markdown 渲染 ----
+
+def render_row(record):
+    return (f"| **{record['id']}** | {record['type']} | {record['level']} | {record['content']} | "
+            f"{record['valid_from']}至{record['valid_to']} | {record['location']} | {record['status']} | "
+            f"{record['related_quest']} |")
+
+
+def render_block(record):
+    """单条情报在视图中的记录块：表格行、详情与分隔线"""
+    lines = [render_row(record), ""]
+    if record.get("details"):
+        lines += [f"**详情**：{record['details']}", ""]
+    return lines + ["---", ""]
+
+
+def render_section(records):
+    """情报小节的正文（标题行之后、下一个标题之前的全部行）"""
+    if not records:
+        return ["", "暂无", "", "---", ""]
+    lines = [""] + TABLE_HEADER
+    for record in records:
+        lines += render_block(record)
+    return lines
+
+
+def render_triggered(records):
+    if not records:
+        return ["", "暂无", "", "---", ""]
+    rows = [f"| {r['id']} | {r['related_quest']} | {r['content']} | {r['status']} |" for r in records]
+    return [""] + TRIGGERED_HEADER + rows + ["", "---", ""]
+
+
+def section_heading(record):
+    """情报所属小节的标题：活跃情报按类型归档，其余按状态归入历史情报"""
+    if record["status"] in ARCHIVE_HEADINGS:
+        return ARCHIVE_HEADINGS[record["status"]]
+    return f"#### {record['type']}"
+
+
+def _section_bounds(lines, heading):
+    """返回小节正文的 (起, 止) 行号，找不到标题时返回 None"""
+    try:
+        start = lines.index(heading) + 1
+    except ValueError:
+        return None
+    end = start
+    while end < len(lines) and not lines[end].startswith("#"):
+        end += 1
+    return start, end
+
+
+def _block_end(lines, start, end):
+    """从记录行 start 起找到记录块的结尾（含分隔线及其后的空行），不越过下一条记录或标题"""
+    i = start + 1
+    while i < end and not lines[i].startswith(("| **INT-", "#")):
+        if lines[i].strip() == "---":
+            i += 1
+            if i < end and not lines[i].strip():
+                i += 1
+            return i
+        i += 1
+    return i
+
+
+def _find_block(lines, intel_id, bounds):
+    start, end = bounds
+    prefix = f"| **{intel_id}** |"
+    for i in range(start, end):
+        if lines[i].startswith(prefix):
+            return i, _block_end(lines, i, end)
+    return None
+
+
+def _row_id(line):
+    """记录行的情报 ID（'| **INT-...** |' 形式），不是记录行时返回 None"""
+    if line.startswith("| **INT-"):
+        return line[4:].partition("**")[0]
+    return None
+
+
+def _has_rows(lines, bounds):
+    return any(line.startswith("| **INT-") for line in lines[bounds[0]:bounds[1]])
+
+
+def _replace_section(lines, heading, body):
+    bounds = _section_bounds(lines, heading)
+    if bounds is None:
+        raise ViewOutOfSync(heading)
+    lines[bounds[0]:bounds[1]] = body
+
+
+def _remove_blocks(lines, ids):
+    """一次扫描摘除给定 ID 的记录块，返回摘除的块数"""
+    kept = []
+    removed = 0
+    i, n = 0, len(lines)
+    while i < n:
+        if _row_id(lines[i]) in ids:
+            i = _block_end(lines, i, n)
+            removed += 1
+            continue
+        kept.append(lines[i])
+        i += 1
+    lines[:] = kept
+    return removed
+
+
+def _insert_blocks(lines, heading, records):
+    """把记录块追加到小节末尾；小节原为“暂无”则改写为表格"""
+    bounds = _section_bounds(lines, heading)
+    if bounds is None:
+        raise ViewOutOfSync(heading)
+    start, end = bounds
+    rows = [i for i in range(start, end) if lines[i].startswith("| **INT-")]
+    if rows:
+        insert_at = _block_end(lines, rows[-1], end)
+        lines[insert_at:insert_at] = [line for record in records for line in render_block(record)]
+    else:
+        lines[start:end] = render_section(records)
+
+
+def _group_by_section(records):
+    groups = {}
+    for record in records:
+        groups.setdefault(section_heading(record), []).append(record)
+    return groups
+
+
+def _apply_changes(lines, changes):
+    """
+    把一批 (旧, 新) 记录的变动落到视图行上：留在原小节的原地改写记录块；
+    换小节的先一次扫描全部摘除，再按目标小节成批追加（k 条变动只扫描视图常数次）。
+    """
+    moves = []
+    for old, new in changes:
+        heading = section_heading(old)
+        if heading != section_heading(new):
+            moves.append((old, new))
+            continue
+        bounds = _section_bounds(lines, heading)
+        block = _find_block(lines, old["id"], bounds) if bounds else None
+        if block is None:
+            raise ViewOutOfSync(old["id"])
+        lines[block[0]:block[1]] = render_block(new)
+    if not moves:
+        return
+
+    if _remove_blocks(lines, {old["id"] for old, _ in moves}) != len(moves):
+        raise ViewOutOfSync("记录块缺失")
+    # 摘空的小节恢复为“暂无”
+    for heading in dict.fromkeys(section_heading(old) for old, _ in moves):
+        bounds = _section_bounds(lines, heading)
+        if bounds is None:
+            raise ViewOutOfSync(heading)
+        if not _has_rows(lines, bounds):
+            lines[bounds[0]:bounds[1]] = render_section([])
+    for heading, records in _group_by_section([new for _, new in moves]).items():
+        _insert_blocks(lines, heading, records)
+
+
+def _affects_triggered(old, new):
+    """变动是否影响“已触发情报任务”小节（该小节列出关联任务、内容与状态）"""
+    if old["related_quest"] == "-" and new["related_quest"] == "-":
+        return False
+    return any(old[k] != new[k] for k in ("related_quest", "content", "status"))
+
+
+def _set_current_date(lines, current_date):
+    for i, line in enumerate(lines):
+        if line.startswith("## 当前日期情报"):
+            lines[i] = f"## 当前日期情报 ({current_date})"
+            return
+    raise ViewOutOfSync("当前日期情报")
+
+
+def _append_log(lines, log):
+    """在生成日志表格末尾追加一行"""
+    bounds = _section_bounds(lines, LOG_HEADING)
+    if bounds is None:
+        raise ViewOutOfSync(LOG_HEADING)
+    rows = [i for i in range(*bounds) if lines[i].startswith("| ")]
+    if not rows:
+        raise ViewOutOfSync(LOG_HEADING)
+    lines.insert(rows[-1] + 1, f"| {log['date']} | {log['count']} | {log['type_dist']} | "
+                               f"{log['max_level']} | {log['note']} |")
+
+
+def _signature(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return ""
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+
+def _digest(content):
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class ViewOutOfSync(Exception):
+    """markdown 视图与表不一致（小节或记录块缺失），需要整份重新生成"""
+
+
+class IntelStore:
+    """
+    情报表与 markdown 视图。md_path 为视图文件，db_path 默认 assets/intelligence.db。
+    每次访问前先比对视图文件的签名，被外部改动过则从视图重新导入。
+    """
+    def __init__(self, md_path, db_path=None):
+        self.md_path = Path(md_path)
+        self.db_path = Path(db_path) if db_path else DEFAULT_DB_PATH
+        self._lock = threading.RLock()
+        self._pending = None  # batch() 期间排队的视图修改
+        with transaction(self.db_path) as conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+        self.refresh()
+
+    # ---- 元数据 ----
+
+    def _meta(self, key, default=""):
+        row = get_connection(self.db_path).execute("SELECT value FROM intel_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    @staticmethod
+    def _set_meta(conn, **values):
+        conn.executemany("INSERT OR REPLACE INTO intel_meta (key, value) VALUES (?, ?)",
+                         [(k, str(v)) for k, v in values.items()])
+
+    @property
+    def current_date(self):
+        self.refresh()
+        return self._meta("current_date")
+
+    # ---- 与视图同步 ----
+
+    def refresh(self):
+        """视图文件被外部改动时从视图重新导入，返回是否重新导入"""
+        with self._lock:
+            signature = _signature(self.md_path)
+            if signature == self._meta("source_sig", None):
+                return False
+            content = self.md_path.read_text(encoding="utf-8") if signature else ""
+            digest = _digest(content)
+            if digest == self._meta("source_hash", None):
+                with transaction(self.db_path) as conn:
+                    self._set_meta(conn, source_sig=signature)
+                return False
+            self.import_markdown(content, signature, digest)
+            return True
+
+    @traced("intel.import", "db")
+    def import_markdown(self, content, signature="", digest=None):
+        """以视图内容整体替换表内容"""
+        data = parse_intel_markdown(content)
+        records = data["active"] + data["archived"]
+        with transaction(self.db_path) as conn:
+            conn.execute("DELETE FROM intelligence")
+            conn.execute("DELETE FROM intel_log")
+            conn.executemany(
+                f"INSERT OR REPLACE INTO intelligence ({', '.join(INTEL_FIELDS)}, placed) "
+                f"VALUES ({', '.join('?' * len(INTEL_FIELDS))}, ?)",
+                [tuple(r[f] for f in INTEL_FIELDS) + (i,) for i, r in enumerate(records, 1)]
+            )
+            conn.executemany(
+                "INSERT INTO intel_log (date, count, type_dist, max_level, note) VALUES (?, ?, ?, ?, ?)",
+                [(e["date"], e["count"], e["type_dist"], e["max_level"], e["note"]) for e in data["log"]]
+            )
+            self._set_meta(conn, current_date=data["current_date"], placed=len(records),
+                           source_sig=signature, source_hash=digest or _digest(content))
+        return len(records)
+
+    def _write_view(self, content):
+        """原子写入视图文件并记下其签名与哈希（自身写入不会触发重新导入）"""
+        tmp_path = self.md_path.with_name(f".{self.md_path.name}.{os.getpid()}.tmp")
+        with span("file.write", "io", path=self.md_path.name):
+            tmp_path.write_text(content, encoding="utf-8")
+            os.replace(tmp_path, self.md_path)
+        with transaction(self.db_path) as conn:
+            self._set_meta(conn, source_sig=_signature(self.md_path), source_hash=_digest(content))
+
+    # ---- 查询 ----
+
+    def _rows(self, sql, params=()):
+        cursor = get_connection(self.db_path).execute(
+            f"SELECT {', '.join(INTEL_FIELDS)} FROM intelligence {sql}", params)
+        return [dict(zip(INTEL_FIELDS, row)) for row in cursor]
+
+    def get(self, intel_id):
+        """按 ID 查找情报（唯一索引），不存在时返回 None"""
+        self.refresh()
+        rows = self._rows("WHERE id = ?", (intel_id,))
+        return rows[0] if rows else None
+
+    def query(self, type_filter=None, level_filter=None, statuses=("活跃",)):
+        """按类型 / 等级 / 状态筛选，按进入所在小节的先后排列；statuses=None 表示不限状态"""
+        self.refresh()
+        clauses, params = [], []
+        if statuses:
+            clauses.append(f"status IN ({', '.join('?' * len(statuses))})")
+            params += list(statuses)
+        if type_filter:
+            clauses.append("type = ?")
+            params.append(type_filter)
+        if level_filter:
+            clauses.append("level = ?")
+            params.append(level_filter)
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+        return self._rows(where + "ORDER BY placed", params)
+
+    def next_sequence(self, intel_date):
+        """当天下一个情报序号（按 ID 前缀在唯一索引上范围查找）"""
+        self.refresh()
+        prefix = f"INT-{intel_date.replace('-', '')}-"
+        row = get_connection(self.db_path).execute(
+            "SELECT id FROM intelligence WHERE id >= ? AND id < ? ORDER BY id DESC LIMIT 1",
+            (prefix, prefix + "~")).fetchone()
+        return int(row[0][len(prefix):]) + 1 if row and row[0][len(prefix):].isdigit() else 1
+
+    # ---- 写入 ----
+
+    def _next_placed(self, count):
+        """为进入小节的 count 条情报分配次序（排在所在小节末尾），返回起始值"""
+        placed = int(self._meta("placed", "0"))
+        return placed + 1, {"placed": placed + count}
+
+    def add(self, records, current_date=None, log=None):
+        """新增一批情报（可附一条生成日志）：视图中只追加对应记录块与日志行，并更新当前日期"""
+        with self._lock:
+            self.refresh()
+            with transaction(self.db_path) as conn:
+                first, meta = self._next_placed(len(records))
+                conn.executemany(
+                    f"INSERT INTO intelligence ({', '.join(INTEL_FIELDS)}, placed) "
+                    f"VALUES ({', '.join('?' * len(INTEL_FIELDS))}, ?)",
+                    [tuple(r[f] for f in INTEL_FIELDS) + (first + i,) for i, r in enumerate(records)]
+                )
+                if log:
+                    conn.execute("INSERT INTO intel_log (date, count, type_dist, max_level, note) "
+                                 "VALUES (?, ?, ?, ?, ?)",
+                                 (log["date"], log["count"], log["type_dist"], log["max_level"], log["note"]))
+                if current_date:
+                    meta["current_date"] = current_date
+                self._set_meta(conn, **meta)
+
+            def edit(lines):
+                for heading, group in _group_by_section(records).items():
+                    _insert_blocks(lines, heading, group)
+                if current_date:
+                    _set_current_date(lines, current_date)
+                if log:
+                    _append_log(lines, log)
+            self._edit_view(edit, triggered=any(r["related_quest"] != "-" for r in records))
+        return len(records)
+
+    def update(self, intel_id, **fields):
+        """
+        修改单条情报（如 status、related_quest），只改写视图中受影响的记录块与小节。
+        返回修改后的情报，ID 不存在时返回 None。
+        """
+        unknown = set(fields) - set(INTEL_FIELDS[1:])
+        if unknown:
+            raise ValueError(f"未知的情报字段：{', '.join(sorted(unknown))}")
+        with self._lock:
+            old = self.get(intel_id)
+            if old is None:
+                return None
+            new = dict(old, **fields)
+            if new == old:
+                return new
+            with transaction(self.db_path) as conn:
+                assignments = dict(fields)
+                if section_heading(new) != section_heading(old):
+                    assignments["placed"], meta = self._next_placed(1)
+                    self._set_meta(conn, **meta)
+                conn.execute(
+                    f"UPDATE intelligence SET {', '.join(f'{k} = ?' for k in assignments)} WHERE id = ?",
+                    (*assignments.values(), intel_id))
+            self._edit_view(lambda lines: _apply_changes(lines, [(old, new)]),
+                            triggered=_affects_triggered(old, new))
+        return new
+
+    @traced("intel.expire", "db")
+    def expire(self, today):
+        """
+        有效期已过（valid_to < today）的活跃情报改为“已失效”并移入历史情报的对应小节。
+        沿 (status, valid_to) 索引范围查找，视图中只改写这些情报的记录块；已验证的历史不受影响。
+        返回失效的情报列表。
+        """
+        with self._lock:
+            self.refresh()
+            expired = self._rows("WHERE status = '活跃' AND valid_to > '' AND valid_to < ? "
+                                 "ORDER BY valid_to, placed", (today,))
+            if not expired:
+                return []
+            changes = [(r, dict(r, status="已失效")) for r in expired]
+            with transaction(self.db_path) as conn:
+                first, meta = self._next_placed(len(expired))
+                conn.executemany("UPDATE intelligence SET status = '已失效', placed = ? WHERE id = ?",
+                                 [(first + i, r["id"]) for i, r in enumerate(expired)])
+                self._set_meta(conn, **meta)
+            self._edit_view(lambda lines: _apply_changes(lines, changes),
+                            triggered=any(_affects_triggered(old, new) for old, new in changes))
+        return [new for _, new in changes]
+
+    @contextmanager
+    def batch(self):
+        """
+        一条命令内的多次修改合并为一次视图读写：期间的视图修改先排队，退出时依次落到同一份行列表上再写回。
+        表的修改照常逐次提交；嵌套调用并入最外层。
+        """
+        with self._lock:
+            if self._pending is not None:
+                yield self
+                return
+            self._pending = []
+            try:
+                yield self
+            finally:
+                pending, self._pending = self._pending, None
+                if pending:
+                    self._patch_view(pending)
+
+    def _edit_view(self, edit, triggered=False):
+        """对视图做局部修改（edit 就地修改行列表）；batch() 内先排队，否则立即读写视图"""
+        if self._pending is not None:
+            self._pending.append((edit, triggered))
+        else:
+            self._patch_view([(edit, triggered)])
+
+    def _patch_view(self, edits):
+        """读入视图、依次应用修改后写回；视图缺少对应小节或记录块时由表整份重新生成"""
+        with span("intel.patch_view", "io", edits=len(edits)):
+            try:
+                lines = self.md_path.read_text(encoding="utf-8").split("\n")
+                for edit, _ in edits:
+                    edit(lines)
+                if any(triggered for _, triggered in edits):
+                    _replace_section(lines, TRIGGERED_HEADING, render_triggered(self.triggered()))
+                content = "\n".join(lines)
+            except (FileNotFoundError, ViewOutOfSync):
+                content = self.render()
+            self._write_view(content)
+
+    # ---- 整份渲染 ----
+
+    def triggered(self):
+        return self._rows("WHERE related_quest != '-' ORDER BY seq")
+
+    def render(self):
+        """由表整份生成视图文本"""
+        with span("intel.render", "io"):
+            conn = get_connection(self.db_path)
+            lines = PREAMBLE.split("\n")
+            lines += [f"## 当前日期情报 ({self._meta('current_date')})", "", "### 活跃情报 (Active Intelligence)", ""]
+            for intel_type in INTEL_TYPES:
+                lines.append(f"#### {intel_type}")
+                lines += render_section(self._rows("WHERE status = '活跃' AND type = ? ORDER BY placed",
+                                                   (intel_type,)))
+            lines.append(TRIGGERED_HEADING)
+            lines += render_triggered(self.triggered())
+            lines += ["## 历史情报 (Archived Intelligence)", ""]
+            for status, heading in ARCHIVE_HEADINGS.items():
+                lines.append(heading)
+                lines += render_section(self._rows("WHERE status = ? ORDER BY placed", (status,)))
+            lines += [LOG_HEADING, ""] + LOG_HEADER
+            for row in conn.execute("SELECT date, count, type_dist, max_level, note FROM intel_log ORDER BY seq"):
+                lines.append(f"| {' | '.join(row)} |")
+            lines += ["", "---", ""]
+            return "\n".join(lines) + "\n" + COMMANDS
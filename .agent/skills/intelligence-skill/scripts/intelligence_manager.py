@@ -1,34 +1,22 @@
 """
 江湖情报管理脚本 (Intelligence Manager)
 负责情报的生成、更新、查询和状态管理
+情报记录保存在 intel_store.py 的索引表中，intelligence_database.md 由表生成
 """
 
-import os
-import re
 import argparse
 import sys
 import io
-import json
 from pathlib import Path
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 
-# 强制使用 UTF-8 编码以解决乱码问题
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+from intel_store import IntelStore, INTEL_TYPES, INTEL_LEVELS, parse_intel_markdown
 
 # 获取项目根目录
 SKILL_ROOT = Path(__file__).parent.parent
 INTEL_DB_PATH = SKILL_ROOT / "references" / "intelligence_database.md"
-
-# 情报类型
-INTEL_TYPES = ["门派动态", "江湖传闻", "神秘事件", "人物行踪", "宝物线索"]
-
-# 情报等级
-INTEL_LEVELS = ["普通", "重要", "机密", "传说"]
-
-# 情报状态
-INTEL_STATUS = ["活跃", "已失效", "已验证", "已验证为假"]
+INTEL_STORE_PATH = SKILL_ROOT / "assets" / "intelligence.db"
 
 # 权重配置
 INTEL_WEIGHTS = {
@@ -100,25 +88,49 @@ KEYWORDS = {
 }
 
 
-def parse_intel_database() -> Dict:
-    """解析情报数据库"""
-    if not INTEL_DB_PATH.exists():
-        return {"current_date": "", "active": [], "archived": []}
+def parse_intel_database(content: Optional[str] = None) -> Dict:
+    """
+    解析情报数据库文本（默认读取视图文件），返回结构化数据：
+    {"current_date": 日期, "active": [情报...], "archived": [情报...], "log": [日志行...]}
+    每条情报为 {"id", "type", "level", "content", "details", "valid_from", "valid_to",
+    "location", "status", "related_quest"}。
+    """
+    if content is None:
+        content = read_intel_database()
+    return parse_intel_markdown(content)
 
-    content = INTEL_DB_PATH.read_text(encoding="utf-8")
 
-    # 提取当前日期
-    date_match = re.search(r"## 当前日期情报 \((\d{4}-\d{2}-\d{2})\)", content)
-    current_date = date_match.group(1) if date_match else ""
+_store = None
 
-    # 提取活跃情报（简化解析，实际应用中需要更复杂的表格解析）
-    intel_data = {
-        "current_date": current_date,
-        "active": [],
-        "archived": []
-    }
 
-    return intel_data
+def get_store() -> IntelStore:
+    """情报存储（首次调用时建表，并从视图文件导入）"""
+    global _store
+    if _store is None:
+        _store = IntelStore(INTEL_DB_PATH, INTEL_STORE_PATH)
+    return _store
+
+
+def load_intelligence(type_filter: Optional[str] = None, level_filter: Optional[str] = None,
+                      include_archived: bool = False) -> List[Dict]:
+    """按类型/等级筛选情报（默认只含活跃情报），按等级从高到低排列"""
+    records = get_store().query(type_filter, level_filter, statuses=None if include_archived else ("活跃",))
+    return sorted(records, key=lambda r: -INTEL_LEVELS.index(r["level"]) if r["level"] in INTEL_LEVELS else 0)
+
+
+def get_intelligence(intel_id: str) -> Optional[Dict]:
+    """按 ID 查找情报（含历史情报），不存在时返回 None"""
+    return get_store().get(intel_id)
+
+
+def summarize_intelligence(records: List[Dict]) -> Dict:
+    """统计情报数量、类型分布与最高等级"""
+    levels = [r["level"] for r in records if r["level"] in INTEL_LEVELS]
+    return {
+        "count": len(records),
+        "types": {t: sum(1 for r in records if r["type"] == t) for t in INTEL_TYPES},
+        "max_level": max(levels, key=INTEL_LEVELS.index) if levels else None,
+    }
 
 
 def read_intel_database() -> str:
@@ -212,8 +224,8 @@ def fill_template(intel_type: str) -> Dict:
     }
 
 
-def generate_daily_intellignce() -> List[Dict]:
-    """生成每日情报"""
+def generate_daily_intellignce(first_seq: int = 1) -> List[Dict]:
+    """生成每日情报（ID 序号从 first_seq 开始，避免同日重复生成时冲突）"""
     import random
 
     intel_count = random.randint(3, 6)  # 每日生成3-6条情报
@@ -239,7 +251,7 @@ def generate_daily_intellignce() -> List[Dict]:
             days_valid = 999  # 永久有效
 
         intel_entry = {
-            "id": generate_intel_id(today, i + 1),
+            "id": generate_intel_id(today, first_seq + i),
             "type": intel_type,
             "level": intel_level,
             "content": intel_data["content"][:50],  # 截取前50字作为简短描述
@@ -256,224 +268,106 @@ def generate_daily_intellignce() -> List[Dict]:
     return intel_list
 
 
-def update_daily_intelligence():
-    """更新每日情报"""
-    import random
-
-    content = read_intel_database()
-    today = datetime.now().strftime("%Y-%m-%d")
-
-    # 生成新情报
-    new_intels = generate_daily_intellignce()
-
-    # 构建新的活跃情报表格
-    active_sections = {
-        "门派动态": [],
-        "江湖传闻": [],
-        "神秘事件": [],
-        "人物行踪": [],
-        "宝物线索": []
-    }
-
-    for intel in new_intels:
-        intel_row = f"| **{intel['id']}** | {intel['type']} | {intel['level']} | {intel['content']} | {intel['valid_from']}至{intel['valid_to']} | {intel['location']} | {intel['status']} | {intel['related_quest']} |"
-        active_sections[intel['type']].append(intel_row)
-
-    # 构建Markdown内容
-    new_content = f"""# 江湖情报数据库 (Intelligence Database)
-
-此档案记录江湖中的各类情报，每日随时间流逝自动更新。
-
----
-
-## 情报元数据 (Metadata)
-
-| 字段 | 说明 | 格式示例 |
-| :--- | :--- | :--- |
-| ID | 唯一标识符 | INT-20260213-001 |
-| 类型 | 门派动态/江湖传闻/神秘事件/人物行踪/宝物线索 | 门派动态 |
-| 等级 | 普通/重要/机密/传说 | 重要 |
-| 内容 | 简短描述（列表展示用） | 少林寺收异域弟子 |
-| 详情 | 完整描述（详情展示用） | 详细内容... |
-| 有效期 | 生成日期+持续时间 | 2026-02-13至2026-02-16 |
-| 地域 | 关联位置 | 少林寺 |
-| 状态 | 活跃/已失效/已验证/已验证为假 | 活跃 |
-| 关联任务 | 触发的支线任务ID | - |
-
----
-
-## 当前日期情报 ({today})
-
-### 活跃情报 (Active Intelligence)
-
-"""
-
-    # 添加各类型情报
-    for intel_type in INTEL_TYPES:
-        new_content += f"#### {intel_type}\n\n"
-
-        if active_sections[intel_type]:
-            new_content += "| ID | 类型 | 等级 | 内容 | 有效期 | 地域 | 状态 | 关联任务 |\n"
-            new_content += "| :--- | :--- | :--- | :--- | :--- | :--- | :--- | :--- |\n"
-
-            for row in active_sections[intel_type]:
-                new_content += row + "\n\n"
-                # 添加详情
-                intel_id = row.split("|")[1].strip().replace("**", "")
-                intel_obj = next((i for i in new_intels if i['id'] == intel_id), None)
-                if intel_obj:
-                    new_content += f"**详情**：{intel_obj['details']} \n\n---\n\n"
-        else:
-            new_content += "暂无\n\n---\n\n"
-
-    # 添加其他章节
-    new_content += """### 已触发情报任务 (Triggered Quests)
-
-暂无
-
----
-
-## 历史情报 (Archived Intelligence)
-
-### 已失效情报 (Expired)
-
-暂无
-
-### 已验证情报 (Verified)
-
-暂无
-
-### 已验证为假情报 (Verified False)
-
-暂无
-
----
-
-## 情报生成日志 (Intelligence Generation Log)
-
-| 日期 | 生成数量 | 类型分布 | 最高等级 | 备注 |
-| :--- | :--- | :--- | :--- | :--- |
-| {today} | {count} | {type_dist} | {max_level} | 日常情报更新 |
-
----
-
-## 情报查询命令
-
-```bash
-# 查看今日所有活跃情报
-python .agent/skills/intelligence-skill/scripts/intelligence_manager.py --list
-
-# 查看特定情报详情
-python .agent/skills/intelligence-skill/scripts/intelligence_manager.py --show INT-20260213-001
+def expire_intelligence(today: Optional[str] = None) -> List[Dict]:
+    """有效期已过的活跃情报归入历史情报（已失效），返回失效的情报"""
+    today = today or datetime.now().strftime("%Y-%m-%d")
+    expired = get_store().expire(today)
+    if expired:
+        print(f"已有 {len(expired)} 条情报过期，移入历史情报（{today} 之前到期）")
+        for r in expired:
+            print(f"  {r['id']} {r['type']} | {r['content']} | 有效期至 {r['valid_to']}")
+    else:
+        print(f"暂无过期情报（{today}）")
+    return expired
 
-# 更新每日情报
-python .agent/skills/intelligence-skill/scripts/intelligence_manager.py --update_daily
 
-# 验证情报为真/假
-python .agent/skills/intelligence-skill/scripts/intelligence_manager.py --verify INT-20260213-002 --result true/false
+def update_daily_intelligence():
+    """更新每日情报：先将过期情报归档，再把新情报追加到情报表与视图（历史情报保留）"""
+    store = get_store()
+    today = datetime.now().strftime("%Y-%m-%d")
 
-# 标记情报已触发任务
-python .agent/skills/intelligence-skill/scripts/intelligence_manager.py --trigger INT-20260213-003 --task_id QUEST-001
-```
-"""
+    # 归档与追加合并为一次视图读写
+    with store.batch():
+        expired = store.expire(today)
+        if expired:
+            print(f"已归档过期情报 {len(expired)} 条")
 
-    # 统计数据
-    count = len(new_intels)
-    type_dist_str = " ".join([f"{t}:{len([i for i in new_intels if i['type']==t])}" for t in INTEL_TYPES])
-    max_level = max([i['level'] for i in new_intels], key=lambda x: INTEL_LEVELS.index(x))
+        # 生成新情报
+        new_intels = generate_daily_intellignce(store.next_sequence(today))
 
-    new_content = new_content.format(
-        today=today,
-        count=count,
-        type_dist=type_dist_str,
-        max_level=max_level
-    )
+        # 统计数据
+        count = len(new_intels)
+        type_dist_str = " ".join([f"{t}:{len([i for i in new_intels if i['type']==t])}" for t in INTEL_TYPES])
+        max_level = max([i['level'] for i in new_intels], key=lambda x: INTEL_LEVELS.index(x))
 
-    INTEL_DB_PATH.write_text(new_content, encoding="utf-8")
+        store.add(new_intels, current_date=today, log={
+            "date": today, "count": str(count), "type_dist": type_dist_str,
+            "max_level": max_level, "note": "日常情报更新"
+        })
     print(f"每日情报已更新（{today}）共 {count} 条")
 
 
 def list_intelligence(type_filter: Optional[str] = None, level_filter: Optional[str] = None):
     """列出情报"""
-    content = read_intel_database()
-
-    # 查找活跃情报表格
-    active_start = content.find("## 当前日期情报")
-    if active_start == -1:
+    current_date = get_store().current_date
+    if not current_date:
         print("未找到当前情报数据")
-        return
+        return []
 
-    # 输出简略列表（简化实现）
-    print("=== 今日活跃情报 ===")
-    print(content[active_start:active_start+2000])  # 输出前2000字符作为预览
+    records = load_intelligence(type_filter, level_filter)
+    print(f"=== 今日活跃情报（{current_date}）共 {len(records)} 条 ===")
+    for r in records:
+        print(f"[{r['level']}] {r['id']} {r['type']} | {r['content']} | {r['location']} | "
+              f"{r['valid_from']}至{r['valid_to']} | {r['status']}")
+    return records
 
 
 def show_intelligence_detail(intel_id: str):
     """显示情报详情"""
-    content = read_intel_database()
-
-    # 查找情报ID
-    if intel_id not in content:
+    record = get_intelligence(intel_id)
+    if not record:
         print(f"未找到情报 ID: {intel_id}")
-        return
-
-    # 提取详情（简化实现）
-    pattern = rf"\*\*{re.escape(intel_id)}\*\*.*?\n.*?\n.*?\n.*?\n.*?\n.*?\n.*?(\*\*详情\*\*：.*?)\n\n---"
-    match = re.search(pattern, content, re.DOTALL)
+        return None
 
-    if match:
-        details = match.group(1).replace("**详情**：", "")
-        print(f"情报详情（{intel_id}）：")
-        print(details)
-    else:
-        # 备用方案：展示附近内容
-        idx = content.find(intel_id)
-        if idx != -1:
-            print(f"情报信息（{intel_id}）：")
-            print(content[idx:idx+500])
+    print(f"情报详情（{intel_id}）：")
+    print(record["details"] or record["content"])
+    return record
 
 
 def verify_intelligence(intel_id: str, result: str):
-    """验证情报真伪"""
+    """验证情报真伪：更新状态，情报移入历史情报的对应小节"""
     if result.lower() not in ["true", "false", "真", "假"]:
         print("验证结果必须是 true/false 或 真/假")
         return False
 
     new_status = "已验证" if result.lower() in ["true", "真"] else "已验证为假"
 
-    content = read_intel_database()
-
-    # 替换状态
-    old_line = f"| **{intel_id}** |"
-    parts = content.split(old_line)
-
-    if len(parts) < 2:
+    if get_store().update(intel_id, status=new_status) is None:
         print(f"未找到情报 ID: {intel_id}")
         return False
 
-    # 简化实现：显示结果
     print(f"情报 {intel_id} 已验证为：{new_status}")
-    print("（完整状态更新需要更复杂的表格解析逻辑）")
     return True
 
 
 def trigger_quest(intel_id: str, task_id: str):
-    """标记情报已触发任务"""
-    content = read_intel_database()
-
-    if intel_id not in content:
+    """标记情报已触发任务：写入关联任务，并列入已触发情报任务"""
+    if get_store().update(intel_id, related_quest=task_id) is None:
         print(f"未找到情报 ID: {intel_id}")
         return False
 
     print(f"情报 {intel_id} 已关联任务：{task_id}")
-    print("（完整关联更新需要更复杂的表格解析逻辑）")
     return True
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="江湖情报管理工具")
     parser.add_argument("--update_daily", action="store_true", help="更新每日情报")
+    parser.add_argument("--expire", action="store_true", help="将过期情报移入历史情报")
+    parser.add_argument("--date", type=str, help="以该日期（YYYY-MM-DD）判断是否过期（配合 --expire，默认今天）")
     parser.add_argument("--list", action="store_true", help="列出今日情报")
+    parser.add_argument("--type", type=str, help="按情报类型筛选（配合 --list）")
+    parser.add_argument("--level", type=str, help="按情报等级筛选（配合 --list）")
     parser.add_argument("--show", type=str, help="显示情报详情（情报ID）")
     parser.add_argument("--verify", type=str, help="验证情报（情报ID）")
     parser.add_argument("--result", type=str, help="验证结果（true/false）")
@@ -482,10 +376,16 @@ if __name__ == "__main__":
 
     args = parser.parse_args()
 
+    # 强制使用 UTF-8 编码以解决乱码问题（仅命令行运行时，被导入时不改动调用方的输出流）
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
     if args.update_daily:
         update_daily_intelligence()
+    elif args.expire:
+        expire_intelligence(args.date)
     elif args.list:
-        list_intelligence()
+        list_intelligence(args.type, args.level)
     elif args.show:
         show_intelligence_detail(args.show)
     elif args.verify:
@@ -0,0 +1,201 @@
+"""
+主角资料卡结构化模型 (Character Sheet Model)
+一次扫描解析 character_sheet.md，得到字段（- **名称**：值）、章节与列表（背包物品、武学功法）。
+字段级修改只替换对应的那一行，其余文本（包括注释与排版）原样保留。
+game-manager-skill 与 story-prep-skill 共用此解析器。
+"""
+import re
+from pathlib import Path
+
+SKILL_ROOT = Path(__file__).parent.parent
+SHEET_PATH = SKILL_ROOT / "references" / "character_sheet.md"
+
+_FIELD = re.compile(r"^(\s*- \*\*)(.+?)(\*\*：)(.*)$")
+_HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*$")
+_RATIO = re.compile(r"^\s*(-?\d+)\s*/\s*(-?\d+)")
+_LIST_ITEM = re.compile(r"^- (.*)$")
+
+# 常用字段名
+HP = "气血 (HP)"
+MP = "内力 (MP)"
+AP = "精力 (AP)"
+LOCATION = "当前位置"
+INVENTORY = "背包物品"
+MARTIAL_ARTS = "武学功法"
+
+# 列表为空时的占位文字
+_EMPTY_ITEM = "无"
+
+
+class CharacterSheet:
+    def __init__(self, text):
+        self.lines = text.split("\n")
+        self.changed_lines = set()
+        self._index()
+
+    @classmethod
+    def load(cls, path=SHEET_PATH):
+        return cls(Path(path).read_text(encoding="utf-8"))
+
+    def _index(self):
+        """单次扫描建立 字段 -> 行号 与 章节 -> 行区间 的索引"""
+        self.fields = {}      # 字段名 -> 行号（同名字段取第一次出现）
+        self.sections = []    # [(层级, 标题, 起始行, 结束行)]
+        for i, line in enumerate(self.lines):
+            heading = _HEADING.match(line)
+            if heading:
+                if self.sections:
+                    level, title, start, _ = self.sections[-1]
+                    self.sections[-1] = (level, title, start, i)
+                self.sections.append((len(heading.group(1)), heading.group(2), i, len(self.lines)))
+                continue
+            field = _FIELD.match(line)
+            if field:
+                self.fields.setdefault(field.group(2).strip(), i)
+
+    # ---- 字段 ----
+
+    def get(self, name, default=None):
+        i = self.fields.get(name)
+        if i is None:
+            return default
+        return _FIELD.match(self.lines[i]).group(4).strip()
+
+    def set(self, name, value):
+        """修改字段值（只替换该行），返回是否有变化；字段不存在时抛出 KeyError"""
+        i = self.fields[name]
+        match = _FIELD.match(self.lines[i])
+        new_line = f"{match.group(1)}{match.group(2)}{match.group(3)}{value}"
+        if new_line == self.lines[i]:
+            return False
+        self.lines[i] = new_line
+        self.changed_lines.add(i)
+        return True
+
+    def update(self, **fields):
+        """批量修改字段，返回发生变化的字段名列表"""
+        return [name for name, value in fields.items() if self.set(name, value)]
+
+    def get_ratio(self, name):
+        """解析“当前 / 上限”格式的字段，返回 (当前, 上限)；无法解析时返回 None"""
+        value = self.get(name)
+        match = _RATIO.match(value) if value else None
+        return (int(match.group(1)), int(match.group(2))) if match else None
+
+    def set_ratio(self, name, current, maximum=None):
+        if maximum is None:
+            maximum = self.get_ratio(name)[1]
+        return self.set(name, f"{current} / {maximum}")
+
+    def adjust_ratio(self, name, delta):
+        """按增量调整“当前 / 上限”字段，结果限制在 0 与上限之间，返回新的当前值"""
+        current, maximum = self.get_ratio(name)
+        current = max(0, min(maximum, current + delta))
+        self.set_ratio(name, current, maximum)
+        return current
+
+    @property
+    def location(self):
+        return self.get(LOCATION)
+
+    @location.setter
+    def location(self, value):
+        self.set(LOCATION, value)
+
+    @property
+    def hp(self):
+        return self.get_ratio(HP)
+
+    @property
+    def mp(self):
+        return self.get_ratio(MP)
+
+    # ---- 章节与列表 ----
+
+    def _section(self, title):
+        for level, heading, start, end in self.sections:
+            if heading == title or heading.startswith(title):
+                return start, end
+        return None
+
+    def items(self, title):
+        """列出章节中的列表条目（不含字段行与“无”占位）"""
+        span = self._section(title)
+        if not span:
+            return []
+        items = []
+        for line in self.lines[span[0] + 1:span[1]]:
+            match = _LIST_ITEM.match(line)
+            if match and not _FIELD.match(line) and match.group(1).strip() != _EMPTY_ITEM:
+                items.append(match.group(1).strip())
+        return items
+
+    @property
+    def inventory(self):
+        return self.items(INVENTORY)
+
+    def add_item(self, item, title=INVENTORY):
+        """在章节列表末尾追加条目（替换“无”占位）；没有该章节时在文末新建"""
+        span = self._section(title)
+        if span is None:
+            position = len(self.lines)
+            while position and not self.lines[position - 1].strip():
+                position -= 1
+            added = ["", f"## {title}", f"- {item}"]
+            self.lines[position:position] = added
+            self.changed_lines |= set(range(position, position + len(added)))
+            self._index()
+            return
+        start, end = span
+        last = None
+        for i in range(start + 1, end):
+            match = _LIST_ITEM.match(self.lines[i])
+            if match and not _FIELD.match(self.lines[i]):
+                if match.group(1).strip() == _EMPTY_ITEM:
+                    self.lines[i] = f"- {item}"
+                    self.changed_lines.add(i)
+                    return
+                last = i
+        position = (last + 1) if last is not None else start + 1
+        self.lines.insert(position, f"- {item}")
+        # 行号发生位移，需要重建索引
+        self.changed_lines = {i + 1 if i >= position else i for i in self.changed_lines} | {position}
+        self._index()
+
+    def remove_item(self, item, title=INVENTORY):
+        """移除章节列表中的条目，返回是否找到；列表清空后补回“无”占位"""
+        span = self._section(title)
+        if not span:
+            return False
+        for i in range(span[0] + 1, span[1]):
+            match = _LIST_ITEM.match(self.lines[i])
+            if match and not _FIELD.match(self.lines[i]) and match.group(1).strip() == item:
+                if len(self.items(title)) == 1:
+                    self.lines[i] = f"- {_EMPTY_ITEM}"
+                    self.changed_lines.add(i)
+                else:
+                    del self.lines[i]
+                    self.changed_lines = {j - 1 if j > i else j for j in self.changed_lines if j != i}
+                    self._index()
+                return True
+        return False
+
+    # ---- 输出 ----
+
+    @property
+    def changed(self):
+        return bool(self.changed_lines)
+
+    def render(self):
+        return "\n".join(self.lines)
+
+    def save(self, path=SHEET_PATH):
+        Path(path).write_text(self.render(), encoding="utf-8")
+        self.changed_lines.clear()
+
+    def to_dict(self):
+        """导出全部字段与列表，便于写入记忆或序列化"""
+        data = {name: self.get(name) for name in self.fields}
+        data[INVENTORY] = self.inventory
+        data[MARTIAL_ARTS] = self.items(MARTIAL_ARTS)
+        return data
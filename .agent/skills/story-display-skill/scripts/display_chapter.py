@@ -10,6 +10,11 @@ BASE_DIR = Path(__file__).parent.parent.parent.parent.parent
 CHAPTERS_DIR = BASE_DIR / "history" / "chapters"
 MANAGER_SCRIPT = BASE_DIR / ".agent" / "skills" / "game-manager-skill" / "scripts" / "manager.py"
 
+# 耗时追踪模块由 game-manager-skill 提供（默认关闭）
+sys.path.append(str(MANAGER_SCRIPT.parent))
+from tracing import span
+import client
+
 def ensure_dir():
     if not CHAPTERS_DIR.exists():
         CHAPTERS_DIR.mkdir(parents=True, exist_ok=True)
@@ -19,7 +24,7 @@ def write_and_verify(chapter_num, content, mode="w"):
     file_path = CHAPTERS_DIR / f"chapter_{chapter_num}.md"
 
     # 写入内容 (w 为覆盖, a 为追加)
-    with open(file_path, mode, encoding="utf-8") as f:
+    with span("file.write", "io", path=file_path.name), open(file_path, mode, encoding="utf-8") as f:
         f.write(content)
 
     return file_path.exists(), file_path
@@ -44,20 +49,31 @@ def display_native(file_path):
         print(f"!!! 读取或显示文件时出错: {e}")
 
 def run_manager_check(file_path):
-    """调用 manager.py 进行质量与字数校验"""
+    """调用 manager.py 进行质量与字数校验（常驻主控在运行时直接经套接字校验，否则启动子进程）"""
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            content = f.read()
+        with span("rpc.check_story", "rpc"):
+            result = client.call("check_story", {"path": str(Path(file_path).resolve())})
+        if result["ok"]:
+            print(f"\n[SUCCESS] 文案校验通过！有效字数：{result['chars']} 字。")
+        else:
+            print("\n[ERROR] 文案校验未通过：")
+            for err in result["errors"]:
+                print(f"  - {err}")
+        return result["ok"]
+    except client.ServerUnavailable:
+        pass
+    except Exception as e:
+        print(f"!!! 常驻主控校验失败，改用子进程：{e}")
 
-        # 将内容通过命令行传递给 manager.py 进行校验
-        # 注意：对于超长文本，命令行传参可能有上限，此处使用 subprocess 的 stdin 或直接在 Python 内部导入校验逻辑
-        # 考虑到代码复用，我们这里尝试直接导入 manager 逻辑或调用脚本
-        result = subprocess.run(
-            [sys.executable, str(MANAGER_SCRIPT), "--check-story", content],
-            capture_output=True,
-            text=True,
-            encoding='utf-8'
-        )
+    try:
+        # 只传文件路径，由 manager.py 逐行读取校验（长章节经命令行传全文会超出参数长度上限）
+        with span("subprocess.check_story", "subprocess"):
+            result = subprocess.run(
+                [sys.executable, str(MANAGER_SCRIPT), "--check-story-file", str(Path(file_path).resolve())],
+                capture_output=True,
+                text=True,
+                encoding='utf-8'
+            )
         print(result.stdout)
         return result.returncode == 0
     except Exception as e:
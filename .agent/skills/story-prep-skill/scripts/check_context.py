@@ -1,28 +1,28 @@
 import os
 import re
+import sys
 from pathlib import Path
 
 # 定义根路径
 BASE_DIR = Path(__file__).parent.parent.parent.parent.parent
 SKILLS_DIR = BASE_DIR / ".agent" / "skills"
 
+# 主角资料卡解析器由 protagonist-skill 提供
+sys.path.append(str(SKILLS_DIR / "protagonist-skill" / "scripts"))
+from character_sheet import CharacterSheet, HP, MP
+
 def get_protagonist_status():
     path = SKILLS_DIR / "protagonist-skill" / "references" / "character_sheet.md"
     if not path.exists():
         return "主角状态：未知"
     
-    content = path.read_text(encoding="utf-8")
+    sheet = CharacterSheet.load(path)
     # 提取核心数据
-    hp = re.search(r"气血 \(HP\)\*\*：(.*?)\n", content)
-    mp = re.search(r"内力 \(MP\)\*\*：(.*?)\n", content)
-    loc = re.search(r"当前位置\*\*：(.*?)$", content, re.M)
-    personality = re.search(r"人格倾向\*\*：(.*?)$", content, re.M)
-    
     return f"""
 [主角状态]
-- 位置：{loc.group(1).strip() if loc else "未知"}
-- 气血/内力：{hp.group(1).strip() if hp else "未知"} / {mp.group(1).strip() if mp else "未知"}
-- 性格倾向：{personality.group(1).strip() if personality else "未知"}
+- 位置：{sheet.location or "未知"}
+- 气血/内力：{sheet.get(HP) or "未知"} / {sheet.get(MP) or "未知"}
+- 性格倾向：{sheet.get("人格倾向") or "未知"}
 """
 
 def get_nearby_npcs(location):